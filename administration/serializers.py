@@ -1,8 +1,9 @@
 # In administration/serializers.py
 from rest_framework import serializers
+from utils.serializers import SparseFieldsetMixin
 from feedback.models import Feedback
 
-class FeedbackAdminSerializer(serializers.ModelSerializer):
+class FeedbackAdminSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for admins to view and manage user feedback.
     """
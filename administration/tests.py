@@ -1,3 +1,78 @@
-from django.test import TestCase
+# In administration/tests.py
 
-# Create your tests here.
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from feedback.models import Feedback
+from vendors.models import Vendor
+
+
+class AdminExportTest(APITestCase):
+    """
+    Test suite for the admin data exports.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        Feedback.objects.create(user=self.user, subject='Great app', message='Loved the trip planner', rating=5)
+        Feedback.objects.create(subject='Bug', message='Map does not load')
+
+    def test_feedback_is_exported_as_json_lines(self):
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='StrongPassword123'))
+        response = self.client.get(reverse('admin-export', args=['feedback', 'jsonl']))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['subject'] for row in rows], ['Great app', 'Bug'])
+        self.assertEqual(rows[0]['user'], 'tourist')
+        self.assertIsNone(rows[1]['user'])
+
+    def test_csv_cells_are_not_run_as_formulas(self):
+        formula = '=HYPERLINK("http://evil.example","Click")'
+        Feedback.objects.create(subject=formula, message='-2+3', rating=1)
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='StrongPassword123'))
+
+        response = self.client.get(reverse('admin-export', args=['feedback', 'csv']))
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[-1]['subject'], "'" + formula)
+        self.assertEqual(rows[-1]['message'], "'-2+3")
+        self.assertEqual(rows[0]['subject'], 'Great app')
+
+        # JSON Lines isn't opened in a spreadsheet: values are exported as they are
+        response = self.client.get(reverse('admin-export', args=['feedback', 'jsonl']))
+        last = json.loads(b''.join(response.streaming_content).decode().splitlines()[-1])
+        self.assertEqual(last['message'], '-2+3')
+
+    def test_export_is_admin_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('admin-export', args=['bookings', 'csv']))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class VendorApprovalTest(APITestCase):
+    """
+    Test suite for approving vendor applications.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username='vendoruser', password='StrongPassword123')
+        self.vendor = Vendor.objects.create(user=user, business_name='Deosai Camps', contact_phone='0300')
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='StrongPassword123'))
+
+    def test_approval_writes_only_the_verified_flag(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin-vendor-approve', args=[self.vendor.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('UPDATE "vendors_vendor" SET "is_verified" = 1 WHERE'))
+        self.vendor.refresh_from_db()
+        self.assertTrue(self.vendor.is_verified)
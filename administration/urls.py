@@ -1,8 +1,8 @@
 # In administration/urls.py
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import VendorAdminViewSet
-from .views import VendorAdminViewSet, FeedbackAdminViewSet
+from .views import VendorAdminViewSet, FeedbackAdminViewSet, AdminExportView
 
 router = DefaultRouter()
 router.register(r'vendors', VendorAdminViewSet, basename='admin-vendor')
@@ -10,4 +10,9 @@ router.register(r'feedback', FeedbackAdminViewSet, basename='admin-feedback')
 
 urlpatterns = [
     path('', include(router.urls)),
+    re_path(
+        r'^export/(?P<dataset>bookings|services|vendors|feedback)/(?P<export_format>csv|jsonl)/$',
+        AdminExportView.as_view(),
+        name='admin-export'
+    ),
 ]
\ No newline at end of file
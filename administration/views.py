@@ -10,8 +10,13 @@ from vendors.models import Vendor
 from vendors.serializers import VendorSerializer
 from .serializers import FeedbackAdminSerializer
 from feedback.models import Feedback
+from utils.mixins import SparseFieldsetViewMixin
+from utils.export import stream_export, ExportColumn, ExportContentNegotiation
+from rest_framework.views import APIView
+from vendors.models import Service, Booking
+from vendors.exports import BOOKING_EXPORT_COLUMNS, SERVICE_EXPORT_COLUMNS, VENDOR_EXPORT_COLUMNS
 
-class VendorAdminViewSet(viewsets.ReadOnlyModelViewSet):
+class VendorAdminViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for admins to view and manage vendor applications.
     - list: View all vendors.
@@ -41,7 +46,7 @@ class VendorAdminViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({'error': 'Vendor not found'}, status=status.HTTP_404_NOT_FOUND)
         
 
-class FeedbackAdminViewSet(viewsets.ModelViewSet):
+class FeedbackAdminViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for admins to view and update the status of user feedback.
     """
@@ -50,3 +55,34 @@ class FeedbackAdminViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     # Admins can list, retrieve, and update (for changing status), but not create/delete feedback.
     http_method_names = ['get', 'put', 'patch', 'head', 'options']
+
+
+FEEDBACK_EXPORT_COLUMNS = [
+    ExportColumn('id'),
+    ExportColumn('created_at'),
+    ExportColumn('user', 'user__username'),
+    ExportColumn('subject'),
+    ExportColumn('message'),
+    ExportColumn('rating'),
+    ExportColumn('status'),
+]
+
+ADMIN_EXPORTS = {
+    'bookings': (Booking.objects.all, BOOKING_EXPORT_COLUMNS),
+    'services': (Service.objects.all, SERVICE_EXPORT_COLUMNS),
+    'vendors': (Vendor.objects.all, VENDOR_EXPORT_COLUMNS),
+    'feedback': (Feedback.objects.all, FEEDBACK_EXPORT_COLUMNS),
+}
+
+
+class AdminExportView(APIView):
+    """
+    API endpoint for admins to download a whole table as a streamed file.
+    Accessible at: GET /api/admin/export/{bookings|services|vendors|feedback}/{csv|jsonl}/
+    """
+    permission_classes = [permissions.IsAdminUser]
+    content_negotiation_class = ExportContentNegotiation
+
+    def get(self, request, dataset, export_format, *args, **kwargs):
+        get_queryset, columns = ADMIN_EXPORTS[dataset]
+        return stream_export(get_queryset().order_by('id'), columns, export_format, filename=dataset, request=request)
@@ -0,0 +1,167 @@
+# In benchmarks/asgi_vs_wsgi.py
+"""
+Throughput of the weather alerts endpoint (an async view waiting on a slow
+third-party API) when deployed under WSGI and under ASGI.
+
+    python -m benchmarks.asgi_vs_wsgi --requests 400 --upstream-ms 500
+
+OpenWeather is replaced by a local stub server (in a separate process) that
+answers after --upstream-ms. Both deployments are driven in-process: the WSGI application
+from a pool of --wsgi-threads threads (a sync worker serves one request per
+thread), the ASGI application from a single event loop with --requests
+concurrent requests, as an ASGI server would.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from benchmarks.common import setup_django, print_table
+
+WEATHER = json.dumps({
+    'main': {'temp': 12.5, 'feels_like': 10.1},
+    'weather': [{'description': 'light rain', 'icon': '10d'}],
+}).encode()
+
+
+def serve_stub_upstream(delay, ready):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(WEATHER)))
+            self.end_headers()
+            self.wfile.write(WEATHER)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 4096
+
+    server = Server(('127.0.0.1', 0), Handler)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_upstream(delay):
+    """Runs the stub in its own process, so it doesn't compete with the app for the GIL."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_stub_upstream, args=(delay, ready), daemon=True)
+    process.start()
+    return process, f'http://127.0.0.1:{ready.get(timeout=10)}'
+
+
+def make_fixture():
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+    from planner.models import Destination, Itinerary, ItineraryItem
+
+    user = User.objects.create_user(username='bench-async', password='!')
+    itinerary = Itinerary.objects.create(user=user, name='Bench', start_date=date(2025, 7, 1), end_date=date(2025, 7, 2))
+    destination = Destination.objects.create(
+        name='Deosai', description='-', city='Skardu', country='Pakistan', destination_type='PARK'
+    )
+    ItineraryItem.objects.create(itinerary=itinerary, destination=destination, day_number=1)
+    return f'/api/planner/itineraries/{itinerary.pk}/alerts/', str(AccessToken.for_user(user))
+
+
+def run_wsgi(path, token, requests, threads):
+    from core.wsgi import application
+
+    def one_request(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        start = time.perf_counter()
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        assert statuses[0].startswith('200'), (statuses, body[:200])
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one_request, range(requests)))
+    return time.perf_counter() - started, latencies
+
+
+async def run_asgi(path, token, requests):
+    from core.asgi import application
+
+    async def one_request():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        messages = []
+        inbound = asyncio.Queue()
+        inbound.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                inbound.put_nowait({'type': 'http.disconnect'})
+
+        start = time.perf_counter()
+        await application(scope, inbound.get, send)
+        assert messages[0]['status'] == 200, messages
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one_request() for _ in range(requests)))
+    return time.perf_counter() - started, latencies
+
+
+def row(deployment, concurrency, requests, elapsed, latencies):
+    latencies = sorted(latencies)
+    return (
+        deployment, concurrency, requests, f'{elapsed:.2f}', f'{requests / elapsed:.1f}',
+        f'{statistics.median(latencies) * 1000:.0f}', f'{latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}',
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--upstream-ms', type=float, default=500)
+    parser.add_argument('--wsgi-threads', type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    stub, url = start_stub_upstream(args.upstream_ms / 1000)
+    path, token = make_fixture()
+    limits = {'max_concurrency': args.wsgi_threads, 'async_max_concurrency': args.requests, 'queue_timeout': 60}
+    with override_settings(INTEGRATIONS={'openweather': dict(base_url=url, **limits)}, ALLOWED_HOSTS=['*']):
+        wsgi_elapsed, wsgi_latencies = run_wsgi(path, token, args.requests, args.wsgi_threads)
+        asgi_elapsed, asgi_latencies = asyncio.run(run_asgi(path, token, args.requests))
+    stub.terminate()
+
+    print(f'{args.requests} requests, upstream latency {args.upstream_ms:.0f} ms')
+    print_table(
+        ['deployment', 'in flight', 'requests', 'seconds', 'req/s', 'p50 ms', 'p95 ms'],
+        [
+            row('WSGI (thread per request)', args.wsgi_threads, args.requests, wsgi_elapsed, wsgi_latencies),
+            row('ASGI (one event loop)', args.requests, args.requests, asgi_elapsed, asgi_latencies),
+        ]
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# In benchmarks/auth.py
+"""
+Queries and latency per request on the hot read endpoints, authenticating
+with SimpleJWT's JWTAuthentication (a user query per request) and with
+ClaimsJWTAuthentication (users/authentication.py).
+
+    python -m benchmarks.auth [--repeat 1000]
+
+Requests go through the full Django stack with a real access token; the
+user cache is warm, as it is in steady state. The JWTAuthentication numbers
+are taken by swapping its user lookup into the configured backend.
+"""
+import argparse
+from datetime import date
+from decimal import Decimal
+
+from benchmarks.common import setup_django, measure, print_table
+
+ENDPOINTS = [
+    '/api/planner/itineraries/',
+    '/api/vendors/bookings/',
+    '/api/messaging/conversations/unread/',
+    '/api/auth/profile/',
+    '/api/planner/recommendations/',
+]
+
+
+def make_fixture():
+    from django.contrib.auth.models import User
+    from planner.models import Destination, Itinerary
+    from vendors.models import Booking, Service, Vendor
+
+    tourist = User.objects.create_user(username='bench-auth', password='StrongPassword123')
+    vendor_user = User.objects.create_user(username='bench-auth-vendor', password='x')
+    vendor = Vendor.objects.create(user=vendor_user, business_name='Bench Tours', contact_phone='0300', is_verified=True)
+    service = Service.objects.create(
+        vendor=vendor, name='Lakeside Room', description='A room', service_type='HOTEL', price=Decimal('100.00'), city='Skardu'
+    )
+    for n in range(5):
+        Booking.objects.create(user=tourist, service=service, service_start_date=date(2025, 7, 1), total_price=Decimal('100.00'))
+        Itinerary.objects.create(user=tourist, name=f'Trip {n}', start_date=date(2025, 7, 1), end_date=date(2025, 7, 5))
+        Destination.objects.create(
+            name=f'Lake {n}', description='-', city='Skardu', country='Pakistan', destination_type='PARK', average_cost=10
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from contextlib import nullcontext
+    from unittest import mock
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from users.authentication import ClaimsJWTAuthentication
+
+    make_fixture()
+    client = Client()
+    access = client.post(
+        '/api/auth/login/', {'username': 'bench-auth', 'password': 'StrongPassword123'}, content_type='application/json'
+    ).json()['access']
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+
+    backends = {
+        'JWTAuthentication': mock.patch.object(ClaimsJWTAuthentication, 'get_user', JWTAuthentication.get_user),
+        'ClaimsJWTAuthentication': nullcontext(),
+    }
+    results = {}
+    for label, backend in backends.items():
+        with backend:
+            for path in ENDPOINTS:
+                def fetch():
+                    response = client.get(path, **headers)
+                    assert response.status_code == 200, (path, response.status_code)
+
+                seconds, _ = measure(fetch, repeat=args.repeat, warmup=5)
+                with CaptureQueriesContext(connection) as queries:
+                    fetch()
+                results[label, path] = (len(queries), seconds)
+
+    rows = []
+    for path in ENDPOINTS:
+        (old_queries, old_seconds), (new_queries, new_seconds) = (results[label, path] for label in backends)
+        rows.append((
+            path, old_queries, new_queries, f'{old_seconds * 1000:.2f}', f'{new_seconds * 1000:.2f}',
+            f'{(1 - new_seconds / old_seconds) * 100:.0f}%',
+        ))
+    print_table(['endpoint', 'queries (JWT)', 'queries (claims)', 'ms (JWT)', 'ms (claims)', 'saved'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# In benchmarks/avatars.py
+"""
+Avatar payload sizes and processing times (users/avatars.py).
+
+    python -m benchmarks.avatars [--width 4032 --height 3024]
+
+A phone-camera-sized JPEG is uploaded to PATCH /api/auth/profile/: the
+request only streams, hashes and stages it; the `users.process_avatar` job
+then renders the thumbnails. A second user uploading the same photo is
+linked to the stored copy without any processing. Files are written to a
+temporary MEDIA_ROOT.
+"""
+import argparse
+import io
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import setup_django, measure, print_table
+
+
+def make_photo(width, height):
+    """Blotches over grain, which compress (and scale down) about like a real photo."""
+    from PIL import Image
+
+    def channel():
+        blotches = Image.effect_noise((width // 32, height // 32), 96).resize((width, height), Image.Resampling.BICUBIC)
+        return Image.blend(blotches, Image.effect_noise((width, height), 48), 0.3)
+
+    channels = [channel() for _ in range(3)]
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    buffer = io.BytesIO()
+    Image.merge('RGB', channels).save(buffer, 'JPEG', quality=92, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.files.storage import default_storage
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import override_settings
+    from jobs.models import Job
+    from jobs.services import work_off
+    from rest_framework.test import APIClient
+    from users.avatars import FORMATS, full_path, render_avatar, staging_path, thumbnail_path, thumbnail_sizes
+
+    media_root = tempfile.mkdtemp()
+    override_settings(MEDIA_ROOT=media_root).enable()
+    photo = make_photo(args.width, args.height)
+    client = APIClient()
+
+    def upload(username):
+        client.force_authenticate(User.objects.create_user(username=username, password='!'))
+        start = time.perf_counter()
+        response = client.patch(
+            '/api/auth/profile/', {'profile.avatar': SimpleUploadedFile('photo.jpg', photo)}, format='multipart'
+        )
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - start
+
+    try:
+        first_upload = upload('bench-avatar-0')
+        job = Job.objects.get(kind='users.process_avatar')
+        sha256 = job.payload['sha256']
+        # Re-renders from a copy of the staged upload, so each run does the full work
+        with default_storage.open(staging_path(sha256), 'rb') as file:
+            staged = file.read()
+
+        def render():
+            default_storage.save(staging_path(sha256), io.BytesIO(staged))
+            for name in [full_path(sha256)] + [
+                thumbnail_path(sha256, size, extension) for size in thumbnail_sizes() for extension in FORMATS
+            ]:
+                default_storage.delete(name)
+            render_avatar(sha256)
+
+        render_seconds, _ = measure(render, repeat=args.repeat, warmup=1)
+        work_off()
+        duplicate_upload = upload('bench-avatar-1')
+
+        timings = [
+            ('upload (new image)', f'{first_upload * 1000:.1f}'),
+            ('processing job', f'{render_seconds * 1000:.1f}'),
+            ('upload (already stored)', f'{duplicate_upload * 1000:.1f}'),
+        ]
+        payloads = [('original upload', f'{args.width}x{args.height}', f'{len(photo) / 1024:,.1f}')]
+        full_size = default_storage.size(full_path(sha256))
+        payloads.append(('full.jpg', f'fit {settings.AVATAR_MAX_DIMENSION}', f'{full_size / 1024:,.1f}'))
+        for size in thumbnail_sizes():
+            for extension in FORMATS:
+                name = thumbnail_path(sha256, size, extension)
+                payloads.append((f'{size}.{extension}', f'{size}x{size}', f'{default_storage.size(name) / 1024:,.1f}'))
+
+        print(f'{args.width}x{args.height} JPEG upload of {len(photo) / 1024 / 1024:.1f} MB')
+        print_table(['step', 'ms'], timings)
+        print()
+        print_table(['file', 'pixels', 'KiB'], payloads)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
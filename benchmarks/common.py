@@ -0,0 +1,53 @@
+# In benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts.
+
+Each benchmark runs against a throwaway test database (never db.sqlite3):
+
+    python -m benchmarks.serialization
+"""
+import os
+import statistics
+import time
+
+
+def setup_django(on_disk=False):
+    """
+    Configures Django and creates a fresh, migrated test database. SQLite test
+    databases live in memory unless `on_disk`; benchmarks with several writer
+    threads need a file, which (like a deployment) waits on locks instead of failing.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    if on_disk and connection.vendor == 'sqlite':
+        import tempfile
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Runs `fn` repeatedly and returns (median seconds, last result)."""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def print_table(headers, rows):
+    """Prints rows as a plain fixed-width table."""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    line = '  '.join('{:<%d}' % width for width in widths)
+    print(line.format(*headers))
+    print(line.format(*['-' * width for width in widths]))
+    for row in rows:
+        print(line.format(*row))
@@ -0,0 +1,103 @@
+# In benchmarks/export.py
+"""
+Throughput (rows/second) and peak Python memory of the streamed booking export
+on a synthetic bookings table, against the paginated-less JSON list endpoint.
+
+    python -m benchmarks.export --rows 5000000
+
+The JSON list endpoint is only measured up to --list-rows rows, since it holds
+every booking in memory at once.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import setup_django, print_table
+
+INSERT_BATCH = 50_000
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+    from vendors.models import Vendor, Service, Booking
+
+    tourist = User.objects.create_user(username='bench-tourist', password='x')
+    vendor_user = User.objects.create_user(username='bench-vendor', password='x')
+    vendor = Vendor.objects.create(user=vendor_user, business_name='Bench Tours', contact_phone='0300', is_verified=True)
+    service = Service.objects.create(
+        vendor=vendor, name='Lakeside Room', description='A room', service_type='HOTEL', price=100, city='Skardu'
+    )
+
+    # Raw inserts: going through the ORM (and the stats signals) would take far longer than the export itself
+    table = Booking._meta.db_table
+    sql = (
+        f'INSERT INTO {table} (user_id, service_id, booking_date, service_start_date, guests, status, total_price) '
+        f"VALUES (%s, %s, '2025-07-01 10:00:00', '2025-07-10', 2, 'CONFIRMED', '250.00')"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, INSERT_BATCH):
+            count = min(INSERT_BATCH, rows - start)
+            cursor.executemany(sql, [(tourist.pk, service.pk)] * count)
+    return vendor_user
+
+
+def _read(view, request, **kwargs):
+    response = view(request, **kwargs)
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    response.render()
+    return len(response.content)
+
+
+def consume(view, request, **kwargs):
+    """
+    Runs a view and reads its whole body, returning (seconds, bytes, peak traced memory).
+    Time and memory come from separate runs, since tracing slows Python down a lot.
+    """
+    start = time.perf_counter()
+    size = _read(view, request, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    _read(view, request, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--list-rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from vendors.views import VendorExportView, VendorBookingViewSet
+
+    factory = APIRequestFactory()
+    vendor_user = seed(args.rows)
+    export_view = VendorExportView.as_view()
+    list_view = VendorBookingViewSet.as_view({'get': 'list'})
+
+    results = []
+    for export_format in ('csv', 'jsonl'):
+        request = factory.get(f'/api/vendors/my-export/bookings/{export_format}/')
+        force_authenticate(request, vendor_user)
+        elapsed, size, peak = consume(export_view, request, dataset='bookings', export_format=export_format)
+        results.append((f'export {export_format}', f'{args.rows:,}', f'{args.rows / elapsed:,.0f}',
+                        f'{size / 1e6:,.1f} MB', f'{peak / 1e6:,.1f} MB'))
+
+    if args.rows <= args.list_rows:
+        request = factory.get('/api/vendors/my-bookings/')
+        force_authenticate(request, vendor_user)
+        elapsed, size, peak = consume(list_view, request)
+        results.append(('JSON list', f'{args.rows:,}', f'{args.rows / elapsed:,.0f}',
+                        f'{size / 1e6:,.1f} MB', f'{peak / 1e6:,.1f} MB'))
+
+    print_table(('endpoint', 'rows', 'rows/s', 'body', 'peak memory'), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# In benchmarks/jobs.py
+"""
+Throughput of the background job queue (jobs/services.py): enqueueing, and
+draining the queue through a `run_jobs` worker.
+
+    python -m benchmarks.jobs --jobs 5000 --concurrency 8 --job-ms 0
+
+Each job sleeps for --job-ms, standing in for a call to a third-party API.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import setup_django, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--job-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    setup_django(on_disk=True)
+    from jobs.models import Job
+    from jobs.registry import register
+    from jobs.services import enqueue
+    from jobs.worker import Worker
+
+    @register('benchmarks.sleep')
+    def sleep(job):
+        time.sleep(args.job_ms / 1000)
+
+    started = time.perf_counter()
+    for n in range(args.jobs):
+        enqueue('benchmarks.sleep', {'n': n})
+    enqueue_seconds = time.perf_counter() - started
+
+    worker = Worker(concurrency=args.concurrency, kinds=['benchmarks.sleep'], poll_interval=0.1)
+    started = time.perf_counter()
+    thread = threading.Thread(target=worker.run, kwargs={'exit_when_idle': True})
+    thread.start()
+    thread.join()
+    run_seconds = time.perf_counter() - started
+
+    succeeded = Job.objects.filter(status=Job.Status.SUCCEEDED).count()
+    assert succeeded == args.jobs, succeeded
+    print(f'{args.jobs} jobs, {args.concurrency} worker threads, {args.job_ms:.0f} ms per job')
+    print_table(
+        ['phase', 'seconds', 'jobs/minute'],
+        [
+            ('enqueue', f'{enqueue_seconds:.2f}', f'{args.jobs / enqueue_seconds * 60:,.0f}'),
+            ('claim + run + complete', f'{run_seconds:.2f}', f'{args.jobs / run_seconds * 60:,.0f}'),
+        ]
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# In benchmarks/profile.py
+"""
+GET /api/auth/profile/ throughput: serializing the profile on every request
+versus serving the pre-rendered bytes (users/profile_cache.py), with and
+without a matching If-None-Match.
+
+    python -m benchmarks.profile [--repeat 2000]
+
+Requests go through the full Django stack with a real access token. The
+serializing variant still reads the user from the shared user cache, as the
+view did before, so the difference is the serializer and renderer work.
+"""
+import argparse
+
+from benchmarks.common import setup_django, measure, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from contextlib import nullcontext
+    from unittest import mock
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework import generics
+    from users.profile_cache import get_profile_cache_stats
+    from users.views import UserProfileView
+    from utils.metrics import metrics
+
+    User.objects.create_user(username='bench-profile', email='bench@example.com', password='StrongPassword123')
+    client = Client()
+    access = client.post(
+        '/api/auth/login/', {'username': 'bench-profile', 'password': 'StrongPassword123'}, content_type='application/json'
+    ).json()['access']
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+    etag = client.get('/api/auth/profile/', **headers)['ETag']
+
+    variants = [
+        ('serializer', mock.patch.object(UserProfileView, 'retrieve', generics.RetrieveUpdateAPIView.retrieve), {}, 200),
+        ('pre-rendered', nullcontext(), {}, 200),
+        ('pre-rendered, If-None-Match', nullcontext(), {'HTTP_IF_NONE_MATCH': etag}, 304),
+    ]
+    metrics.reset('profile_cache.')
+    rows = []
+    for label, variant, extra, expected in variants:
+        with variant:
+            def fetch():
+                response = client.get('/api/auth/profile/', **headers, **extra)
+                assert response.status_code == expected, response.status_code
+                return response
+
+            seconds, response = measure(fetch, repeat=args.repeat, warmup=10)
+            with CaptureQueriesContext(connection) as queries:
+                fetch()
+        rows.append((label, len(queries), len(response.content), f'{seconds * 1e6:.0f}', f'{1 / seconds:,.0f}'))
+
+    print_table(['profile GET', 'queries', 'bytes', 'µs', 'requests/s'], rows)
+    stats = get_profile_cache_stats()
+    print(f"\ncache: {stats['hits']:,} hits, {stats['misses']:,} misses, {stats['not_modified']:,} not modified")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# In benchmarks/serialization.py
+"""
+Serialization time and payload size per list endpoint, comparing the default
+(compact) representation, ?expand= of every nested object and a sparse ?fields=.
+
+    python -m benchmarks.serialization [--rows 500]
+"""
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks.common import setup_django, measure, print_table
+
+
+def seed(rows):
+    from django.contrib.auth.models import User
+    from planner.models import Destination, Itinerary, ItineraryItem
+    from vendors.models import Vendor, Service, Booking
+    from messaging.models import Conversation, Message
+
+    tourist = User.objects.create_user(username='bench-tourist', password='x')
+    vendor_user = User.objects.create_user(username='bench-vendor', password='x')
+    vendor = Vendor.objects.create(user=vendor_user, business_name='Bench Tours', contact_phone='0300', is_verified=True)
+    services = Service.objects.bulk_create([
+        Service(vendor=vendor, name=f'Service {i}', description='Lorem ipsum dolor sit amet. ' * 40,
+                service_type='HOTEL', price=Decimal('100.00'), city='Skardu')
+        for i in range(50)
+    ])
+    Booking.objects.bulk_create([
+        Booking(user=tourist, service=services[i % len(services)], service_start_date=date(2025, 7, 1),
+                total_price=Decimal('100.00'))
+        for i in range(rows)
+    ])
+
+    destinations = Destination.objects.bulk_create([
+        Destination(name=f'Destination {i}', description='A breathtaking valley. ' * 60, city='Skardu',
+                    country='Pakistan', destination_type='PARK')
+        for i in range(50)
+    ])
+    itinerary = Itinerary.objects.create(
+        user=tourist, name='Long trip', start_date=date(2025, 7, 1), end_date=date(2025, 7, 1) + timedelta(days=30)
+    )
+    ItineraryItem.objects.bulk_create([
+        ItineraryItem(itinerary=itinerary, destination=destinations[i % len(destinations)], day_number=i % 30 + 1)
+        for i in range(rows)
+    ])
+
+    for i, service in enumerate(services):
+        conversation = Conversation.objects.create(service=service, tourist=tourist, vendor=vendor_user)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=tourist, body=f'Message {j}') for j in range(10)
+        ])
+    return tourist, itinerary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    tourist, itinerary = seed(args.rows)
+    client = APIClient()
+    client.force_authenticate(tourist)
+
+    cases = [
+        ('bookings', '/api/vendors/bookings/', 'service', 'id,status,service.name'),
+        ('itinerary items', f'/api/planner/itineraries/{itinerary.id}/items/', 'destination', 'id,day_number,destination.name'),
+        ('conversations', '/api/messaging/conversations/', '', 'id,service_name,updated_at'),
+    ]
+    rows = []
+    for name, url, expand, fields in cases:
+        variants = [('default', url)]
+        if expand:
+            variants.append(('expanded', f'{url}?expand={expand}'))
+        variants.append(('sparse', f'{url}?fields={fields}'))
+        for label, variant_url in variants:
+            seconds, response = measure(lambda: client.get(variant_url), repeat=args.repeat)
+            with CaptureQueriesContext(connection) as queries:
+                client.get(variant_url)
+            rows.append((name, label, f'{seconds * 1000:.1f} ms', f'{len(response.content):,} B', len(queries)))
+
+    print_table(('endpoint', 'variant', 'median time', 'payload', 'queries'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# In benchmarks/token_refresh.py
+"""
+Cost of the token blacklist check on refresh, querying BlacklistedToken
+every time versus going through the revoked-token Bloom filter
+(users/tokens.py).
+
+    python -m benchmarks.token_refresh [--blacklisted 50000]
+
+The blacklist table holds --blacklisted revoked tokens; the token being
+refreshed isn't one of them, as for nearly every real refresh.
+"""
+import argparse
+import uuid
+from datetime import timedelta
+
+from benchmarks.common import setup_django, measure, print_table
+
+
+def make_fixture(blacklisted):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+    user = User.objects.create_user(username='bench-refresh', password='StrongPassword123')
+    expires_at = timezone.now() + timedelta(days=1)
+    batch = 10_000
+    for start in range(0, blacklisted, batch):
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=user, jti=uuid.uuid4().hex, token='-', expires_at=expires_at)
+            for _ in range(min(batch, blacklisted - start))
+        ])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--blacklisted', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from contextlib import nullcontext
+    from unittest import mock
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.tokens import TouristaRefreshToken, get_revoked_token_filter
+
+    make_fixture(args.blacklisted)
+    client = Client()
+    refresh = client.post(
+        '/api/auth/login/', {'username': 'bench-refresh', 'password': 'StrongPassword123'},
+        content_type='application/json',
+    ).json()['refresh']
+    token = TouristaRefreshToken(refresh)
+    get_revoked_token_filter().might_contain('warm-up')
+
+    variants = {
+        'blacklist query': mock.patch.object(TouristaRefreshToken, 'check_blacklist', RefreshToken.check_blacklist),
+        'Bloom filter': nullcontext(),
+    }
+    rows = []
+    for label, variant in variants.items():
+        with variant:
+            check, _ = measure(token.check_blacklist, repeat=args.repeat * 10)
+
+            def fetch():
+                response = client.post('/api/auth/login/refresh/', {'refresh': refresh}, content_type='application/json')
+                assert response.status_code == 200, response.content
+
+            endpoint, _ = measure(fetch, repeat=args.repeat)
+            with CaptureQueriesContext(connection) as queries:
+                token.check_blacklist()
+        rows.append((label, len(queries), f'{check * 1e6:.1f}', f'{endpoint * 1000:.2f}'))
+
+    bloom = get_revoked_token_filter()._bloom
+    print(f'{args.blacklisted:,} blacklisted tokens, filter of {len(bloom.bits) / 1024:.0f} KiB')
+    print_table(['blacklist check', 'queries', 'check µs', 'refresh ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# In benchmarks/translation.py
+"""
+Latency of utils.translation.translate() on a cache miss, a shared-store hit
+and an in-process LRU hit.
+
+    python -m benchmarks.translation
+    python -m benchmarks.translation --live   # call the real upstream service
+
+By default the upstream service is replaced with a stand-in that sleeps for
+--upstream-ms, so the numbers don't depend on the network.
+"""
+import argparse
+import time
+from unittest import mock
+
+from benchmarks.common import setup_django, measure, print_table
+
+PHRASES = ['How much per night?', 'Is breakfast included?', 'Where is the bus stop?', 'Thank you very much']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--upstream-ms', type=float, default=150)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from utils import translation
+    from utils.models import TranslationEntry
+
+    def fake_upstream(text, target, source):
+        time.sleep(args.upstream_ms / 1000)
+        return (text[::-1], 'en')
+
+    patcher = None if args.live else mock.patch.object(translation, 'translate_upstream', fake_upstream)
+    if patcher:
+        patcher.start()
+
+    misses = []
+    for phrase in PHRASES:
+        start = time.perf_counter()
+        translation.translate(phrase, 'ur')
+        misses.append(time.perf_counter() - start)
+
+    translation.clear_local_cache()
+    store_hits = []
+    for phrase in PHRASES:
+        start = time.perf_counter()
+        translation.translate(phrase, 'ur')
+        store_hits.append(time.perf_counter() - start)
+
+    lru_hit, _ = measure(lambda: translation.translate(PHRASES[0], 'ur'), repeat=args.repeat, warmup=10)
+
+    if patcher:
+        patcher.stop()
+    print_table(
+        ['path', 'median latency (ms)'],
+        [
+            ('miss (upstream)', f'{sorted(misses)[len(misses) // 2] * 1000:.3f}'),
+            ('shared store hit', f'{sorted(store_hits)[len(store_hits) // 2] * 1000:.3f}'),
+            ('in-process LRU hit', f'{lru_hit * 1000:.4f}'),
+        ]
+    )
+    print(f"\n{TranslationEntry.objects.count()} entries in the shared store; stats: {translation.get_translation_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# In benchmarks/weather_alerts.py
+"""
+Time to evaluate the weather alert rules (planner/alerts.py) for every
+active itinerary.
+
+    python -m benchmarks.weather_alerts --itineraries 100000 --cities 200
+
+Each itinerary visits three random cities on its first three days; every
+city has a stored forecast for the next six days, and each rule is crossed
+by a few percent of them. A first run creates the alerts, a second run
+re-checks them (the steady state when run from cron), and a third follows a
+change of every rule's threshold.
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.common import setup_django, print_table
+
+
+def make_fixture(itineraries, cities, rules):
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from planner.models import Destination, Itinerary, ItineraryItem, WeatherForecast, WeatherRule
+
+    rng = random.Random(42)
+    today = timezone.localdate()
+    user = User.objects.create_user(username='bench-alerts', password='!')
+    destinations = Destination.objects.bulk_create([
+        Destination(name=f'Place {n}', description='-', city=f'City {n}', country='Pakistan', destination_type='PARK')
+        for n in range(cities)
+    ])
+    WeatherForecast.objects.bulk_create([
+        WeatherForecast(
+            city=f'City {n}', date=today + timedelta(days=offset), temperature=rng.uniform(-5, 40),
+            feels_like=20.0, description='clouds', icon_code='03d', temp_min=rng.uniform(-12, 20),
+            temp_max=rng.uniform(10, 42), precipitation=rng.expovariate(0.3), snow=rng.expovariate(1),
+            wind_speed=rng.uniform(0, 20), fetched_at=timezone.now(),
+        )
+        for n in range(cities) for offset in range(6)
+    ])
+    metrics = ['temp_min', 'temp_max', 'precipitation', 'snow', 'wind_speed']
+    WeatherRule.objects.bulk_create([
+        WeatherRule(
+            name=f'Rule {n}', metric=metrics[n % len(metrics)], comparison='BELOW' if n % 5 == 0 else 'ABOVE',
+            threshold=[-10, 40, 15, 5, 19][n % 5], message='{value} in {city} on {date}',
+        )
+        for n in range(rules)
+    ])
+
+    batch = 10_000
+    for start in range(0, itineraries, batch):
+        trips = Itinerary.objects.bulk_create([
+            Itinerary(
+                user=user, name='Bench', start_date=today + timedelta(days=rng.randrange(4)),
+                end_date=today + timedelta(days=6),
+            )
+            for _ in range(min(batch, itineraries - start))
+        ])
+        ItineraryItem.objects.bulk_create([
+            ItineraryItem(itinerary=trip, destination=rng.choice(destinations), day_number=day)
+            for trip in trips for day in (1, 2, 3)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--itineraries', type=int, default=100_000)
+    parser.add_argument('--cities', type=int, default=200)
+    parser.add_argument('--rules', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import F
+    from planner.alerts import evaluate_weather_rules
+    from planner.models import WeatherRule
+
+    make_fixture(args.itineraries, args.cities, args.rules)
+    rows = []
+    for run in ('first run', 'unchanged', 'thresholds changed'):
+        if run == 'thresholds changed':
+            WeatherRule.objects.update(threshold=F('threshold') * 0.9)
+        start = time.perf_counter()
+        alerts = evaluate_weather_rules()
+        rows.append((run, f'{alerts:,}', f'{time.perf_counter() - start:.2f}'))
+
+    print(f'{args.itineraries:,} itineraries, {args.cities} cities, {args.rules} rules')
+    print_table(['evaluation', 'alerts', 'seconds'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# In benchmarks/websocket_idle.py
+"""
+Memory per idle WebSocket connection and event fan-out latency for the
+real-time messaging application (messaging/realtime.py).
+
+    python -m benchmarks.websocket_idle --connections 10000
+
+Connections are driven in-process through the ASGI interface, so the numbers
+cover the application's own cost (task, queue, subscription) and not the
+server's sockets and buffers.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.common import setup_django, print_table
+
+
+def make_users(count):
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    User.objects.bulk_create([User(username=f'bench-ws-{i}', password='!') for i in range(count)])
+    return [(user.pk, str(AccessToken.for_user(user))) for user in User.objects.filter(username__startswith='bench-ws-')]
+
+
+class IdleConnection:
+    def __init__(self, user_id, token):
+        from messaging.realtime import websocket_application
+
+        self.user_id = user_id
+        self.inbound = asyncio.Queue()
+        self.outbound = asyncio.Queue()
+        scope = {'type': 'websocket', 'path': '/ws/messaging/', 'query_string': f'token={token}'.encode()}
+        self.task = asyncio.ensure_future(websocket_application(scope, self.inbound.get, self.outbound.put))
+
+    async def open(self):
+        await self.inbound.put({'type': 'websocket.connect'})
+        accepted = await self.outbound.get()
+        assert accepted['type'] == 'websocket.accept', accepted
+
+    async def close(self):
+        await self.inbound.put({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+async def run(users, fanout_sizes, rounds):
+    from messaging.pubsub import get_pubsub, user_channel
+
+    pubsub = get_pubsub()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    connections = [IdleConnection(user_id, token) for user_id, token in users]
+    for connection in connections:
+        await connection.open()
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(0)
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / len(connections)
+    tracemalloc.stop()
+
+    # Fan-out: one event published to each of `size` users, timed until every connection has sent it
+    event = {'type': 'message.created', 'conversation': 1, 'message': {}}
+    rows = []
+    for size in fanout_sizes:
+        group = connections[:size]
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for connection in group:
+                pubsub.publish(user_channel(connection.user_id), event)
+            for connection in group:
+                await connection.outbound.get()
+            latencies.append(time.perf_counter() - start)
+        rows.append((size, f'{statistics.median(latencies) * 1000:.2f}', f'{max(latencies) * 1000:.2f}'))
+
+    for connection in connections:
+        await connection.close()
+    return connect_seconds, per_connection, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    users = make_users(args.connections)
+    fanout_sizes = [size for size in (1, 100, 1000, 10000) if size <= args.connections]
+    connect_seconds, per_connection, rows = asyncio.run(run(users, fanout_sizes, args.rounds))
+
+    print(f'{args.connections} idle connections opened in {connect_seconds:.1f}s '
+          f'({per_connection / 1024:.1f} KiB of Python memory each)\n')
+    print_table(['connections', 'fan-out median (ms)', 'fan-out max (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main()
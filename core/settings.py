@@ -44,6 +44,8 @@ INSTALLED_APPS = [
     'administration',
     'messaging',
     'feedback',
+    'sync',
+    'jobs',
     # Third-party apps for docs
     'drf_spectacular',
     # JWT Blacklist App
@@ -78,6 +80,9 @@ TEMPLATES = [
     },
 ]
 
+# `runserver` and WSGI servers use this. Deploy core.asgi.application (see
+# core/asgi.py) instead: the WebSocket endpoint and the async views need it,
+# the latter to share their upstream connections (see utils/integrations.py)
 WSGI_APPLICATION = 'core.wsgi.application'
 
 
@@ -92,6 +97,98 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The local-memory cache is per process. Use a shared backend (e.g. Redis) in
+# production so cache invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Pub/sub used to push messaging events to WebSocket connections (see
+# messaging/pubsub.py). The in-memory backend only reaches connections served
+# by the same process.
+MESSAGING_PUBSUB_BACKEND = 'messaging.pubsub.InMemoryPubSub'
+
+# Events a WebSocket connection may fall behind by before it is closed (see
+# messaging/realtime.py)
+MESSAGING_WEBSOCKET_QUEUE_SIZE = 100
+
+# Full-text search over messages (see messaging/search.py)
+MESSAGING_SEARCH_BACKEND = 'messaging.search.TokenIndexSearch'
+
+# Entries kept in each worker's in-process translation cache (see utils/translation.py)
+TRANSLATION_LRU_SIZE = 10_000
+# Upstream translation calls a worker process runs at the same time
+TRANSLATION_MAX_CONCURRENCY = 8
+# Queue a job that translates messages right after they're sent (see
+# messaging/translations.py); when off, run `translate_pending_messages`
+MESSAGE_TRANSLATION_IN_BACKGROUND = True
+
+# Seconds a user and their profile stay in the shared cache for the views that
+# need more than the token claims (see users/authentication.py); saves clear it
+USER_CACHE_TIMEOUT = 60
+
+# Seconds after issue an access token's user and vendor claims are trusted
+# without the database (see users/authentication.py). Deactivations and
+# vendor status changes reach every worker within this time; staff and
+# superuser claims are always checked against the database.
+TOKEN_CLAIMS_MAX_AGE = 5 * 60
+
+# Seconds the rendered GET /api/auth/profile/ response stays in the shared cache
+# (see users/profile_cache.py); User and UserProfile saves clear it before then
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# Revoked refresh tokens (see users/tokens.py): each process checks a Bloom
+# filter of blacklisted JTIs before querying the blacklist. It pulls new
+# entries at most this many seconds apart, re-reading the last
+# TOKEN_BLACKLIST_SYNC_OVERLAP entries in case they were committed out of
+# order, and is rebuilt without the expired ones every
+# TOKEN_BLACKLIST_FILTER_REBUILD seconds. Expired tokens are deleted from the
+# tables every TOKEN_FLUSH_INTERVAL seconds by a background job
+TOKEN_BLACKLIST_SYNC_INTERVAL = 1
+TOKEN_BLACKLIST_SYNC_OVERLAP = 200
+TOKEN_BLACKLIST_FILTER_REBUILD = 600
+TOKEN_FLUSH_INTERVAL = 24 * 60 * 60
+
+# Background jobs (see jobs/services.py): a job still running this many seconds
+# after it was claimed is assumed to have lost its worker and is requeued
+JOBS_LEASE_SECONDS = 300
+
+# Weather forecasts (see planner/services.py): `prefetch_weather_forecasts`
+# stores them for the itineraries starting within this many days (OpenWeather's
+# forecast covers five), and weather alerts use stored forecasts younger than
+# WEATHER_FORECAST_MAX_AGE seconds instead of calling OpenWeather
+WEATHER_PREFETCH_DAYS = 5
+WEATHER_FORECAST_MAX_AGE = 6 * 60 * 60
+
+# Third-party services, called through utils/integrations.py. Each entry may
+# set base_url, connect_timeout / read_timeout (seconds), retries, backoff,
+# failure_threshold / reset_timeout (circuit breaker) and max_concurrency /
+# async_max_concurrency (bulkheads for sync callers and for async views);
+# anything left out takes the defaults in that module.
+INTEGRATIONS = {
+    'openweather': {
+        'base_url': 'http://api.openweathermap.org',
+        'read_timeout': 5,
+    },
+    'openrouteservice': {
+        'base_url': 'https://api.openrouteservice.org',
+        'read_timeout': 15,
+        'retries': 1,
+        # Directions are computed, not stored, so a POST is safe to repeat
+        'retry_methods': ('POST',),
+    },
+    'googletrans': {
+        'retries': 1,
+        'max_concurrency': TRANSLATION_MAX_CONCURRENCY,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -138,9 +235,17 @@ CORS_ALLOW_ALL_ORIGINS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Avatar processing (see users/avatars.py): the square thumbnail sizes generated
+# for every upload (each in WebP and JPEG), the largest side of the full-size
+# copy, and the largest upload accepted
+AVATAR_THUMBNAIL_SIZES = (64, 128, 256)
+AVATAR_MAX_DIMENSION = 1024
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # SimpleJWT's JWTAuthentication, minus the user query (see users/authentication.py)
+        'users.authentication.ClaimsJWTAuthentication',
     ),
 
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -191,8 +296,9 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    # Our serializers add the vendor_id / vendor_verified claims (see vendors/context.py)
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TouristaTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TouristaTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -1,10 +1,11 @@
 # In core/urls.py
 
 from django.contrib import admin
-from django.urls import path, include  
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from users.views import serve_avatar
 
 
 urlpatterns = [
@@ -16,6 +17,14 @@ urlpatterns = [
     path('api/admin/', include('administration.urls')),
     path('api/messaging/', include('messaging.urls')),
     path('api/feedback/', include('feedback.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/jobs/', include('jobs.urls')),
+
+    # Processed avatars and their thumbnails, with long-lived cache headers (see users/avatars.py)
+    re_path(
+        rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>avatars/[0-9a-f]{{2}}/[0-9a-f]{{64}}/(?:full|\d+)\.(?:jpg|webp))$',
+        serve_avatar, name='avatar-file',
+    ),
 
     # DOCUMENTATION ROUTES
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Background jobs, for checking on failures and stuck work."""
+    list_display = ('id', 'kind', 'status', 'attempts', 'user', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    raw_id_fields = ('user',)
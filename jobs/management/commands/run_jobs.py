@@ -0,0 +1,25 @@
+# In jobs/management/commands/run_jobs.py
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the job queue until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Jobs to run at the same time.")
+        parser.add_argument('--kind', action='append', dest='kinds', help="Only run jobs of this type (repeatable).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no jobs are due.")
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'], kinds=options['kinds'], poll_interval=options['poll_interval']
+        )
+        self.stdout.write(f"Worker {worker.name} running up to {worker.concurrency} jobs at a time.")
+        try:
+            worker.run(exit_when_idle=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+        self.stdout.write(self.style.SUCCESS(f"Processed {worker.processed} jobs."))
@@ -0,0 +1,56 @@
+# In jobs/models.py
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by `python manage.py run_jobs`.
+
+    A QUEUED job becomes RUNNING when a worker claims it, then SUCCEEDED (with
+    its `result`) or, once it has failed as many times as its job type allows,
+    FAILED (with the last `error`). Failed attempts before that put it back in
+    the queue, to be retried after `run_after`.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+        FAILED = 'FAILED', 'Failed'
+
+    kind = models.CharField(max_length=100, help_text="The registered job type, e.g. 'planner.optimize_route'.")
+    key = models.CharField(
+        max_length=255, null=True, blank=True,
+        help_text="Deduplication key: only one queued or running job per kind and key."
+    )
+    # The user who asked for the work; only they (and staff) can see the job
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Which worker claim the running job belongs to, and when it was claimed
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'key'], condition=Q(status__in=['QUEUED', 'RUNNING']), name='job_active_key'
+            ),
+        ]
+        indexes = [
+            # Claiming: WHERE status = 'QUEUED' AND run_after <= now ORDER BY run_after, id
+            models.Index(fields=['run_after', 'id'], name='job_queue', condition=Q(status='QUEUED')),
+            # Per-kind concurrency limits and lost-worker recovery
+            models.Index(fields=['kind', 'claimed_at'], name='job_running', condition=Q(status='RUNNING')),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.get_status_display()})"
@@ -0,0 +1,51 @@
+# In jobs/registry.py
+"""
+Job types. Each app declares its own in a `jobs.py` module, which is imported
+when the jobs app starts:
+
+    from jobs.registry import register
+
+    @register('planner.optimize_route', concurrency=4)
+    def optimize_route(job):
+        ...
+        return {...}  # stored as the job's result; must be JSON-serializable
+
+A handler that raises is retried up to `max_attempts` times in all, waiting
+`retry_delay` seconds before the first retry and twice as long before each
+next one. `concurrency` caps how many jobs of the type run at once across all
+workers (None for no cap).
+"""
+
+
+class JobType:
+    __slots__ = ('kind', 'handler', 'concurrency', 'max_attempts', 'retry_delay')
+
+    def __init__(self, kind, handler, concurrency=None, max_attempts=3, retry_delay=10):
+        self.kind = kind
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+
+_registry = {}
+
+
+def register(kind, concurrency=None, max_attempts=3, retry_delay=10):
+    """Decorator registering `handler(job)` as the job type `kind`."""
+    def decorator(handler):
+        _registry[kind] = JobType(kind, handler, concurrency, max_attempts, retry_delay)
+        return handler
+    return decorator
+
+
+def get_job_type(kind):
+    """Returns the JobType registered as `kind`. Raises LookupError for an unknown kind."""
+    try:
+        return _registry[kind]
+    except KeyError:
+        raise LookupError(f"Unknown job type: {kind}") from None
+
+
+def job_types():
+    return dict(_registry)
@@ -0,0 +1,13 @@
+# In jobs/serializers.py
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """A job's status, and its result once it has finished."""
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'attempts', 'result', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,179 @@
+# In jobs/services.py
+"""
+A small database-backed job queue.
+
+`enqueue()` adds a job (or returns the queued/running one with the same kind
+and key). Workers claim jobs in batches:
+
+- on PostgreSQL with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers
+  never block on, or double-claim, the same rows;
+- on SQLite, which has no row locks but only ever one writer, with a single
+  UPDATE ... WHERE id IN (SELECT ... LIMIT n) that marks the batch as ours.
+
+Each claim writes a unique token to `claimed_by`; completing or failing a job
+only takes effect if the token still matches, so a job requeued after its
+worker was presumed lost can't be finished twice.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Subquery
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_job_type, job_types
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (Job.Status.QUEUED, Job.Status.RUNNING)
+DEFAULT_LEASE_SECONDS = 300
+
+
+def enqueue(kind, payload=None, key=None, user=None, delay=0):
+    """
+    Queues a job of type `kind`. With a `key`, a queued or running job of the
+    same kind and key is returned instead of adding another one.
+    Returns (job, created).
+    """
+    get_job_type(kind)
+    if key is not None:
+        existing = Job.objects.filter(kind=kind, key=key, status__in=ACTIVE_STATUSES).first()
+        if existing is not None:
+            return existing, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind, key=key, user=user, payload=payload or {},
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Someone else queued the same key first
+        return Job.objects.get(kind=kind, key=key, status__in=ACTIVE_STATUSES), False
+    return job, True
+
+
+def _claim_batch(queryset, limit, worker_id, now):
+    if limit <= 0:
+        return []
+    token = f'{worker_id}:{uuid.uuid4().hex[:12]}'
+    claim = {
+        'status': Job.Status.RUNNING, 'claimed_by': token, 'claimed_at': now, 'attempts': F('attempts') + 1,
+    }
+    queryset = queryset.order_by('run_after', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(queryset.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids).update(**claim)
+    else:
+        # The status check is repeated so a row claimed in between isn't taken twice
+        claimed = Job.objects.filter(
+            id__in=Subquery(queryset.values('id')[:limit]), status=Job.Status.QUEUED
+        ).update(**claim)
+        if not claimed:
+            return []
+    return list(Job.objects.filter(claimed_by=token, status=Job.Status.RUNNING).order_by('id'))
+
+
+def claim_jobs(worker_id, limit, kinds=None, now=None):
+    """
+    Claims up to `limit` due jobs for the worker `worker_id`, marking them
+    RUNNING. `kinds` restricts the job types; job types with a concurrency
+    limit only get the slots they have left.
+    """
+    now = now or timezone.now()
+    registered = job_types()
+    kinds = [kind for kind in (kinds or registered) if kind in registered]
+    limited = {kind: registered[kind].concurrency for kind in kinds if registered[kind].concurrency is not None}
+    unlimited = [kind for kind in kinds if kind not in limited]
+
+    due = Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now)
+    claimed = []
+    if limited:
+        running = dict(
+            Job.objects.filter(status=Job.Status.RUNNING, kind__in=limited)
+            .values_list('kind').annotate(count=Count('id')).order_by()
+        )
+        for kind, concurrency in limited.items():
+            slots = min(concurrency - running.get(kind, 0), limit - len(claimed))
+            claimed += _claim_batch(due.filter(kind=kind), slots, worker_id, now)
+    if unlimited:
+        claimed += _claim_batch(due.filter(kind__in=unlimited), limit - len(claimed), worker_id, now)
+    return claimed
+
+
+def complete_job(job, result):
+    finished = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by, status=Job.Status.RUNNING).update(
+        status=Job.Status.SUCCEEDED, result=result, error='', finished_at=timezone.now()
+    )
+    return bool(finished)
+
+
+def fail_job(job, error, max_attempts):
+    """Requeues `job` with exponential backoff, or marks it FAILED once it has used up its attempts."""
+    now = timezone.now()
+    mine = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by, status=Job.Status.RUNNING)
+    if job.attempts >= max_attempts:
+        return bool(mine.update(status=Job.Status.FAILED, error=error, finished_at=now))
+    retry_delay = get_job_type(job.kind).retry_delay * 2 ** (job.attempts - 1)
+    return bool(mine.update(
+        status=Job.Status.QUEUED, error=error, claimed_by='', claimed_at=None,
+        run_after=now + timedelta(seconds=retry_delay),
+    ))
+
+
+def run_job(job):
+    """Runs a claimed job in the current thread. Returns True if it succeeded."""
+    try:
+        job_type = get_job_type(job.kind)
+    except LookupError as e:
+        fail_job(job, str(e), max_attempts=0)
+        return False
+
+    try:
+        result = job_type.handler(job)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.kind, job.attempts)
+        fail_job(job, f"{e.__class__.__name__}: {e}", job_type.max_attempts)
+        return False
+    return complete_job(job, result)
+
+
+def requeue_lost_jobs(lease_seconds=None, now=None):
+    """
+    Requeues jobs that have been RUNNING for longer than the lease, on the
+    assumption that their worker died. Returns the number of jobs requeued or failed.
+    """
+    if lease_seconds is None:
+        lease_seconds = getattr(settings, 'JOBS_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    now = now or timezone.now()
+    lost = Job.objects.filter(status=Job.Status.RUNNING, claimed_at__lt=now - timedelta(seconds=lease_seconds))
+    count = 0
+    for job in lost:
+        try:
+            max_attempts = get_job_type(job.kind).max_attempts
+        except LookupError:
+            max_attempts = 0
+        count += fail_job(job, "The worker running this job stopped responding.", max_attempts)
+    return count
+
+
+def work_off(worker_id='inline', kinds=None, batch_size=100):
+    """
+    Runs due jobs one after another in the current thread until none are left.
+    Returns (succeeded, failed).
+    """
+    succeeded = failed = 0
+    while True:
+        jobs = claim_jobs(worker_id, batch_size, kinds)
+        if not jobs:
+            return succeeded, failed
+        for job in jobs:
+            if run_job(job):
+                succeeded += 1
+            else:
+                failed += 1
@@ -0,0 +1,160 @@
+# In jobs/tests.py
+
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from planner.models import Destination, Itinerary, ItineraryItem
+from utils.tests import StubUpstream, stub_integration
+from .models import Job
+from .registry import register
+from .services import claim_jobs, enqueue, requeue_lost_jobs, run_job, work_off
+
+calls = []
+
+
+@register('tests.echo')
+def echo(job):
+    calls.append(job.payload)
+    return {'echo': job.payload}
+
+
+@register('tests.flaky', max_attempts=2, retry_delay=60)
+def flaky(job):
+    raise ConnectionError('upstream went away')
+
+
+@register('tests.limited', concurrency=2)
+def limited(job):
+    return None
+
+
+class JobQueueTest(APITestCase):
+    """
+    Test suite for the database-backed job queue and GET /api/jobs/<id>/.
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+
+    def test_enqueue_dedupes_active_jobs_by_key(self):
+        first, created = enqueue('tests.echo', {'n': 1}, key='same')
+        second, created_again = enqueue('tests.echo', {'n': 2}, key='same')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+
+        work_off(kinds=['tests.echo'])
+        # Once finished, the key is free again
+        third, created = enqueue('tests.echo', {'n': 3}, key='same')
+        self.assertTrue(created)
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_unknown_job_types_are_rejected(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+    def test_claims_never_overlap(self):
+        for n in range(5):
+            enqueue('tests.echo', {'n': n})
+        first = claim_jobs('worker-a', 3, kinds=['tests.echo'])
+        second = claim_jobs('worker-b', 3, kinds=['tests.echo'])
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertTrue(all(job.status == Job.Status.RUNNING and job.attempts == 1 for job in first + second))
+        self.assertEqual(claim_jobs('worker-c', 3, kinds=['tests.echo']), [])
+
+    def test_concurrency_limit_per_job_type(self):
+        for n in range(5):
+            enqueue('tests.limited', {'n': n})
+
+        claimed = claim_jobs('worker-a', 10, kinds=['tests.limited'])
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(claim_jobs('worker-b', 10, kinds=['tests.limited']), [])
+
+        run_job(claimed[0])
+        self.assertEqual(len(claim_jobs('worker-b', 10, kinds=['tests.limited'])), 1)
+
+    def test_failures_are_retried_with_backoff_then_fail(self):
+        job, _ = enqueue('tests.flaky')
+        self.assertEqual(work_off(kinds=['tests.flaky']), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertIn('upstream went away', job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(work_off(kinds=['tests.flaky']), (0, 0))
+
+        later = job.run_after + timedelta(seconds=1)
+        [retry] = claim_jobs('worker-a', 1, kinds=['tests.flaky'], now=later)
+        run_job(retry)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_jobs_of_lost_workers_are_requeued(self):
+        job, _ = enqueue('tests.echo', {'n': 1})
+        [claimed] = claim_jobs('worker-a', 1, kinds=['tests.echo'])
+
+        self.assertEqual(requeue_lost_jobs(lease_seconds=60), 0)
+        self.assertEqual(requeue_lost_jobs(lease_seconds=60, now=timezone.now() + timedelta(minutes=2)), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+
+        # The presumed-dead worker finishing late doesn't overwrite the requeued job
+        self.assertFalse(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+
+    def test_status_endpoint_shows_own_jobs_only(self):
+        job, _ = enqueue('tests.echo', {'n': 1}, user=self.user)
+        url = reverse('job-detail', args=[job.pk])
+        self.assertEqual(self.client.get(url).data['status'], 'QUEUED')
+
+        work_off(kinds=['tests.echo'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'SUCCEEDED')
+        self.assertEqual(response.data['result'], {'echo': {'n': 1}})
+
+        self.client.force_authenticate(User.objects.create_user(username='other', password='StrongPassword123'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_route_can_be_calculated_in_the_background(self):
+        itinerary = Itinerary.objects.create(
+            user=self.user, name='GB trip', start_date=date(2025, 7, 1), end_date=date(2025, 7, 5)
+        )
+        for day, city in enumerate(['Skardu', 'Hunza'], 1):
+            destination = Destination.objects.create(
+                name=city, description='-', city=city, country='Pakistan', destination_type='PARK'
+            )
+            ItineraryItem.objects.create(itinerary=itinerary, destination=destination, day_number=day)
+        routes = StubUpstream().respond(200, {'features': [{
+            'geometry': {'coordinates': [[75.4, 35.0], [74.8, 36.3]]},
+            'properties': {'summary': {'distance': 180500, 'duration': 19800}},
+        }]})
+        self.addCleanup(routes.close)
+
+        url = reverse('itinerary-route', args=[itinerary.pk]) + '?background=true'
+        with override_settings(INTEGRATIONS=stub_integration('openrouteservice', routes.url)):
+            response = self.client.get(url)
+            again = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(again.data['id'], response.data['id'])
+            self.assertEqual(routes.requests, [])
+
+            work_off(kinds=['planner.optimize_route'])
+
+        result = self.client.get(response['Location']).data
+        self.assertEqual(result['status'], 'SUCCEEDED')
+        self.assertEqual(result['result']['total_distance_km'], 180.5)
@@ -0,0 +1,7 @@
+# In jobs/urls.py
+from django.urls import path
+from .views import JobDetailView
+
+urlpatterns = [
+    path('<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+]
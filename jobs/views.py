@@ -0,0 +1,37 @@
+# In jobs/views.py
+
+from django.urls import reverse
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+def wants_background(request):
+    """Whether the client asked for the work to be queued (`?background=true`) instead of done inline."""
+    return request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+
+def job_accepted_response(request, job):
+    """A 202 pointing the client at the job's status endpoint."""
+    url = request.build_absolute_uri(reverse('job-detail', args=[job.pk]))
+    data = dict(JobSerializer(job).data, status_url=url)
+    return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """
+    Status of a background job the user started.
+    Accessible at: GET /api/jobs/<id>/
+
+    Poll until `status` is SUCCEEDED (the outcome is in `result`) or FAILED
+    (the reason is in `error`).
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
@@ -0,0 +1,78 @@
+# In jobs/worker.py
+"""
+The job worker behind `python manage.py run_jobs`: a pool of threads fed by
+batched claims (see jobs/services.py). Several worker processes, on one
+machine or many, can share the same queue.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .services import DEFAULT_LEASE_SECONDS, claim_jobs, requeue_lost_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Runs up to `concurrency` jobs at a time until `stop()` is called."""
+
+    def __init__(self, concurrency=4, kinds=None, poll_interval=1.0, name=None):
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.processed = 0
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Stops claiming new jobs; the running ones are finished first."""
+        self._stopping.set()
+
+    def _run(self, job):
+        try:
+            return run_job(job)
+        except Exception:
+            # e.g. the database went away while recording the outcome; the
+            # job stays RUNNING and is requeued once its lease runs out
+            logger.exception("Recording the outcome of job %s failed", job.pk)
+        finally:
+            close_old_connections()
+
+    def run(self, exit_when_idle=False):
+        lease = getattr(settings, 'JOBS_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+        next_recovery = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as pool:
+            while not self._stopping.is_set():
+                if time.monotonic() >= next_recovery:
+                    requeued = requeue_lost_jobs(lease)
+                    if requeued:
+                        logger.warning("Requeued %s jobs whose worker stopped responding", requeued)
+                    next_recovery = time.monotonic() + lease / 2
+
+                free = self.concurrency - len(running)
+                jobs = claim_jobs(self.name, free, self.kinds) if free else []
+                close_old_connections()
+                for job in jobs:
+                    running.add(pool.submit(self._run, job))
+
+                if not jobs and not running and exit_when_idle:
+                    break
+                if running and (jobs or len(running) == self.concurrency):
+                    # Busy: come back as soon as a slot frees up
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                else:
+                    # Nothing more to claim right now
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    if not done and not running:
+                        self._stopping.wait(self.poll_interval)
+                self.processed += len(done)
+            done, _ = wait(running)
+            self.processed += len(done)
+        return self.processed
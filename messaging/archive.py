@@ -0,0 +1,188 @@
+# In messaging/archive.py
+"""
+Archival of old conversation history to compressed cold storage.
+
+`archive_idle_conversations` moves the messages of conversations that have
+been idle for a number of months out of the Message table into
+MessageArchiveSegment rows: append-only runs of up to `segment_size` messages,
+stored as zlib-compressed JSON. Each segment is written and its messages
+deleted in its own short transaction, so archival can run next to live
+traffic and be interrupted at any point.
+
+Archived history stays readable through the normal message endpoints:
+get_message_page (messaging/pagination.py) falls back to the segments once it
+runs out of hot messages. Archived messages are no longer found by search,
+and they are not reported as deleted to syncing clients.
+
+Unread archived messages count as read: the unread counts are lowered as
+they are archived.
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from sync import changelog
+from .models import Conversation, Message, MessageArchiveSegment, MessageSearchTerm
+from .services import _add_to_unread_total
+
+DEFAULT_IDLE_MONTHS = 12
+ARCHIVE_SEGMENT_SIZE = 500
+COMPRESSION_LEVEL = 6
+
+SEGMENT_FIELDS = ('id', 'sender_id', 'body', 'timestamp', 'is_read')
+
+
+def _encode(rows):
+    raw = json.dumps(
+        [[row['id'], row['sender_id'], row['body'], row['timestamp'].isoformat(), row['is_read']] for row in rows],
+        ensure_ascii=False, separators=(',', ':'),
+    ).encode()
+    return zlib.compress(raw, COMPRESSION_LEVEL), len(raw)
+
+
+def _decode(segment):
+    """Returns the segment's messages, oldest first, as (unsaved) Message instances."""
+    rows = json.loads(zlib.decompress(bytes(segment.data)))
+    return [
+        Message(
+            id=pk, conversation_id=segment.conversation_id, sender_id=sender_id,
+            body=body, timestamp=datetime.fromisoformat(timestamp), is_read=is_read,
+        )
+        for pk, sender_id, body, timestamp, is_read in rows
+    ]
+
+
+def _key(message):
+    return (message.timestamp, message.pk)
+
+
+def _attach_senders(messages):
+    senders = User.objects.only('id', 'username').in_bulk({message.sender_id for message in messages})
+    for message in messages:
+        message.sender = senders.get(message.sender_id)
+    return messages
+
+
+def get_archived_messages(conversation, before=None, after=None, limit=50):
+    """
+    Reads up to `limit` archived messages of `conversation`, with their senders:
+    - `before` (a (timestamp, id) key, or None for the newest): the messages just
+      older than it, newest first,
+    - `after`: the messages just newer than it, oldest first.
+    Segments are decompressed one at a time until the page is full.
+    """
+    segments = MessageArchiveSegment.objects.filter(conversation=conversation)
+    if after is not None:
+        timestamp, pk = after
+        segments = segments.filter(
+            Q(last_timestamp__gt=timestamp) | Q(last_timestamp=timestamp, last_message_id__gt=pk)
+        ).order_by('last_timestamp', 'last_message_id')
+        wanted = lambda message: _key(message) > after  # noqa: E731
+        newest_first = False
+    else:
+        if before is not None:
+            timestamp, pk = before
+            segments = segments.filter(
+                Q(first_timestamp__lt=timestamp) | Q(first_timestamp=timestamp, first_message_id__lt=pk)
+            )
+        segments = segments.order_by('-last_timestamp', '-last_message_id')
+        wanted = lambda message: before is None or _key(message) < before  # noqa: E731
+        newest_first = True
+
+    page = []
+    for segment in segments.iterator(chunk_size=4):
+        messages = [message for message in _decode(segment) if wanted(message)]
+        if newest_first:
+            messages.reverse()
+        page.extend(messages[:limit - len(page)])
+        if len(page) >= limit:
+            break
+    return _attach_senders(page)
+
+
+def archive_conversation(conversation, cutoff, segment_size=ARCHIVE_SEGMENT_SIZE):
+    """
+    Moves `conversation`'s messages older than `cutoff` into archive segments,
+    oldest first, one transaction per segment. Returns a report dict.
+    """
+    report = {'messages': 0, 'segments': 0, 'search_terms': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+    participants = (conversation.tourist_id, conversation.vendor_id)
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Message.objects
+                .filter(conversation=conversation, timestamp__lt=cutoff)
+                .order_by('timestamp', 'id')
+                .values(*SEGMENT_FIELDS)[:segment_size]
+            )
+            if not rows:
+                break
+
+            data, raw_size = _encode(rows)
+            MessageArchiveSegment.objects.create(
+                conversation=conversation,
+                first_message_id=rows[0]['id'], first_timestamp=rows[0]['timestamp'],
+                last_message_id=rows[-1]['id'], last_timestamp=rows[-1]['timestamp'],
+                message_count=len(rows), raw_size=raw_size, data=data,
+            )
+            # Archiving isn't deleting: syncing clients keep their copies
+            with changelog.without_tombstones(changelog.MESSAGES):
+                _, deleted = Message.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+            # Whatever was still unread is now read
+            updates = {'archived_message_count': F('archived_message_count') + len(rows)}
+            for reader_id in participants:
+                unread = sum(1 for row in rows if not row['is_read'] and row['sender_id'] != reader_id)
+                if unread:
+                    field = conversation.unread_count_field(reader_id)
+                    updates[field] = Greatest(F(field) - unread, 0)
+                    _add_to_unread_total(reader_id, -unread)
+            Conversation.objects.filter(pk=conversation.pk).update(**updates)
+
+        report['messages'] += len(rows)
+        report['segments'] += 1
+        report['search_terms'] += deleted.get(MessageSearchTerm._meta.label, 0)
+        report['raw_bytes'] += raw_size
+        report['compressed_bytes'] += len(data)
+    return report
+
+
+def archive_idle_conversations(idle_months=DEFAULT_IDLE_MONTHS, segment_size=ARCHIVE_SEGMENT_SIZE,
+                               max_conversations=None, now=None):
+    """
+    Archives the history of every conversation with no message in the last
+    `idle_months` months. Returns a report of what moved:
+
+        {'conversations': 3, 'messages': 1200, 'segments': 4, 'search_terms': 9800,
+         'raw_bytes': 240000, 'compressed_bytes': 61000}
+
+    `messages` and `search_terms` are the rows removed from the hot tables;
+    `raw_bytes` is the size of the archived messages as JSON and
+    `compressed_bytes` what they take in the archive.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=30 * idle_months)
+    # last_message is cleared once a conversation's last message is archived,
+    # so fully archived conversations are skipped
+    conversations = (
+        Conversation.objects
+        .filter(last_message_at__lt=cutoff, last_message__isnull=False)
+        .only('id', 'tourist_id', 'vendor_id')
+        .order_by('id')
+    )
+    if max_conversations:
+        conversations = conversations[:max_conversations]
+
+    totals = {'conversations': 0, 'messages': 0, 'segments': 0, 'search_terms': 0,
+              'raw_bytes': 0, 'compressed_bytes': 0}
+    for conversation in list(conversations):
+        report = archive_conversation(conversation, cutoff, segment_size=segment_size)
+        totals['conversations'] += 1
+        for key, value in report.items():
+            totals[key] += value
+    return totals
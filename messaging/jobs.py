@@ -0,0 +1,9 @@
+# In messaging/jobs.py
+"""Translating queued messages off the send path (see messaging/translations.py)."""
+from jobs.registry import register
+from .translations import DRAIN_JOB, drain_pending_translations
+
+
+@register(DRAIN_JOB, concurrency=1)
+def translate_pending(job):
+    return {'processed': drain_pending_translations()}
@@ -0,0 +1,32 @@
+# In messaging/management/commands/archive_conversations.py
+from django.core.management.base import BaseCommand
+
+from messaging.archive import archive_idle_conversations, DEFAULT_IDLE_MONTHS, ARCHIVE_SEGMENT_SIZE
+
+
+class Command(BaseCommand):
+    help = "Moves the messages of conversations idle for N months into compressed archive segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-months', type=int, default=DEFAULT_IDLE_MONTHS,
+                            help="Archive conversations with no message in this many months.")
+        parser.add_argument('--segment-size', type=int, default=ARCHIVE_SEGMENT_SIZE,
+                            help="Messages per archive segment (and per transaction).")
+        parser.add_argument('--max-conversations', type=int, help="Stop after archiving this many conversations.")
+
+    def handle(self, *args, **options):
+        report = archive_idle_conversations(
+            idle_months=options['idle_months'],
+            segment_size=options['segment_size'],
+            max_conversations=options.get('max_conversations'),
+        )
+        ratio = report['compressed_bytes'] / report['raw_bytes'] if report['raw_bytes'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report['messages']} messages from {report['conversations']} conversations "
+            f"into {report['segments']} segments."
+        ))
+        self.stdout.write(
+            f"Removed from the hot tables: {report['messages']} message rows, "
+            f"{report['search_terms']} search index rows, ~{report['raw_bytes'] / 1024:.1f} KiB of message data. "
+            f"Archive size: {report['compressed_bytes'] / 1024:.1f} KiB ({ratio:.0%} of the original)."
+        )
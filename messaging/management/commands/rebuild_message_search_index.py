@@ -0,0 +1,15 @@
+# In messaging/management/commands/rebuild_message_search_index.py
+from django.core.management.base import BaseCommand
+
+from messaging.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "(Re)builds the message search index from the messages table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Index rows written per INSERT.")
+
+    def handle(self, *args, **options):
+        count = get_search_backend().rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} messages."))
@@ -0,0 +1,12 @@
+# In messaging/management/commands/rebuild_unread_counts.py
+from django.core.management.base import BaseCommand
+
+from messaging.services import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-conversation unread counts and per-user unread totals from the messages table."
+
+    def handle(self, *args, **options):
+        users = rebuild_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unread counts ({users} users with unread messages)."))
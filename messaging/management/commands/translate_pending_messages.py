@@ -0,0 +1,20 @@
+# In messaging/management/commands/translate_pending_messages.py
+from django.core.management.base import BaseCommand
+
+from messaging.translations import translate_pending_messages, TRANSLATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Translates the queued messages into their recipients' preferred languages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TRANSLATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            done = translate_pending_messages(batch_size=options['batch_size'])
+            if not done:
+                break
+            total += done
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} message translations."))
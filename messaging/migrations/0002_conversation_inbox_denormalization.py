@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inbox_fields(apps, schema_editor):
+    """Fills the denormalized last-message and unread fields for existing conversations."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    for conversation in Conversation.objects.all().iterator():
+        messages = Message.objects.filter(conversation=conversation)
+        last = messages.order_by('-timestamp', '-id').first()
+        if last is None:
+            continue
+        unread = messages.filter(is_read=False)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message=last,
+            last_message_body=last.body,
+            last_message_at=last.timestamp,
+            tourist_unread_count=unread.exclude(sender_id=conversation.tourist_id).count(),
+            vendor_unread_count=unread.exclude(sender_id=conversation.vendor_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_body',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='tourist_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='vendor_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['tourist', '-updated_at'], name='conversation_tourist_inbox'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['vendor', '-updated_at'], name='conversation_vendor_inbox'),
+        ),
+        migrations.RunPython(backfill_inbox_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Q
+
+
+def backfill_read_state(apps, schema_editor):
+    """Sets the read markers from the messages already read, and each user's unread total."""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    UnreadCounter = apps.get_model('messaging', 'UnreadCounter')
+    totals = {}
+    for conversation in Conversation.objects.all().iterator():
+        read = Message.objects.filter(conversation=conversation, is_read=True).aggregate(
+            tourist=Max('id', filter=Q(sender_id=conversation.vendor_id)),
+            vendor=Max('id', filter=Q(sender_id=conversation.tourist_id)),
+        )
+        Conversation.objects.filter(pk=conversation.pk).update(
+            tourist_read_up_to=read['tourist'] or 0,
+            vendor_read_up_to=read['vendor'] or 0,
+        )
+        for user_id, count in ((conversation.tourist_id, conversation.tourist_unread_count),
+                               (conversation.vendor_id, conversation.vendor_unread_count)):
+            totals[user_id] = totals.get(user_id, 0) + count
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, total=total) for user_id, total in totals.items() if total],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('messaging', '0003_message_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='tourist_read_up_to',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='vendor_read_up_to',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['conversation', 'id'], name='message_unread'),
+        ),
+        migrations.RunPython(backfill_read_state, migrations.RunPython.noop),
+    ]
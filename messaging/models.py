@@ -19,14 +19,46 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized copy of the latest message and each participant's unread count,
+    # maintained by messaging/services.py so the inbox never has to read messages.
+    last_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    last_message_body = models.TextField(blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    tourist_unread_count = models.PositiveIntegerField(default=0)
+    vendor_unread_count = models.PositiveIntegerField(default=0)
+    # Read receipts: the id of the latest message from the other participant
+    # that each participant has read (0 if none)
+    tourist_read_up_to = models.PositiveBigIntegerField(default=0)
+    vendor_read_up_to = models.PositiveBigIntegerField(default=0)
+    # How many of the oldest messages were moved to MessageArchiveSegment (see messaging/archive.py)
+    archived_message_count = models.PositiveIntegerField(default=0)
+
     class Meta:
         # Ensure only one conversation exists between a tourist and a vendor for a specific service
         unique_together = ('service', 'tourist', 'vendor')
         ordering = ['-updated_at']
+        indexes = [
+            # The inbox: a participant's conversations, most recent first
+            models.Index(fields=['tourist', '-updated_at'], name='conversation_tourist_inbox'),
+            models.Index(fields=['vendor', '-updated_at'], name='conversation_vendor_inbox'),
+        ]
 
     def __str__(self):
         return f"Conversation about '{self.service.name}' between {self.tourist.username} and {self.vendor.username}"
 
+    def unread_count_field(self, user_id):
+        """Returns the name of the unread counter belonging to the given participant."""
+        return 'tourist_unread_count' if user_id == self.tourist_id else 'vendor_unread_count'
+
+    def read_marker_field(self, user_id):
+        """Returns the name of the read-receipt marker belonging to the given participant."""
+        return 'tourist_read_up_to' if user_id == self.tourist_id else 'vendor_read_up_to'
+
+    def other_participant_id(self, user_id):
+        return self.vendor_id if user_id == self.tourist_id else self.tourist_id
+
 
 class Message(models.Model):
     """
@@ -43,6 +75,108 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination of a conversation's history, see messaging/pagination.py
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='message_history'),
+            # Marking a conversation read only has to visit the (few) unread messages
+            models.Index(
+                fields=['conversation', 'id'], condition=models.Q(is_read=False), name='message_unread'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Message from {self.sender.username} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class MessageTranslation(models.Model):
+    """
+    A message translated into its recipient's preferred language. Rows are
+    queued as PENDING when the message is sent and filled in the background
+    by messaging/translations.py, so reading a message never waits on the
+    translation service.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='translations')
+    language = models.CharField(max_length=12, help_text="Language code, e.g. 'ur'.")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    translated_text = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    translated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'language'], name='message_translation_language'),
+        ]
+        indexes = [
+            # The queue: only pending rows are indexed
+            models.Index(
+                fields=['language', 'id'], condition=models.Q(status='PENDING'), name='message_translation_queue'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Message {self.message_id} in '{self.language}' ({self.status})"
+
+
+class MessageArchiveSegment(models.Model):
+    """
+    A run of consecutive old messages of one conversation, moved out of the
+    Message table as zlib-compressed JSON by messaging/archive.py. Segments are
+    append-only and cover the oldest messages, so every archived message is
+    older than every message still in the Message table.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='archive_segments')
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    # Size of the uncompressed JSON, for archival reports
+    raw_size = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', 'last_timestamp', 'last_message_id'], name='archive_segment_order'),
+        ]
+
+    def __str__(self):
+        return f"{self.message_count} archived messages of conversation {self.conversation_id}"
+
+
+class MessageSearchTerm(models.Model):
+    """
+    The inverted index behind message search (see messaging/search.py): one row
+    per term of a message's body, for each participant who can see the message.
+    Searches start from (user, term), so they only ever touch the user's own postings.
+    """
+    # Not indexed on its own: the unique constraint below starts with user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    term = models.CharField(max_length=64)
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='search_terms')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'term', 'message'], name='message_search_posting'),
+        ]
+
+    def __str__(self):
+        return f"'{self.term}' in message {self.message_id} for user {self.user_id}"
+
+
+class UnreadCounter(models.Model):
+    """
+    A user's unread messages across all their conversations, for the app badge.
+    Maintained by messaging/services.py alongside the per-conversation counts;
+    `python manage.py rebuild_unread_counts` recomputes both from the messages.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    total = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return f"Message from {self.sender.username} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.total} unread for user {self.user_id}"
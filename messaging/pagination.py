@@ -0,0 +1,101 @@
+# In messaging/pagination.py
+"""
+Keyset (cursor) pagination of a conversation's message history.
+
+Pages are read from the (conversation_id, timestamp, id) index, so fetching an
+old page costs the same as fetching the latest one. Cursors are opaque strings
+that encode the (timestamp, id) of the message at the edge of a page.
+
+Conversations with archived history (see messaging/archive.py) continue into
+their archive segments once the hot messages run out, so clients page through
+old history exactly as through recent history.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Prefetch, Q
+from rest_framework.exceptions import ValidationError
+
+from .archive import get_archived_messages
+from .models import Message, MessageTranslation
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(message):
+    raw = f'{message.timestamp.isoformat()}|{message.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the (timestamp, id) a cursor points at, or raises ValidationError."""
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+def done_translations():
+    """Prefetches the finished translations of messages as `done_translations`."""
+    return Prefetch(
+        'translations',
+        queryset=MessageTranslation.objects.filter(status=MessageTranslation.Status.DONE)
+        .only('message_id', 'language', 'translated_text'),
+        to_attr='done_translations',
+    )
+
+
+def get_message_page(conversation, before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns a page of `conversation`'s messages, oldest first, with their senders
+    joined in the same query:
+    - no cursor: the latest `limit` messages,
+    - `before`: the `limit` messages just older than the cursor,
+    - `after`: the `limit` messages just newer than the cursor.
+
+    The result is a dict with `results`, and `before`/`after` cursors for
+    loading older/newer messages (`before` is None once the start is reached).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    messages = (
+        Message.objects
+        .filter(conversation=conversation)
+        .select_related('sender')
+        .only('id', 'conversation_id', 'body', 'timestamp', 'is_read', 'sender__id', 'sender__username')
+        .prefetch_related(done_translations())
+    )
+
+    has_archive = conversation.archived_message_count > 0
+
+    if after:
+        timestamp, pk = decode_cursor(after)
+        messages = messages.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+        page = list(messages.order_by('timestamp', 'id')[:limit])
+        if has_archive:
+            # Archived messages are older than every hot one, so they come first
+            page = (get_archived_messages(conversation, after=(timestamp, pk), limit=limit) + page)[:limit]
+        has_older = True
+    else:
+        cursor = None
+        if before:
+            cursor = decode_cursor(before)
+            timestamp, pk = cursor
+            messages = messages.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+        # One extra row tells us whether there is anything older than this page
+        page = list(messages.order_by('-timestamp', '-id')[:limit + 1])
+        if has_archive and len(page) <= limit:
+            # Out of hot messages: carry on into the archive
+            if page:
+                cursor = (page[-1].timestamp, page[-1].pk)
+            page += get_archived_messages(conversation, before=cursor, limit=limit + 1 - len(page))
+        has_older = len(page) > limit
+        page = page[:limit]
+        page.reverse()
+
+    return {
+        'results': page,
+        'before': encode_cursor(page[0]) if page and has_older else None,
+        'after': encode_cursor(page[-1]) if page else after,
+    }
@@ -0,0 +1,97 @@
+# In messaging/pubsub.py
+"""
+Pluggable publish/subscribe layer used to push messaging events to WebSocket
+connections (see messaging/realtime.py).
+
+The backend is chosen with the MESSAGING_PUBSUB_BACKEND setting. The bundled
+InMemoryPubSub only reaches subscribers in the same process, which is enough for
+a single-node deployment and for tests; a multi-node deployment needs a backend
+built on a shared broker (e.g. Redis pub/sub) implementing the same interface.
+"""
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'messaging.pubsub.InMemoryPubSub'
+
+
+def user_channel(user_id):
+    """Every connection of a user listens on their own channel."""
+    return f'user:{user_id}'
+
+
+class BasePubSub:
+    """Interface every pub/sub backend implements."""
+
+    def subscribe(self, channel, loop, queue):
+        """
+        Starts delivering events published on `channel` to the asyncio `queue`,
+        which belongs to the event `loop`. Events are handed over with
+        `queue.put_nowait()`, so a bounded queue decides what happens once it
+        is full. Subscribers whose loop has been closed are dropped.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, channel, queue):
+        raise NotImplementedError
+
+    def publish(self, channel, event):
+        """Publishes a JSON-serializable event. Safe to call from any thread."""
+        raise NotImplementedError
+
+
+class InMemoryPubSub(BasePubSub):
+    """Delivers events to subscribers in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel, loop, queue):
+        with self._lock:
+            self._subscribers.setdefault(channel, {})[queue] = loop
+
+    def unsubscribe(self, channel, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, {}).items())
+        delivered = 0
+        for queue, loop in subscribers:
+            # Publishers are usually sync views running in a worker thread
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The loop is closed, e.g. its server shut down without the
+                # connection unsubscribing: nothing will read this queue again
+                self.unsubscribe(channel, queue)
+            else:
+                delivered += 1
+        return delivered
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, {}))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub():
+    """Returns the process-wide pub/sub backend."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, 'MESSAGING_PUBSUB_BACKEND', DEFAULT_BACKEND))()
+    return _backend
@@ -0,0 +1,133 @@
+# In messaging/realtime.py
+"""
+Real-time messaging over WebSockets, served by core/asgi.py.
+
+Clients connect to  ws://<host>/ws/messaging/?token=<access token>  with the same
+SimpleJWT access token they use for the REST API. Each connection is subscribed
+to its user's pub/sub channel and receives JSON events such as:
+
+    {"type": "message.created", "conversation": 12, "message": {...}}
+    {"type": "messages.read", "conversation": 12, "reader": 7, "up_to": 345}
+
+Clients may send {"type": "ping"} and get {"type": "pong"} back; anything else
+they send is ignored. Events are published by messaging/services.py.
+
+The server closes the connection:
+
+- with CLOSE_UNAUTHORIZED when the access token expires, so a client can't stay
+  subscribed on a token that would no longer be accepted; it reconnects with
+  a fresh one;
+- with CLOSE_TOO_SLOW when it falls MESSAGING_WEBSOCKET_QUEUE_SIZE events
+  behind, rather than buffering for it without limit; it reconnects and
+  catches up through /api/sync/.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from users.authentication import ClaimsJWTAuthentication
+from .pubsub import get_pubsub, user_channel
+
+WEBSOCKET_PATH = '/ws/messaging/'
+
+# Close codes in the 4000-4999 range are reserved for applications
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_TOO_SLOW = 4408
+
+# Events waiting to be sent to one connection
+DEFAULT_QUEUE_SIZE = 100
+
+
+class EventQueue(asyncio.Queue):
+    """A connection's bounded queue of events; `overflowed` is set once an event didn't fit."""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.overflowed = asyncio.Event()
+
+    def put_nowait(self, item):
+        try:
+            super().put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed.set()
+
+
+def _authenticate(raw_token):
+    """Returns (the active user a raw access token belongs to, its expiry timestamp), or (None, None)."""
+    authentication = ClaimsJWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(validated_token), validated_token['exp']
+    except (InvalidToken, AuthenticationFailed):
+        return None, None
+
+
+async def _forward_events(queue, send):
+    while True:
+        event = await queue.get()
+        await send({'type': 'websocket.send', 'text': json.dumps(event)})
+
+
+async def _receive_events(receive, send):
+    """Answers pings until the client disconnects."""
+    while True:
+        event = await receive()
+        if event['type'] == 'websocket.disconnect':
+            return
+        if event['type'] == 'websocket.receive' and event.get('text'):
+            try:
+                payload = json.loads(event['text'])
+            except ValueError:
+                continue
+            if isinstance(payload, dict) and payload.get('type') == 'ping':
+                await send({'type': 'websocket.send', 'text': json.dumps({'type': 'pong'})})
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application for the `websocket` scope type."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    if scope.get('path') != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user, expires_at = await sync_to_async(_authenticate)(token) if token else (None, None)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    pubsub = get_pubsub()
+    channel = user_channel(user.pk)
+    queue = EventQueue(getattr(settings, 'MESSAGING_WEBSOCKET_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+    pubsub.subscribe(channel, asyncio.get_running_loop(), queue)
+    receiver = asyncio.ensure_future(_receive_events(receive, send))
+    forwarder = asyncio.ensure_future(_forward_events(queue, send))
+    overflow = asyncio.ensure_future(queue.overflowed.wait())
+    try:
+        done, _ = await asyncio.wait(
+            [receiver, forwarder, overflow], timeout=max(0, expires_at - time.time()),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if overflow in done:
+            await send({'type': 'websocket.close', 'code': CLOSE_TOO_SLOW})
+        elif not done:
+            # The access token has expired
+            await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        elif forwarder in done:
+            # Sending failed: raise the server's error
+            forwarder.result()
+    finally:
+        pubsub.unsubscribe(channel, queue)
+        for task in (receiver, forwarder, overflow):
+            task.cancel()
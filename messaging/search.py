@@ -0,0 +1,163 @@
+# In messaging/search.py
+"""
+Full-text search over the messages a user can see.
+
+The backend is chosen with the MESSAGING_SEARCH_BACKEND setting. The default,
+TokenIndexSearch, keeps an inverted index in the MessageSearchTerm table that
+works on every database: each message body is split into terms, and one
+posting per (participant, term, message) is written when the message is
+created. A search looks up each query term under the searching user only,
+so other users' messages are never read and then filtered out.
+
+A database-specific backend (SQLite FTS5, PostgreSQL tsvector + GIN) can be
+plugged in by implementing the same interface.
+
+`python manage.py rebuild_message_search_index` (re)indexes existing messages.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Message, MessageSearchTerm
+
+DEFAULT_BACKEND = 'messaging.search.TokenIndexSearch'
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = MessageSearchTerm._meta.get_field('term').max_length
+SNIPPET_RADIUS = 60
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Splits text into distinct, case-folded search terms, in order of appearance."""
+    terms = {}
+    for word in WORD_RE.findall(text.casefold()):
+        if len(word) > 1:
+            terms.setdefault(word[:MAX_TERM_LENGTH], None)
+    return list(terms)
+
+
+def make_snippet(body, terms, radius=SNIPPET_RADIUS):
+    """Returns the part of `body` around the first matching term, with ellipses where it was cut."""
+    folded = body.casefold()
+    positions = [folded.find(term) for term in terms]
+    positions = [position for position in positions if position >= 0]
+    center = min(positions) if positions else 0
+
+    start = max(center - radius, 0)
+    end = min(center + radius, len(body))
+    # Don't cut words in half
+    if start > 0:
+        space = body.rfind(' ', 0, start)
+        start = space + 1 if space >= 0 else 0
+    if end < len(body):
+        space = body.find(' ', end)
+        end = space if space >= 0 else len(body)
+
+    snippet = body[start:end].strip()
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(body) else '')
+
+
+class BaseSearchBackend:
+    """Interface every message search backend implements."""
+
+    def index_message(self, message, user_ids):
+        """Makes `message` findable by each of `user_ids`. Called when the message is created."""
+        raise NotImplementedError
+
+    def search(self, user, terms, before=None, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Returns up to `limit` messages `user` can see that contain every term,
+        newest first, older than message id `before` if given.
+        The last term also matches as a prefix ("deos" finds "Deosai").
+        """
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000):
+        """(Re)indexes every message. Returns the number of messages indexed."""
+        raise NotImplementedError
+
+
+class TokenIndexSearch(BaseSearchBackend):
+    """Inverted index in an ordinary table, see MessageSearchTerm."""
+
+    def _postings(self, message, user_ids):
+        return [
+            MessageSearchTerm(user_id=user_id, term=term, message_id=message.pk)
+            for term in tokenize(message.body)
+            for user_id in set(user_ids)
+        ]
+
+    def index_message(self, message, user_ids):
+        MessageSearchTerm.objects.bulk_create(self._postings(message, user_ids), ignore_conflicts=True)
+
+    def search(self, user, terms, before=None, limit=DEFAULT_SEARCH_LIMIT):
+        messages = Message.objects.all()
+        for position, term in enumerate(terms):
+            postings = MessageSearchTerm.objects.filter(user_id=user.pk)
+            if position == len(terms) - 1:
+                # A range rather than LIKE 'term%', so every database can use the index
+                postings = postings.filter(term__gte=term, term__lt=term + '\U0010ffff')
+            else:
+                postings = postings.filter(term=term)
+            if before is not None:
+                postings = postings.filter(message_id__lt=before)
+            messages = messages.filter(id__in=postings.values('message_id'))
+        return list(messages.select_related('sender').order_by('-id')[:limit])
+
+    def rebuild(self, batch_size=1000):
+        MessageSearchTerm.objects.all().delete()
+        messages = Message.objects.select_related('conversation').only(
+            'id', 'body', 'conversation__tourist_id', 'conversation__vendor_id'
+        )
+        postings = []
+        count = 0
+        for message in messages.iterator(chunk_size=batch_size):
+            conversation = message.conversation
+            postings.extend(self._postings(message, [conversation.tourist_id, conversation.vendor_id]))
+            count += 1
+            if len(postings) >= batch_size:
+                MessageSearchTerm.objects.bulk_create(postings, ignore_conflicts=True)
+                postings = []
+        MessageSearchTerm.objects.bulk_create(postings, ignore_conflicts=True)
+        return count
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Returns the process-wide message search backend."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, 'MESSAGING_SEARCH_BACKEND', DEFAULT_BACKEND))()
+    return _backend
+
+
+def search_messages(user, query, before=None, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Searches the messages `user` can see for `query`. Returns a dict with the
+    `results` (newest first), the query `terms`, and a `before` cursor for the
+    next page (None on the last page).
+    """
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return {'results': [], 'terms': [], 'before': None}
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+    # One extra row tells us whether there is another page
+    results = get_search_backend().search(user, terms, before=before, limit=limit + 1)
+    has_more = len(results) > limit
+    results = results[:limit]
+    return {
+        'results': results,
+        'terms': terms,
+        'before': str(results[-1].pk) if has_more else None,
+    }
@@ -1,41 +1,87 @@
 # In messaging/serializers.py
 
 from rest_framework import serializers
+from utils.serializers import SparseFieldsetMixin
 from django.contrib.auth.models import User
 from .models import Conversation, Message
+from .pagination import get_message_page
+from .search import make_snippet
 from vendors.models import Service
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for a single message."""
     sender_username = serializers.CharField(source='sender.username', read_only=True)
+    # {language: text} for the finished translations, see messaging/translations.py
+    translations = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'sender_username', 'body', 'timestamp']
+        fields = ['id', 'sender', 'sender_username', 'body', 'translations', 'timestamp']
         read_only_fields = ['id', 'sender', 'sender_username', 'timestamp']
 
-class ConversationSerializer(serializers.ModelSerializer):
+    def get_translations(self, obj):
+        # Only read when prefetched (as `done_translations`), so serializing never costs a query per message
+        return {t.language: t.translated_text for t in getattr(obj, 'done_translations', [])}
+
+class MessageSearchResultSerializer(MessageSerializer):
+    """A message found by search, with the conversation it's in and a snippet of its body."""
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = ['id', 'conversation', 'sender', 'sender_username', 'snippet', 'timestamp']
+
+    def get_snippet(self, obj):
+        return make_snippet(obj.body, self.context.get('search_terms', []))
+
+class ConversationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for listing conversations."""
     tourist_username = serializers.CharField(source='tourist.username', read_only=True)
     vendor_username = serializers.CharField(source='vendor.username', read_only=True)
     service_name = serializers.CharField(source='service.name', read_only=True)
-    last_message = serializers.SerializerMethodField()
+    # The body of the most recent message, denormalized onto the conversation
+    last_message = serializers.CharField(source='last_message_body', read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Conversation
+        # *_read_up_to are the read receipts: the latest message id each participant has read
         fields = [
             'id', 'service', 'service_name', 'tourist', 'tourist_username', 
-            'vendor', 'vendor_username', 'last_message', 'updated_at'
+            'vendor', 'vendor_username', 'last_message', 'last_message_at', 'unread_count',
+            'tourist_read_up_to', 'vendor_read_up_to', 'updated_at'
         ]
+        sparse_field_sources = {
+            'unread_count': ['tourist', 'tourist_unread_count', 'vendor_unread_count'],
+        }
 
-    def get_last_message(self, obj):
-        """Returns the body of the most recent message in the conversation."""
-        last_msg = obj.messages.order_by('-timestamp').first()
-        return last_msg.body if last_msg else None
+    def get_unread_count(self, obj):
+        """Returns how many messages the requesting user hasn't read yet."""
+        request = self.context.get('request')
+        if request is None:
+            return None
+        return getattr(obj, obj.unread_count_field(request.user.pk))
 
 class ConversationDetailSerializer(ConversationSerializer):
-    """Serializer for viewing a single conversation with all its messages."""
-    messages = MessageSerializer(many=True, read_only=True)
+    """
+    Serializer for viewing a single conversation with its latest page of messages.
+    Older messages are loaded through GET /conversations/{id}/messages/?before=<cursor>.
+    """
+    messages = serializers.SerializerMethodField()
+    messages_before = serializers.SerializerMethodField()
 
     class Meta(ConversationSerializer.Meta):
-        fields = ConversationSerializer.Meta.fields + ['messages']
\ No newline at end of file
+        fields = ConversationSerializer.Meta.fields + ['messages', 'messages_before']
+        # The messages are read by get_message_page, not through the queryset
+        sparse_field_sources = dict(ConversationSerializer.Meta.sparse_field_sources, messages=[], messages_before=[])
+
+    def _latest_page(self, obj):
+        if not hasattr(obj, '_latest_message_page'):
+            obj._latest_message_page = get_message_page(obj)
+        return obj._latest_message_page
+
+    def get_messages(self, obj):
+        return MessageSerializer(self._latest_page(obj)['results'], many=True).data
+
+    def get_messages_before(self, obj):
+        """Cursor for loading the messages older than the ones embedded here."""
+        return self._latest_page(obj)['before']
@@ -0,0 +1,171 @@
+# In messaging/services.py
+"""
+Write paths for messages.
+
+Creating a message and marking messages read also maintain the denormalized
+fields on Conversation (last message, per-participant unread counts and read
+markers) and each user's UnreadCounter in the same transaction, so neither the
+inbox nor the app badge has to touch the messages table.
+Once the transaction commits, the change is pushed to both participants'
+WebSocket connections (see messaging/realtime.py).
+
+The conversation and message updates below don't send model signals, so they
+record themselves in the sync change log (see sync/changelog.py).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from sync import changelog
+from .models import Conversation, Message, UnreadCounter
+from .pubsub import get_pubsub, user_channel
+from .search import get_search_backend
+from .translations import queue_message_translation, schedule_translation_drain
+
+
+def publish_to_participants(conversation, event):
+    """Publishes `event` to both participants of `conversation` once the current transaction commits."""
+    def publish():
+        pubsub = get_pubsub()
+        for user_id in (conversation.tourist_id, conversation.vendor_id):
+            pubsub.publish(user_channel(user_id), event)
+    transaction.on_commit(publish)
+
+
+def _add_to_unread_total(user_id, delta):
+    updated = UnreadCounter.objects.filter(user_id=user_id).update(total=Greatest(F('total') + delta, 0))
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            UnreadCounter.objects.create(user_id=user_id, total=delta)
+    except IntegrityError:
+        # Another request created the row first; add to it instead
+        UnreadCounter.objects.filter(user_id=user_id).update(total=F('total') + delta)
+
+
+def get_unread_total(user):
+    """Returns how many unread messages `user` has across all conversations (a primary key lookup)."""
+    total = UnreadCounter.objects.filter(user_id=user.pk).values_list('total', flat=True).first()
+    return total or 0
+
+
+def post_message(conversation, sender, body):
+    """
+    Creates a message in `conversation`, updates the conversation's
+    last-message fields and the recipient's unread count, indexes the
+    message for search and queues its translation for the recipient.
+    """
+    recipient_id = conversation.other_participant_id(sender.pk)
+    recipient_counter = conversation.unread_count_field(recipient_id)
+    with transaction.atomic():
+        message = Message.objects.create(conversation=conversation, sender=sender, body=body)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message=message,
+            last_message_body=message.body,
+            last_message_at=message.timestamp,
+            updated_at=message.timestamp,
+            **{recipient_counter: F(recipient_counter) + 1}
+        )
+        _add_to_unread_total(recipient_id, 1)
+        participants = [conversation.tourist_id, conversation.vendor_id]
+        get_search_backend().index_message(message, participants)
+        changelog.record_change(changelog.CONVERSATIONS, conversation.pk, participants)
+        if queue_message_translation(message, sender.pk, recipient_id):
+            transaction.on_commit(schedule_translation_drain)
+
+    # Keep the in-memory instance in step with the row
+    conversation.last_message = message
+    conversation.last_message_body = message.body
+    conversation.last_message_at = message.timestamp
+    conversation.updated_at = message.timestamp
+    setattr(conversation, recipient_counter, getattr(conversation, recipient_counter) + 1)
+
+    # Imported here to avoid a circular import (the serializers use this module's models)
+    from .serializers import MessageSerializer
+    publish_to_participants(conversation, {
+        'type': 'message.created',
+        'conversation': conversation.pk,
+        'message': MessageSerializer(message).data,
+    })
+    return message
+
+
+def mark_conversation_read(conversation, user, up_to=None):
+    """
+    Marks the messages `user` has received in `conversation` as read, up to and
+    including message id `up_to` (default: the latest message), with a single
+    UPDATE over the unread messages. Moves the user's read marker (the read
+    receipt the other participant sees) and lowers their unread counts.
+    Returns the number of messages that were flipped.
+    """
+    latest = conversation.last_message_id
+    if up_to is None or (latest is not None and up_to > latest):
+        up_to = latest
+    marker = conversation.read_marker_field(user.pk)
+    if not up_to or up_to <= getattr(conversation, marker):
+        return 0
+
+    counter = conversation.unread_count_field(user.pk)
+    participants = [conversation.tourist_id, conversation.vendor_id]
+    with transaction.atomic():
+        # UPDATE ... WHERE conversation_id = ? AND id <= ? AND is_read = false AND sender_id <> ?
+        # which the partial `message_unread` index answers directly
+        flipped = (
+            Message.objects
+            .filter(conversation=conversation, id__lte=up_to, is_read=False)
+            .exclude(sender=user)
+            .update(is_read=True)
+        )
+        updates = {marker: Greatest(F(marker), up_to)}
+        if flipped:
+            updates[counter] = Greatest(F(counter) - flipped, 0)
+            _add_to_unread_total(user.pk, -flipped)
+        Conversation.objects.filter(pk=conversation.pk).update(**updates)
+        # Message rows aren't logged: clients derive read state from the markers
+        changelog.record_change(changelog.CONVERSATIONS, conversation.pk, participants)
+    setattr(conversation, counter, max(getattr(conversation, counter) - flipped, 0))
+    setattr(conversation, marker, up_to)
+
+    # Read receipt for the sender's devices (and the reader's other devices)
+    publish_to_participants(conversation, {
+        'type': 'messages.read',
+        'conversation': conversation.pk,
+        'reader': user.pk,
+        'up_to': up_to,
+    })
+    return flipped
+
+
+def rebuild_unread_counts():
+    """
+    Recomputes every conversation's unread counts and every user's unread total
+    from the messages table. Returns the number of users with unread messages.
+    """
+    per_conversation = (
+        Message.objects.filter(is_read=False)
+        .values('conversation_id', 'sender_id', 'conversation__tourist_id', 'conversation__vendor_id')
+        .annotate(unread=Count('id'))
+        .order_by()
+    )
+    conversation_counts = {}
+    totals = {}
+    for row in per_conversation.iterator():
+        # Messages are unread by whichever participant didn't send them
+        if row['sender_id'] == row['conversation__tourist_id']:
+            field, reader_id = 'vendor_unread_count', row['conversation__vendor_id']
+        else:
+            field, reader_id = 'tourist_unread_count', row['conversation__tourist_id']
+        conversation_counts.setdefault(row['conversation_id'], {})[field] = row['unread']
+        totals[reader_id] = totals.get(reader_id, 0) + row['unread']
+
+    with transaction.atomic():
+        Conversation.objects.update(tourist_unread_count=0, vendor_unread_count=0)
+        for conversation_id, counts in conversation_counts.items():
+            Conversation.objects.filter(pk=conversation_id).update(**counts)
+        UnreadCounter.objects.all().delete()
+        UnreadCounter.objects.bulk_create(
+            [UnreadCounter(user_id=user_id, total=total) for user_id, total in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
@@ -1,3 +1,588 @@
-from django.test import TestCase
+# In messaging/tests.py
 
-# Create your tests here.
+import asyncio
+import io
+import json
+import os
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from jobs.models import Job
+from jobs.services import work_off
+from sync.models import ChangeLog
+from users.models import UserProfile
+from utils import translation
+from vendors.models import Vendor, Service
+from .archive import archive_idle_conversations
+from .models import (
+    Conversation, Message, MessageArchiveSegment, MessageSearchTerm, MessageTranslation, UnreadCounter
+)
+from .pubsub import InMemoryPubSub, get_pubsub, user_channel
+from .realtime import websocket_application, CLOSE_TOO_SLOW, CLOSE_UNAUTHORIZED
+from .search import tokenize, make_snippet
+from .services import post_message, mark_conversation_read, get_unread_total, rebuild_unread_counts
+from . import translations
+
+
+class MessagingTestCase(APITestCase):
+    """Creates a tourist, a vendor and a conversation about one of the vendor's services."""
+
+    def setUp(self):
+        self.tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.vendor_user = User.objects.create_user(username='vendor', password='StrongPassword123')
+        vendor = Vendor.objects.create(user=self.vendor_user, business_name='Deosai Jeeps', contact_phone='0300')
+        self.service = Service.objects.create(
+            vendor=vendor, name='Jeep to Deosai', description='Day trip', service_type='TRANSPORT',
+            price=Decimal('80.00'), city='Skardu'
+        )
+        self.conversation = Conversation.objects.create(
+            service=self.service, tourist=self.tourist, vendor=self.vendor_user
+        )
+
+
+class ConversationInboxTest(MessagingTestCase):
+    """
+    Test suite for the denormalized last-message and unread fields used by the inbox.
+    """
+
+    def test_posting_updates_last_message_and_recipient_unread_count(self):
+        post_message(self.conversation, self.tourist, 'Is the jeep free tomorrow?')
+        post_message(self.conversation, self.tourist, 'We are 4 people.')
+        post_message(self.conversation, self.vendor_user, 'Yes it is.')
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.last_message_body, 'Yes it is.')
+        self.assertEqual(conversation.last_message_id, Message.objects.latest('id').id)
+        self.assertEqual(conversation.vendor_unread_count, 2)
+        self.assertEqual(conversation.tourist_unread_count, 1)
+
+    def test_marking_read_clears_only_the_readers_count(self):
+        post_message(self.conversation, self.tourist, 'Hello')
+        post_message(self.conversation, self.vendor_user, 'Hi')
+
+        self.assertEqual(mark_conversation_read(self.conversation, self.vendor_user), 1)
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.vendor_unread_count, conversation.tourist_unread_count), (0, 1))
+
+    def test_inbox_is_a_single_query_without_message_rows(self):
+        for i in range(5):
+            post_message(self.conversation, self.tourist, f'Message {i}')
+        self.client.force_authenticate(self.vendor_user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('conversation-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['last_message'], 'Message 4')
+        self.assertEqual(response.data[0]['unread_count'], 5)
+
+    def test_starting_a_conversation_counts_the_first_message(self):
+        self.conversation.delete()
+        self.client.force_authenticate(self.tourist)
+        response = self.client.post(
+            reverse('conversation-list'), {'service_id': self.service.id, 'body': 'Hello'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['last_message'], 'Hello')
+        self.assertEqual(Conversation.objects.get().vendor_unread_count, 1)
+
+
+class ReadReceiptTest(MessagingTestCase):
+    """
+    Test suite for marking conversations read up to a message and the per-user unread total.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [post_message(self.conversation, self.tourist, f'Message {i}') for i in range(5)]
+        # A second conversation with the same vendor
+        other_tourist = User.objects.create_user(username='other', password='StrongPassword123')
+        self.other_conversation = Conversation.objects.create(
+            service=self.service, tourist=other_tourist, vendor=self.vendor_user
+        )
+        post_message(self.other_conversation, other_tourist, 'Hi there')
+
+    def test_marking_read_up_to_a_message_is_one_update(self):
+        self.assertEqual(get_unread_total(self.vendor_user), 6)
+
+        with CaptureQueriesContext(connection) as queries:
+            flipped = mark_conversation_read(self.conversation, self.vendor_user, up_to=self.messages[2].id)
+        message_updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "messaging_message"')]
+
+        self.assertEqual(flipped, 3)
+        self.assertEqual(len(message_updates), 1)
+        self.assertEqual(list(Message.objects.filter(is_read=False, conversation=self.conversation)), self.messages[3:])
+        conversation = Conversation.objects.get(pk=self.conversation.pk)
+        self.assertEqual((conversation.vendor_unread_count, conversation.vendor_read_up_to), (2, self.messages[2].id))
+        self.assertEqual(get_unread_total(self.vendor_user), 3)
+
+        # Marking an older message read again is a no-op
+        self.assertEqual(mark_conversation_read(self.conversation, self.vendor_user, up_to=self.messages[0].id), 0)
+
+    def test_own_messages_are_never_flipped(self):
+        reply = post_message(self.conversation, self.vendor_user, 'On my way')
+        mark_conversation_read(self.conversation, self.vendor_user)
+
+        self.assertFalse(Message.objects.get(pk=reply.pk).is_read)
+        self.assertEqual(get_unread_total(self.tourist), 1)
+
+    def test_read_endpoint_and_badge(self):
+        self.client.force_authenticate(self.vendor_user)
+        response = self.client.post(
+            reverse('conversation-mark-read', args=[self.conversation.id]),
+            {'up_to': self.messages[-1].id}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'marked_read': 5, 'unread_count': 0, 'unread_total': 1})
+        # The badge is a single primary key lookup
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('conversation-unread-total'))
+        self.assertEqual(response.data, {'unread_total': 1})
+
+    def test_read_endpoint_rejects_a_bad_message_id(self):
+        self.client.force_authenticate(self.vendor_user)
+        response = self.client.post(
+            reverse('conversation-mark-read', args=[self.conversation.id]), {'up_to': 'latest'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_restores_drifted_counts(self):
+        UnreadCounter.objects.update(total=42)
+        Conversation.objects.update(vendor_unread_count=0)
+
+        rebuild_unread_counts()
+        self.assertEqual(get_unread_total(self.vendor_user), 6)
+        self.assertEqual(Conversation.objects.get(pk=self.conversation.pk).vendor_unread_count, 5)
+
+
+class MessageSearchTest(MessagingTestCase):
+    """
+    Test suite for full-text search over a user's messages.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('conversation-search')
+        self.jeep = post_message(self.conversation, self.tourist, 'Can the jeep to Deosai pick us up at 6am?')
+        post_message(self.conversation, self.vendor_user, 'Yes, the driver will be at your hotel.')
+        # Someone else's conversation mentioning the same jeep
+        self.outsider = User.objects.create_user(username='outsider', password='StrongPassword123')
+        other = Conversation.objects.create(service=self.service, tourist=self.outsider, vendor=self.vendor_user)
+        self.other_jeep = post_message(other, self.outsider, 'Is the Deosai jeep still available?')
+
+    def search(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Jeep to DEOSAI, jeep!'), ['jeep', 'to', 'deosai'])
+
+    def test_results_are_scoped_to_the_users_conversations(self):
+        data = self.search(self.tourist, q='jeep deosai')
+        self.assertEqual([row['id'] for row in data['results']], [self.jeep.id])
+        self.assertEqual(data['results'][0]['conversation'], self.conversation.id)
+
+        # The vendor is in both conversations
+        data = self.search(self.vendor_user, q='jeep deosai')
+        self.assertEqual([row['id'] for row in data['results']], [self.other_jeep.id, self.jeep.id])
+
+    def test_every_word_must_match_and_the_last_is_a_prefix(self):
+        self.assertEqual(len(self.search(self.tourist, q='jeep hotel')['results']), 0)
+        self.assertEqual([row['id'] for row in self.search(self.tourist, q='deos')['results']], [self.jeep.id])
+
+    def test_lookups_go_through_the_searching_users_postings(self):
+        self.client.force_authenticate(self.tourist)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'q': 'jeep'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('FROM "messaging_messagesearchterm"', sql)
+        self.assertIn(f'"user_id" = {self.tourist.id} AND', sql)
+
+    def test_results_are_paginated(self):
+        questions = [post_message(self.conversation, self.tourist, f'Jeep question {i}') for i in range(5)]
+
+        data = self.search(self.tourist, q='jeep', limit=4)
+        self.assertEqual([row['id'] for row in data['results']], [m.id for m in reversed(questions[1:])])
+        data = self.search(self.tourist, q='jeep', limit=4, before=data['before'])
+        self.assertEqual([row['id'] for row in data['results']], [questions[0].id, self.jeep.id])
+        self.assertIsNone(data['before'])
+
+    def test_snippet_is_cut_around_the_match(self):
+        body = 'Hello there. ' * 20 + 'The jeep leaves at six. ' + 'Bye now. ' * 20
+        snippet = make_snippet(body, ['jeep'], radius=30)
+        self.assertTrue(snippet.startswith('…') and snippet.endswith('…'))
+        self.assertIn('The jeep leaves', snippet)
+        self.assertLess(len(snippet), 80)
+
+    def test_rebuild_indexes_existing_messages(self):
+        MessageSearchTerm.objects.all().delete()
+        Message.objects.create(conversation=self.conversation, sender=self.tourist, body='Imported jeep message')
+
+        call_command('rebuild_message_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(self.search(self.tourist, q='jeep')['results']), 2)
+
+    def test_query_is_required(self):
+        self.client.force_authenticate(self.tourist)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MessageHistoryTest(MessagingTestCase):
+    """
+    Test suite for the keyset-paginated message history.
+    """
+
+    def setUp(self):
+        super().setUp()
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.tourist, body=f'Message {i}') for i in range(120)
+        ])
+        self.url = reverse('conversation-send-message', args=[self.conversation.id])
+        self.client.force_authenticate(self.vendor_user)
+
+    def test_walking_back_through_the_history(self):
+        bodies = []
+        params = {'limit': 50}
+        while True:
+            with self.assertNumQueries(3):  # the conversation, the page joined with senders, its translations
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            bodies = [message['body'] for message in response.data['results']] + bodies
+            if not response.data['before']:
+                break
+            params['before'] = response.data['before']
+
+        self.assertEqual(bodies, [f'Message {i}' for i in range(120)])
+
+    def test_after_returns_only_newer_messages(self):
+        latest = self.client.get(self.url, {'limit': 10}).data
+        post_message(self.conversation, self.tourist, 'Newest')
+
+        response = self.client.get(self.url, {'after': latest['after']})
+        self.assertEqual([message['body'] for message in response.data['results']], ['Newest'])
+
+    def test_detail_embeds_only_the_latest_page(self):
+        response = self.client.get(reverse('conversation-detail', args=[self.conversation.id]))
+
+        self.assertEqual(len(response.data['messages']), 50)
+        self.assertEqual(response.data['messages'][-1]['body'], 'Message 119')
+        self.assertIsNotNone(response.data['messages_before'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'before': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MessageTranslationTest(MessagingTestCase):
+    """
+    Test suite for translating messages into the recipient's preferred language
+    off the send path. The translation service is replaced by a stub.
+    """
+
+    def setUp(self):
+        super().setUp()
+        translation.clear_local_cache()
+        UserProfile.objects.filter(user=self.tourist).update(preferred_languages='Urdu, English')
+        patcher = mock.patch.object(
+            translation, 'translate_upstream', side_effect=lambda text, target, source: (f'[{target}] {text}', 'en')
+        )
+        self.upstream = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history_url = reverse('conversation-send-message', args=[self.conversation.id])
+
+    def test_language_code(self):
+        self.assertEqual(translation.language_code('Urdu, English'), 'ur')
+        self.assertEqual(translation.language_code('klingon, fr'), 'fr')
+        self.assertIsNone(translation.language_code(''))
+
+    def test_sending_only_queues_the_translation(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            message = post_message(self.conversation, self.vendor_user, 'Your jeep is ready.')
+
+        self.assertEqual(self.upstream.call_count, 0)
+        row = MessageTranslation.objects.get()
+        self.assertEqual((row.message_id, row.language, row.status), (message.id, 'ur', 'PENDING'))
+        self.assertIn(translations.schedule_translation_drain, callbacks)
+
+    def test_same_language_messages_are_not_queued(self):
+        UserProfile.objects.filter(user=self.tourist).update(preferred_languages='English')
+        post_message(self.conversation, self.vendor_user, 'You are welcome.')
+        post_message(self.conversation, self.tourist, 'Thanks!')
+        self.assertFalse(MessageTranslation.objects.exists())
+
+    def test_queue_is_translated_in_one_batch_per_language(self):
+        for i in range(3):
+            post_message(self.conversation, self.vendor_user, f'Update {i}')
+
+        with mock.patch.object(translations, 'translate_many', wraps=translations.translate_many) as batch:
+            self.assertEqual(translations.translate_pending_messages(), 3)
+        self.assertEqual(batch.call_count, 1)
+        self.assertEqual(self.upstream.call_count, 3)
+
+        # Reading the history serves the stored translation without calling upstream again
+        self.client.force_authenticate(self.tourist)
+        response = self.client.get(self.history_url)
+        self.assertEqual(response.data['results'][-1]['translations'], {'ur': '[ur] Update 2'})
+        self.assertEqual(self.upstream.call_count, 3)
+
+    def test_failing_translations_are_retried_then_given_up(self):
+        self.upstream.side_effect = translation.TranslationError('quota exceeded')
+        post_message(self.conversation, self.vendor_user, 'Hello')
+
+        with self.assertLogs('messaging.translations', 'WARNING'):
+            for _ in range(translations.MAX_ATTEMPTS):
+                translations.translate_pending_messages()
+        row = MessageTranslation.objects.get()
+        self.assertEqual((row.status, row.attempts), ('FAILED', translations.MAX_ATTEMPTS))
+
+    def test_translations_are_drained_by_a_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post_message(self.conversation, self.vendor_user, 'Your jeep is ready.')
+        with self.captureOnCommitCallbacks(execute=True):
+            post_message(self.conversation, self.vendor_user, 'Driver is Ali.')
+        # The second message rides on the drain that is already waiting
+        self.assertEqual(Job.objects.filter(kind=translations.DRAIN_JOB).count(), 1)
+
+        self.assertEqual(work_off(kinds=[translations.DRAIN_JOB]), (1, 0))
+        self.assertEqual(Job.objects.get(kind=translations.DRAIN_JOB).result, {'processed': 2})
+        self.assertEqual(
+            sorted(MessageTranslation.objects.values_list('translated_text', flat=True)),
+            ['[ur] Driver is Ali.', '[ur] Your jeep is ready.'],
+        )
+
+    def test_failing_drains_are_retried_later(self):
+        self.upstream.side_effect = translation.TranslationError('quota exceeded')
+        with self.captureOnCommitCallbacks(execute=True):
+            post_message(self.conversation, self.vendor_user, 'Hello')
+
+        with self.assertLogs('messaging.translations', 'WARNING'):
+            work_off(kinds=[translations.DRAIN_JOB])
+        retry = Job.objects.get(kind=translations.DRAIN_JOB, status=Job.Status.QUEUED)
+        self.assertGreater(retry.run_after, timezone.now())
+
+    def test_rows_that_fail_wait_for_the_next_drain(self):
+        def upstream(text, target, source):
+            if text.startswith('Fail'):
+                raise translation.TranslationError('unsupported text')
+            return f'[{target}] {text}', 'en'
+        self.upstream.side_effect = upstream
+        for body in ('Fail this', 'Translate this', 'Fail that'):
+            post_message(self.conversation, self.vendor_user, body)
+
+        with self.assertLogs('messaging.translations', 'WARNING'), \
+                mock.patch.object(translations, 'TRANSLATION_BATCH_SIZE', 1):
+            self.assertEqual(translations.drain_pending_translations(), 1)
+        rows = MessageTranslation.objects.order_by('id')
+        self.assertEqual([(row.status, row.attempts) for row in rows], [('PENDING', 1), ('DONE', 1), ('PENDING', 1)])
+        self.assertTrue(Job.objects.filter(kind=translations.DRAIN_JOB, status=Job.Status.QUEUED).exists())
+
+
+class MessageArchiveTest(MessagingTestCase):
+    """
+    Test suite for archiving idle conversations and reading archived history back.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for i in range(12):
+            post_message(self.conversation, self.tourist if i % 2 else self.vendor_user, f'Old message {i}')
+        # Make the conversation two years old
+        two_years_ago = timezone.now() - timedelta(days=730)
+        for i, message in enumerate(Message.objects.order_by('id')):
+            Message.objects.filter(pk=message.pk).update(timestamp=two_years_ago + timedelta(minutes=i))
+        Conversation.objects.filter(pk=self.conversation.pk).update(last_message_at=two_years_ago)
+        self.url = reverse('conversation-send-message', args=[self.conversation.id])
+        self.client.force_authenticate(self.tourist)
+
+    def walk_back(self, limit):
+        bodies = []
+        params = {'limit': limit}
+        while True:
+            data = self.client.get(self.url, params).data
+            bodies = [message['body'] for message in data['results']] + bodies
+            if not data['before']:
+                return bodies
+            params['before'] = data['before']
+
+    def test_idle_history_moves_to_compressed_segments(self):
+        unread_before = get_unread_total(self.tourist)
+        report = archive_idle_conversations(idle_months=12, segment_size=5)
+
+        self.assertEqual((report['conversations'], report['messages'], report['segments']), (1, 12, 3))
+        self.assertGreater(report['search_terms'], 0)
+        self.assertLess(report['compressed_bytes'], report['raw_bytes'])
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(MessageArchiveSegment.objects.count(), 3)
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.archived_message_count, 12)
+        self.assertEqual((conversation.tourist_unread_count, conversation.vendor_unread_count), (0, 0))
+        self.assertEqual((unread_before, get_unread_total(self.tourist)), (6, 0))
+        # Syncing clients keep their copies
+        self.assertFalse(ChangeLog.objects.filter(collection='messages', action=ChangeLog.Action.DELETE).exists())
+
+        # Running again finds nothing left to do
+        self.assertEqual(archive_idle_conversations(idle_months=12)['messages'], 0)
+
+    def test_active_conversations_are_left_alone(self):
+        post_message(self.conversation, self.tourist, 'Back again!')
+        self.assertEqual(archive_idle_conversations(idle_months=12)['messages'], 0)
+
+    def test_archived_history_reads_like_hot_history(self):
+        archive_idle_conversations(idle_months=12, segment_size=5)
+        post_message(self.conversation, self.tourist, 'Back again!')
+
+        expected = [f'Old message {i}' for i in range(12)] + ['Back again!']
+        self.assertEqual(self.walk_back(limit=4), expected)
+        self.assertEqual(self.walk_back(limit=50), expected)
+
+        # Paging forwards from inside the archive crosses into the hot table
+        latest = self.client.get(self.url, {'limit': 1}).data
+        archived_page = self.client.get(self.url, {'before': latest['after'], 'limit': 12}).data
+        self.assertEqual(archived_page['results'][-1]['body'], 'Old message 11')
+        data = self.client.get(self.url, {'after': archived_page['after']}).data
+        self.assertEqual([message['body'] for message in data['results']], ['Back again!'])
+
+    def test_command_reports_the_space_saved(self):
+        out = io.StringIO()
+        call_command('archive_conversations', '--idle-months', '12', stdout=out)
+        self.assertIn('Archived 12 messages from 1 conversations into 1 segments.', out.getvalue())
+
+
+class WebSocketClient:
+    """Drives the ASGI WebSocket application in-process, the way a server would."""
+
+    def __init__(self, query_string=b'', path='/ws/messaging/'):
+        self.inbound = asyncio.Queue()
+        self.outbound = asyncio.Queue()
+        scope = {'type': 'websocket', 'path': path, 'query_string': query_string}
+        self.task = asyncio.ensure_future(
+            websocket_application(scope, self.inbound.get, self.outbound.put)
+        )
+
+    async def connect(self):
+        await self.inbound.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outbound.get(), timeout=2)
+
+    async def receive_json(self):
+        return json.loads((await self.receive())['text'])
+
+    async def disconnect(self):
+        await self.inbound.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, timeout=2)
+
+
+class RealtimeMessagingTest(MessagingTestCase):
+    """
+    Test suite for pushing messaging events over WebSockets.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.vendor_token = str(AccessToken.for_user(self.vendor_user))
+
+    def post_and_commit(self, sender, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return post_message(self.conversation, sender, body)
+
+    def read_and_commit(self, reader):
+        with self.captureOnCommitCallbacks(execute=True):
+            return mark_conversation_read(self.conversation, reader)
+
+    async def test_connection_without_a_valid_token_is_closed(self):
+        for query_string in (b'', b'token=not-a-jwt'):
+            client = WebSocketClient(query_string)
+            event = await client.connect()
+            self.assertEqual(event, {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+
+    async def test_new_message_and_read_receipt_are_pushed(self):
+        client = WebSocketClient(f'token={self.vendor_token}'.encode())
+        self.assertEqual((await client.connect())['type'], 'websocket.accept')
+
+        message = await sync_to_async(self.post_and_commit)(self.tourist, 'Are you open today?')
+        event = await client.receive_json()
+        self.assertEqual(event['type'], 'message.created')
+        self.assertEqual(event['conversation'], self.conversation.id)
+        self.assertEqual(event['message']['id'], message.id)
+        self.assertEqual(event['message']['body'], 'Are you open today?')
+
+        # The vendor reads it on another device; this connection hears about it too
+        await sync_to_async(self.read_and_commit)(self.vendor_user)
+        event = await client.receive_json()
+        self.assertEqual(event['type'], 'messages.read')
+        self.assertEqual((event['reader'], event['up_to']), (self.vendor_user.id, message.id))
+
+        await client.disconnect()
+        self.assertEqual(get_pubsub().subscriber_count(user_channel(self.vendor_user.id)), 0)
+
+    async def test_ping_gets_a_pong(self):
+        client = WebSocketClient(f'token={self.vendor_token}'.encode())
+        await client.connect()
+        await client.inbound.put({'type': 'websocket.receive', 'text': json.dumps({'type': 'ping'})})
+        self.assertEqual(await client.receive_json(), {'type': 'pong'})
+        await client.disconnect()
+
+    async def test_slow_connections_are_closed(self):
+        client = WebSocketClient(f'token={self.vendor_token}'.encode())
+        await client.connect()
+        with override_settings(MESSAGING_WEBSOCKET_QUEUE_SIZE=2):
+            slow = WebSocketClient(f'token={self.vendor_token}'.encode())
+            await slow.connect()
+        # Queued faster than the connections get to send them
+        for n in range(5):
+            get_pubsub().publish(user_channel(self.vendor_user.id), {'type': 'test', 'n': n})
+
+        events = [await slow.receive()]
+        while events[-1]['type'] != 'websocket.close':
+            events.append(await slow.receive())
+        self.assertEqual(events[-1]['code'], CLOSE_TOO_SLOW)
+        self.assertLessEqual(len(events), 3)
+        # A connection with room for them gets them all
+        self.assertEqual([(await client.receive_json())['n'] for _ in range(5)], [0, 1, 2, 3, 4])
+        await client.disconnect()
+        await asyncio.wait_for(slow.task, timeout=2)
+        self.assertEqual(get_pubsub().subscriber_count(user_channel(self.vendor_user.id)), 0)
+
+    async def test_connection_is_closed_when_the_token_expires(self):
+        token = AccessToken.for_user(self.vendor_user)
+        token.set_exp(lifetime=timedelta(seconds=2))
+        client = WebSocketClient(f'token={token}'.encode())
+        self.assertEqual((await client.connect())['type'], 'websocket.accept')
+
+        event = await asyncio.wait_for(client.outbound.get(), timeout=4)
+        self.assertEqual(event, {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        await asyncio.wait_for(client.task, timeout=2)
+
+    def test_subscribers_on_closed_loops_are_dropped(self):
+        pubsub = InMemoryPubSub()
+        loop = asyncio.new_event_loop()
+        pubsub.subscribe('user:1', loop, asyncio.Queue())
+        loop.close()
+
+        self.assertEqual(pubsub.publish('user:1', {'type': 'test'}), 0)
+        self.assertEqual(pubsub.subscriber_count(), 0)
+
+    def test_publishing_waits_for_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post_message(self.conversation, self.tourist, 'Hello')
+        # One publish callback, which only runs once the outer transaction commits
+        self.assertEqual(len(callbacks), 1)
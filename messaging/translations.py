@@ -0,0 +1,140 @@
+# In messaging/translations.py
+"""
+Pre-translated message delivery.
+
+When a message is sent to someone whose preferred language (the first one in
+UserProfile.preferred_languages that the translator knows) differs from the
+sender's, a PENDING MessageTranslation row is queued in the same transaction.
+After the commit a `messaging.translate_pending` job (messaging/jobs.py) drains
+the queue on the job worker: pending rows are grouped by language and each
+group goes through utils.translation.translate_many, so a burst of messages
+costs one batch of concurrent, cached upstream calls rather than a call per
+message. The result is pushed to the conversation as a "message.translated"
+event and returned with the message from then on. While the upstream is
+failing, the job comes back every TRANSLATION_RETRY_DELAY seconds until each
+row has been tried MAX_ATTEMPTS times.
+
+`python manage.py translate_pending_messages` drains the queue by hand, e.g.
+with MESSAGE_TRANSLATION_IN_BACKGROUND turned off.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.services import enqueue
+from users.models import UserProfile
+from utils.translation import language_code, translate_many, TranslationError
+from .models import MessageTranslation
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_BATCH_SIZE = 100
+MAX_ATTEMPTS = 3
+# Seconds before a drain that left rows pending (the upstream failed) runs again
+TRANSLATION_RETRY_DELAY = 60
+
+DRAIN_JOB = 'messaging.translate_pending'
+
+
+def queue_message_translation(message, sender_id, recipient_id):
+    """
+    Queues `message` for translation into the recipient's preferred language,
+    unless the sender prefers the same one. Returns True if a row was queued.
+    """
+    preferences = dict(
+        UserProfile.objects.filter(user_id__in=[sender_id, recipient_id]).values_list('user_id', 'preferred_languages')
+    )
+    target = language_code(preferences.get(recipient_id))
+    if target is None or target == language_code(preferences.get(sender_id)):
+        return False
+    MessageTranslation.objects.create(message=message, language=target)
+    return True
+
+
+def _pending_batch(batch_size, after_id=0):
+    return list(
+        MessageTranslation.objects
+        .filter(status=MessageTranslation.Status.PENDING, id__gt=after_id)
+        .select_related('message__conversation')
+        .order_by('id')[:batch_size]
+    )
+
+
+def translate_pending_messages(batch_size=TRANSLATION_BATCH_SIZE):
+    """
+    Translates up to `batch_size` pending messages, one translate_many() call per
+    language. A row that fails stays pending until it has failed MAX_ATTEMPTS
+    times. Returns the number of rows that left the queue (translated or given up on).
+    """
+    return _translate_rows(_pending_batch(batch_size))
+
+
+def _translate_rows(pending):
+    # Imported here to avoid a circular import (services queues translations)
+    from .services import publish_to_participants
+
+    by_language = {}
+    for row in pending:
+        by_language.setdefault(row.language, []).append(row)
+
+    now = timezone.now()
+    completed = 0
+    for language, rows in by_language.items():
+        translations = translate_many([row.message.body for row in rows], [language])
+        for row in rows:
+            result = translations[(row.message.body, language)]
+            row.attempts += 1
+            if isinstance(result, TranslationError):
+                logger.warning("Translating message %s into %s failed: %s", row.message_id, language, result)
+                if row.attempts >= MAX_ATTEMPTS:
+                    row.status = MessageTranslation.Status.FAILED
+                    completed += 1
+                continue
+            completed += 1
+            row.status = MessageTranslation.Status.DONE
+            row.translated_text = result.text
+            row.translated_at = now
+
+        with transaction.atomic():
+            MessageTranslation.objects.bulk_update(rows, ['status', 'translated_text', 'attempts', 'translated_at'])
+            for row in rows:
+                if row.status == MessageTranslation.Status.DONE:
+                    publish_to_participants(row.message.conversation, {
+                        'type': 'message.translated',
+                        'conversation': row.message.conversation_id,
+                        'message': row.message_id,
+                        'language': language,
+                        'text': row.translated_text,
+                    })
+    return completed
+
+
+def schedule_translation_drain(delay=0):
+    """Queues a drain on the job worker, unless one is already waiting to start."""
+    if not getattr(settings, 'MESSAGE_TRANSLATION_IN_BACKGROUND', True):
+        return None
+    # A running drain may already be past the rows just queued, so only a
+    # waiting one makes another unnecessary
+    if Job.objects.filter(kind=DRAIN_JOB, status=Job.Status.QUEUED).exists():
+        return None
+    job, _ = enqueue(DRAIN_JOB, delay=delay)
+    return job
+
+
+def drain_pending_translations():
+    """
+    Tries each pending message once, a batch at a time, and queues another
+    drain TRANSLATION_RETRY_DELAY seconds later for those that failed.
+    Returns the number of rows that left the queue.
+    """
+    total = after_id = 0
+    # Batches follow the ids, so a row that failed isn't retried right away
+    while rows := _pending_batch(TRANSLATION_BATCH_SIZE, after_id):
+        total += _translate_rows(rows)
+        after_id = rows[-1].pk
+    if MessageTranslation.objects.filter(status=MessageTranslation.Status.PENDING).exists():
+        schedule_translation_drain(delay=TRANSLATION_RETRY_DELAY)
+    return total
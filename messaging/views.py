@@ -6,9 +6,15 @@ from rest_framework.decorators import action
 from django.db.models import Q
 from vendors.models import Service # <-- Make sure this is imported
 from .models import Conversation, Message
-from .serializers import ConversationSerializer, ConversationDetailSerializer, MessageSerializer
+from .services import post_message, mark_conversation_read, get_unread_total
+from .pagination import get_message_page, DEFAULT_PAGE_SIZE
+from .search import search_messages, DEFAULT_SEARCH_LIMIT
+from .serializers import (
+    ConversationSerializer, ConversationDetailSerializer, MessageSerializer, MessageSearchResultSerializer
+)
+from utils.mixins import SparseFieldsetViewMixin
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling conversations and messages.
     """
@@ -24,7 +30,9 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversation.objects.filter(Q(tourist=user) | Q(vendor=user)).prefetch_related('messages')
+        # The last message and unread counts live on the conversation row, so the
+        # inbox is a single query (the serializer's joins are added by the mixin).
+        return Conversation.objects.filter(Q(tourist=user) | Q(vendor=user))
 
     # --- THIS IS THE CORRECTED METHOD ---
     def create(self, request, *args, **kwargs):
@@ -60,11 +68,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
         )
         
         # Create the first message for the conversation
-        Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            body=initial_body
-        )
+        post_message(conversation, request.user, initial_body)
         
         # Serialize the conversation object to return it in the response
         serializer = self.get_serializer(conversation)
@@ -96,11 +100,87 @@ class ConversationViewSet(viewsets.ModelViewSet):
         if not body:
             return Response({'error': 'Message body cannot be empty.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        message = Message.objects.create(
-            sender=request.user,
-            conversation=conversation,
-            body=body
-        )
+        message = post_message(conversation, request.user, body)
 
         serializer = MessageSerializer(message)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @send_message.mapping.get
+    def message_history(self, request, pk=None):
+        """
+        Returns a page of the conversation's messages, oldest first.
+        GET /conversations/{id}/messages/?before=<cursor>&after=<cursor>&limit=50
+        - before: load older messages (use the `before` cursor of the previous page)
+        - after: load newer messages (use the `after` cursor of the previous page)
+        """
+        conversation = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = get_message_page(
+            conversation,
+            before=request.query_params.get('before'),
+            after=request.query_params.get('after'),
+            limit=limit,
+        )
+        return Response({
+            'results': MessageSerializer(page['results'], many=True).data,
+            'before': page['before'],
+            'after': page['after'],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path='read')
+    def mark_read(self, request, pk=None):
+        """
+        Marks the messages received in this conversation as read.
+        POST /conversations/{id}/read/  {"up_to": <message id>}
+        - up_to: optional; defaults to the latest message
+        """
+        conversation = self.get_object()
+        up_to = request.data.get('up_to')
+        if up_to is not None:
+            try:
+                up_to = int(up_to)
+            except (TypeError, ValueError):
+                return Response({'error': 'up_to must be a message id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        marked = mark_conversation_read(conversation, request.user, up_to=up_to)
+        return Response({
+            'marked_read': marked,
+            'unread_count': getattr(conversation, conversation.unread_count_field(request.user.pk)),
+            'unread_total': get_unread_total(request.user),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='unread')
+    def unread_total(self, request):
+        """
+        Returns the user's unread messages across all conversations, for the app badge.
+        GET /conversations/unread/
+        """
+        return Response({'unread_total': get_unread_total(request.user)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Searches the messages of all the user's conversations, newest first.
+        GET /conversations/search/?q=jeep deosai&before=<cursor>&limit=20
+        - q: every word must appear; the last one also matches as a prefix
+        - before: load the next page (use the `before` cursor of the previous page)
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+            before = request.query_params.get('before')
+            before = int(before) if before else None
+        except ValueError:
+            return Response({'error': 'limit and before must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = search_messages(request.user, query, before=before, limit=limit)
+        serializer = MessageSearchResultSerializer(
+            page['results'], many=True, context={'search_terms': page['terms']}
+        )
+        return Response({'results': serializer.data, 'before': page['before']}, status=status.HTTP_200_OK)
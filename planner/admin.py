@@ -1,8 +1,27 @@
 from django.contrib import admin
-from .models import Destination, Itinerary, ItineraryItem, CulturalEvent 
+from .models import Destination, Itinerary, ItineraryItem, CulturalEvent, WeatherAlert, WeatherForecast, WeatherRule
 
 
 admin.site.register(Destination)
 admin.site.register(Itinerary)
 admin.site.register(ItineraryItem)
-admin.site.register(CulturalEvent)
\ No newline at end of file
+admin.site.register(CulturalEvent)
+
+@admin.register(WeatherForecast)
+class WeatherForecastAdmin(admin.ModelAdmin):
+    list_display = ('city', 'date', 'temperature', 'description', 'fetched_at')
+    list_filter = ('date',)
+    search_fields = ('city',)
+
+
+@admin.register(WeatherRule)
+class WeatherRuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'metric', 'comparison', 'threshold', 'city', 'severity', 'is_active')
+    list_filter = ('metric', 'severity', 'is_active')
+
+
+@admin.register(WeatherAlert)
+class WeatherAlertAdmin(admin.ModelAdmin):
+    list_display = ('rule', 'city', 'date', 'itinerary', 'severity', 'notified_at')
+    list_filter = ('severity', 'date')
+    raw_id_fields = ('itinerary',)
@@ -0,0 +1,111 @@
+# In planner/alerts.py
+"""
+Weather rule engine: checks the active WeatherRules against the prefetched
+forecasts and records a WeatherAlert for every itinerary day they concern.
+
+The work is done per forecast, not per itinerary. Each (city, date)
+forecast is checked against the rules once; the days of all active
+itineraries are then read in one query, limited to the cities that
+triggered something, and matched to those results with a dict lookup.
+The cost grows with the number of cities and rules plus one cheap row per
+itinerary day, so all active itineraries are evaluated in one pass.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ItineraryItem, WeatherAlert, WeatherForecast, WeatherRule
+
+
+def triggered_rules(forecasts, rules):
+    """Returns {(city, date): [(rule, value), ...]} for the forecasts that cross a rule."""
+    triggered = defaultdict(list)
+    for forecast in forecasts:
+        for rule in rules:
+            if rule.city and rule.city != forecast.city:
+                continue
+            value = getattr(forecast, rule.metric)
+            if rule.matches(value):
+                triggered[(forecast.city, forecast.date)].append((rule, value))
+    return triggered
+
+
+def _alert_message(rule, city, date, value):
+    try:
+        return rule.message.format(city=city, date=date, value=round(value, 1))[:255]
+    except (KeyError, IndexError, ValueError):
+        # A typo in an admin-edited template shouldn't stop the whole run
+        return rule.message
+
+
+def evaluate_weather_rules(days=None, batch_size=1000):
+    """
+    Brings the WeatherAlerts of all itineraries under way or starting within
+    `days` days (WEATHER_PREFETCH_DAYS by default) up to date with the
+    current forecasts and rules. Only the differences are written: new
+    alerts are added, changed ones updated (keeping their `notified_at`) and
+    the ones that no longer apply removed. Alerts dated after the `days`
+    window are kept as they are.
+    Returns the number of alerts in effect within the window.
+    """
+    if days is None:
+        days = settings.WEATHER_PREFETCH_DAYS
+    today = timezone.localdate()
+    horizon = today + timedelta(days=days)
+
+    forecasts = WeatherForecast.objects.filter(
+        date__range=(today, horizon),
+        fetched_at__gte=timezone.now() - timedelta(seconds=settings.WEATHER_FORECAST_MAX_AGE),
+    )
+    triggered = triggered_rules(forecasts, list(WeatherRule.objects.filter(is_active=True)))
+
+    # (itinerary id, rule id, city, date) -> (value, severity, message)
+    alerts = {}
+    if triggered:
+        days_by_city = (
+            ItineraryItem.objects.filter(
+                destination__city__in={city for city, _ in triggered},
+                itinerary__start_date__lte=horizon, itinerary__end_date__gte=today,
+            )
+            .order_by()
+            .values_list('itinerary_id', 'itinerary__start_date', 'destination__city', 'day_number')
+        )
+        for itinerary_id, start_date, city, day_number in days_by_city.iterator(chunk_size=5000):
+            date = start_date + timedelta(days=day_number - 1)
+            for rule, value in triggered.get((city, date), ()):
+                alerts[(itinerary_id, rule.pk, city, date)] = (
+                    value, rule.severity, _alert_message(rule, city, date, value)
+                )
+
+    existing = {
+        (itinerary_id, rule_id, city, date): (pk, (value, severity, message))
+        for pk, itinerary_id, rule_id, city, date, value, severity, message in (
+            # Only the window evaluated above: alerts further out are left alone
+            WeatherAlert.objects.filter(date__range=(today, horizon)).order_by()
+            .values_list('pk', 'itinerary_id', 'rule_id', 'city', 'date', 'value', 'severity', 'message')
+            .iterator(chunk_size=5000)
+        )
+    }
+    added, changed = [], []
+    for key, fields in alerts.items():
+        pk, current = existing.pop(key, (None, None))
+        if pk is None:
+            itinerary_id, rule_id, city, date = key
+            added.append(WeatherAlert(
+                itinerary_id=itinerary_id, rule_id=rule_id, city=city, date=date,
+                value=fields[0], severity=fields[1], message=fields[2],
+            ))
+        elif current != fields:
+            changed.append(WeatherAlert(pk=pk, value=fields[0], severity=fields[1], message=fields[2]))
+    # Whatever is left no longer applies
+    stale = [pk for pk, _ in existing.values()]
+
+    with transaction.atomic():
+        WeatherAlert.objects.bulk_create(added, batch_size=batch_size, ignore_conflicts=True)
+        WeatherAlert.objects.bulk_update(changed, ['value', 'severity', 'message'], batch_size=batch_size)
+        for start in range(0, len(stale), batch_size):
+            WeatherAlert.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+    return len(alerts)
@@ -0,0 +1,17 @@
+# In planner/jobs.py
+"""Background versions of the itinerary endpoints that wait on third-party APIs."""
+from jobs.registry import register
+from .models import Itinerary
+from .services import get_optimized_route_for_itinerary, get_weather_alerts_for_itinerary
+
+
+@register('planner.optimize_route', concurrency=4)
+def optimize_route(job):
+    itinerary = Itinerary.objects.get(pk=job.payload['itinerary'])
+    return get_optimized_route_for_itinerary(itinerary)
+
+
+@register('planner.weather_alerts', concurrency=4)
+def weather_alerts(job):
+    itinerary = Itinerary.objects.get(pk=job.payload['itinerary'])
+    return get_weather_alerts_for_itinerary(itinerary)
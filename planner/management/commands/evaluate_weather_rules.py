@@ -0,0 +1,18 @@
+# In planner/management/commands/evaluate_weather_rules.py
+from django.core.management.base import BaseCommand
+
+from planner.alerts import evaluate_weather_rules
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-evaluates the weather alert rules against the stored forecasts for all active itineraries "
+        "(prefetch_weather_forecasts already does this; run it after editing the rules)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Itineraries starting within this many days (default: WEATHER_PREFETCH_DAYS).")
+
+    def handle(self, *args, **options):
+        alerts = evaluate_weather_rules(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{alerts} weather alerts in effect."))
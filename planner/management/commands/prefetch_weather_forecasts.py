@@ -0,0 +1,25 @@
+# In planner/management/commands/prefetch_weather_forecasts.py
+from django.core.management.base import BaseCommand
+
+from planner.alerts import evaluate_weather_rules
+from planner.services import prefetch_weather_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetches and stores the weather forecasts for the cities of upcoming itineraries, "
+        "then re-evaluates the weather alert rules against them. "
+        "Run it from cron every few hours, more often than WEATHER_FORECAST_MAX_AGE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Itineraries starting within this many days (default: WEATHER_PREFETCH_DAYS).")
+        parser.add_argument('--concurrency', type=int, help="Cities fetched at the same time.")
+
+    def handle(self, *args, **options):
+        cities, stored, failed = prefetch_weather_forecasts(days=options['days'], concurrency=options['concurrency'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} forecasts for {cities - len(failed)} of {cities} cities."))
+        if failed:
+            self.stderr.write(f"Failed: {', '.join(failed)}")
+        alerts = evaluate_weather_rules(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{alerts} weather alerts in effect."))
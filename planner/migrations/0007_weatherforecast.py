@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_culturalevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('temperature', models.FloatField()),
+                ('feels_like', models.FloatField()),
+                ('description', models.CharField(max_length=100)),
+                ('icon_code', models.CharField(max_length=10)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('city', 'date'), name='weather_forecast_city_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_temperature_to_daily_range(apps, schema_editor):
+    # Forecasts stored before the daily range existed only have the midday temperature
+    WeatherForecast = apps.get_model('planner', 'WeatherForecast')
+    WeatherForecast.objects.update(temp_min=models.F('temperature'), temp_max=models.F('temperature'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0007_weatherforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('metric', models.CharField(choices=[('temp_min', 'Lowest temperature (°C)'), ('temp_max', 'Highest temperature (°C)'), ('precipitation', 'Precipitation (mm)'), ('snow', 'Snow (mm)'), ('wind_speed', 'Wind speed (m/s)')], max_length=20)),
+                ('comparison', models.CharField(choices=[('ABOVE', 'At or above'), ('BELOW', 'At or below')], max_length=10)),
+                ('threshold', models.FloatField()),
+                ('severity', models.CharField(choices=[('ADVISORY', 'Advisory'), ('WARNING', 'Warning'), ('SEVERE', 'Severe')], default='WARNING', max_length=10)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('message', models.CharField(help_text='Shown to the traveller; may use {city}, {date} and {value}.', max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='precipitation',
+            field=models.FloatField(default=0.0, help_text='Rain and snow, in mm.'),
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='snow',
+            field=models.FloatField(default=0.0, help_text='Snow, in mm of water.'),
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='temp_max',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='temp_min',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='weatherforecast',
+            name='wind_speed',
+            field=models.FloatField(default=0.0, help_text='Highest wind speed or gust, in m/s.'),
+        ),
+        migrations.CreateModel(
+            name='WeatherAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('value', models.FloatField()),
+                ('severity', models.CharField(choices=[('ADVISORY', 'Advisory'), ('WARNING', 'Warning'), ('SEVERE', 'Severe')], max_length=10)),
+                ('message', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('itinerary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weather_alerts', to='planner.itinerary')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='planner.weatherrule')),
+            ],
+            options={
+                'ordering': ['date', 'city'],
+                'indexes': [models.Index(fields=['notified_at', 'date'], name='weather_alert_pending')],
+                'constraints': [models.UniqueConstraint(fields=('itinerary', 'rule', 'city', 'date'), name='weather_alert_key')],
+            },
+        ),
+        migrations.RunPython(copy_temperature_to_daily_range, migrations.RunPython.noop),
+    ]
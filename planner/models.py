@@ -80,4 +80,106 @@ class CulturalEvent(models.Model):
     category = models.CharField(max_length=20, choices=EventCategory.choices)
     
     def __str__(self):
-        return f"{self.name} in {self.city}"
\ No newline at end of file
+        return f"{self.name} in {self.city}"
+
+class WeatherForecast(models.Model):
+    """
+    The forecast for a city on a given day, fetched ahead of time by the
+    `prefetch_weather_forecasts` command so weather alerts can be answered
+    without calling OpenWeather (see planner/services.py).
+    """
+    city = models.CharField(max_length=100)
+    date = models.DateField()
+    # Midday conditions
+    temperature = models.FloatField()
+    feels_like = models.FloatField()
+    description = models.CharField(max_length=100)
+    icon_code = models.CharField(max_length=10)
+    # Over the whole day
+    temp_min = models.FloatField(default=0.0)
+    temp_max = models.FloatField(default=0.0)
+    precipitation = models.FloatField(default=0.0, help_text="Rain and snow, in mm.")
+    snow = models.FloatField(default=0.0, help_text="Snow, in mm of water.")
+    wind_speed = models.FloatField(default=0.0, help_text="Highest wind speed or gust, in m/s.")
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'date'], name='weather_forecast_city_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} on {self.date}: {self.description}"
+
+
+class WeatherRule(models.Model):
+    """
+    A threshold on a forecast value, e.g. "snow above 5 mm in Naran". Every
+    itinerary day in a city whose forecast crosses it gets a WeatherAlert
+    (see planner/alerts.py).
+    """
+    class Metric(models.TextChoices):
+        # The values are WeatherForecast fields
+        TEMP_MIN = 'temp_min', 'Lowest temperature (°C)'
+        TEMP_MAX = 'temp_max', 'Highest temperature (°C)'
+        PRECIPITATION = 'precipitation', 'Precipitation (mm)'
+        SNOW = 'snow', 'Snow (mm)'
+        WIND_SPEED = 'wind_speed', 'Wind speed (m/s)'
+
+    class Comparison(models.TextChoices):
+        ABOVE = 'ABOVE', 'At or above'
+        BELOW = 'BELOW', 'At or below'
+
+    class Severity(models.TextChoices):
+        ADVISORY = 'ADVISORY', 'Advisory'
+        WARNING = 'WARNING', 'Warning'
+        SEVERE = 'SEVERE', 'Severe'
+
+    name = models.CharField(max_length=100)
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    comparison = models.CharField(max_length=10, choices=Comparison.choices)
+    threshold = models.FloatField()
+    severity = models.CharField(max_length=10, choices=Severity.choices, default=Severity.WARNING)
+    # Blank applies the rule everywhere
+    city = models.CharField(max_length=100, blank=True)
+    message = models.CharField(
+        max_length=255, help_text="Shown to the traveller; may use {city}, {date} and {value}."
+    )
+    is_active = models.BooleanField(default=True)
+
+    def matches(self, value):
+        if self.comparison == self.Comparison.ABOVE:
+            return value >= self.threshold
+        return value <= self.threshold
+
+    def __str__(self):
+        return self.name
+
+
+class WeatherAlert(models.Model):
+    """
+    A WeatherRule triggered by the forecast for a day of an itinerary. Written
+    in bulk by evaluate_weather_rules(); read by the weather alerts endpoint,
+    and by notifiers, which pick up the rows with no `notified_at` yet.
+    """
+    itinerary = models.ForeignKey(Itinerary, on_delete=models.CASCADE, related_name='weather_alerts')
+    rule = models.ForeignKey(WeatherRule, on_delete=models.CASCADE, related_name='alerts')
+    city = models.CharField(max_length=100)
+    date = models.DateField()
+    value = models.FloatField()
+    severity = models.CharField(max_length=10, choices=WeatherRule.Severity.choices)
+    message = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['date', 'city']
+        constraints = [
+            models.UniqueConstraint(fields=['itinerary', 'rule', 'city', 'date'], name='weather_alert_key'),
+        ]
+        indexes = [
+            models.Index(fields=['notified_at', 'date'], name='weather_alert_pending'),
+        ]
+
+    def __str__(self):
+        return f"{self.rule} in {self.city} on {self.date}"
@@ -1,16 +1,24 @@
 # In planner/serializers.py
 
 from rest_framework import serializers
+from utils.serializers import SparseFieldsetMixin
 from .models import Itinerary, ItineraryItem, Destination 
 from .models import CulturalEvent
 
-class DestinationSerializer(serializers.ModelSerializer):
+class DestinationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Destination
         # Define the fields to include in the API response
         fields = ['id', 'name', 'description', 'city', 'country', 'destination_type', 'average_cost']
 
 
+class DestinationSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact destination (no long description) used when destinations are nested in lists."""
+    class Meta:
+        model = Destination
+        fields = ['id', 'name', 'city', 'destination_type']
+
+
 
 # In planner/serializers.py
 # Keep the existing DestinationSerializer
@@ -19,19 +27,21 @@ from .models import Itinerary, ItineraryItem, Destination # Update imports
 
 # ... (keep DestinationSerializer) ...
 
-class ItineraryItemSerializer(serializers.ModelSerializer):
+class ItineraryItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for an item within an itinerary (a specific destination on a specific day)."""
-    # We want to show the full destination details, not just its ID.
-    destination = DestinationSerializer(read_only=True)
+    # We want to show the destination details, not just its ID.
+    # Lists get the compact summary; ?expand=destination gives the full destination.
+    destination = DestinationSummarySerializer(read_only=True)
     # We'll also accept a destination ID when creating a new item.
     destination_id = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = ItineraryItem
         fields = ['id', 'destination', 'destination_id', 'day_number', 'start_time', 'end_time']
+        expandable_fields = {'destination': DestinationSerializer}
 
 
-class ItinerarySerializer(serializers.ModelSerializer):
+class ItinerarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for listing and creating itineraries."""
     # This makes the user field read-only and sets it to the current user automatically.
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -50,7 +60,7 @@ class ItineraryDetailSerializer(ItinerarySerializer):
         fields = ItinerarySerializer.Meta.fields + ['items']
 
 
-class CulturalEventSerializer(serializers.ModelSerializer):
+class CulturalEventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CulturalEvent
         fields = ['id', 'name', 'description', 'city', 'start_date', 'end_date', 'category']
\ No newline at end of file
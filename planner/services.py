@@ -1,9 +1,16 @@
 # In planner/services.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
 from .models import Destination
 from users.models import UserProfile
-import requests
 from django.conf import settings
-from .models import Itinerary
+from django.utils import timezone
+from utils.integrations import IntegrationError, UpstreamHTTPError, get_integration
+from .models import Itinerary, ItineraryItem, WeatherAlert, WeatherForecast
+
+logger = logging.getLogger(__name__)
 
 def get_ai_recommendations(user_profile: UserProfile):
     """
@@ -43,73 +50,240 @@ def get_ai_recommendations(user_profile: UserProfile):
     # Limit to 5 suggestions for a clean response
     return recommendations[:5]
 
+def _weather_params(city):
+    return {
+        'q': city,
+        'appid': settings.OPENWEATHER_API_KEY,
+        'units': 'metric'  # Get temperature in Celsius
+    }
+
+def _format_weather(city, data):
+    """Formats an OpenWeather answer cleanly for our response."""
+    return {
+        "city": city,
+        "temperature": data['main']['temp'],
+        "feels_like": data['main']['feels_like'],
+        "description": data['weather'][0]['description'].title(),
+        "icon_code": data['weather'][0]['icon'],
+        # You can build the full icon URL on the frontend like this:
+        # `http://openweathermap.org/img/wn/{icon_code}@2x.png`
+    }
+
+def _weather_error(city, error):
+    if isinstance(error, IntegrationError):
+        # Handle cases where city is not found (404) or the API is failing
+        return {"city": city, "error": f"Could not retrieve weather data. {error}"}
+    return {"city": city, "error": f"An unexpected error occurred. {error}"}
+
+NO_WEATHER_DESTINATIONS = {"message": "No destinations in this itinerary to fetch weather for."}
+FORECAST_PATH = '/data/2.5/forecast'
+FORECAST_FIELDS = [
+    'temperature', 'feels_like', 'description', 'icon_code',
+    'temp_min', 'temp_max', 'precipitation', 'snow', 'wind_speed',
+]
+
+def _format_forecast(forecast: WeatherForecast):
+    return {
+        "city": forecast.city,
+        "date": forecast.date.isoformat(),
+        "temperature": forecast.temperature,
+        "feels_like": forecast.feels_like,
+        "description": forecast.description.title(),
+        "icon_code": forecast.icon_code,
+    }
+
+def _forecast_dates(itinerary, visits):
+    """
+    Maps each city of the itinerary to the day its weather matters: the first
+    day it's visited, or today for a trip that is already under way.
+    """
+    today = timezone.localdate()
+    dates = {}
+    for city, day_number in visits:
+        day = max(itinerary.start_date + timedelta(days=day_number - 1), today)
+        if city not in dates or day < dates[city]:
+            dates[city] = day
+    return dates
+
+def _stored_forecasts(city_dates):
+    """Prefetched forecasts that are still fresh, for a subset of (city, date) pairs."""
+    fresh_since = timezone.now() - timedelta(seconds=settings.WEATHER_FORECAST_MAX_AGE)
+    return WeatherForecast.objects.filter(
+        city__in=list(city_dates), date__in=set(city_dates.values()), fetched_at__gte=fresh_since
+    )
+
+def _rule_alerts(itinerary):
+    """The itinerary's current WeatherAlerts (see planner/alerts.py)."""
+    return itinerary.weather_alerts.filter(date__gte=timezone.localdate()).values_list(
+        'city', 'date', 'severity', 'message'
+    )
+
+def _with_rule_alerts(weather_data, alerts):
+    by_city = {}
+    for city, date, severity, message in alerts:
+        by_city.setdefault(city, []).append({"date": date.isoformat(), "severity": severity, "message": message})
+    for entry in weather_data:
+        entry["alerts"] = by_city.get(entry["city"], [])
+    return weather_data
+
 def get_weather_alerts_for_itinerary(itinerary: Itinerary):
     """
-    Fetches weather forecasts for the unique cities in an itinerary.
+    Weather for the unique cities in an itinerary. Cities with a prefetched
+    forecast (see prefetch_weather_forecasts) are answered from the database;
+    the others get the current conditions from OpenWeather. Each city lists
+    the weather rules its trip days trigger under "alerts".
     """
     # 1. Get unique cities from the itinerary to avoid duplicate API calls
-    destinations = itinerary.items.select_related('destination').all()
-    unique_cities = {item.destination.city for item in destinations}
-
-    if not unique_cities:
-        return {"message": "No destinations in this itinerary to fetch weather for."}
-
-    # 2. Prepare to call the weather API for each city
-    api_key = settings.OPENWEATHER_API_KEY
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    weather_data = []
-
-    for city in unique_cities:
-        params = {
-            'q': city,
-            'appid': api_key,
-            'units': 'metric'  # Get temperature in Celsius
-        }
+    city_dates = _forecast_dates(itinerary, itinerary.items.values_list('destination__city', 'day_number'))
+
+    if not city_dates:
+        return NO_WEATHER_DESTINATIONS
+
+    forecasts = {f.city: f for f in _stored_forecasts(city_dates) if f.date == city_dates[f.city]}
+    weather_data = [_format_forecast(forecast) for forecast in forecasts.values()]
+
+    # 2. Call the weather API for each remaining city
+    openweather = get_integration('openweather')
+    for city in city_dates:
+        if city in forecasts:
+            continue
         try:
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-            data = response.json()
-
-            # 3. Format the data cleanly for our response
-            weather_data.append({
-                "city": city,
-                "temperature": data['main']['temp'],
-                "feels_like": data['main']['feels_like'],
-                "description": data['weather'][0]['description'].title(),
-                "icon_code": data['weather'][0]['icon'],
-                # You can build the full icon URL on the frontend like this:
-                # `http://openweathermap.org/img/wn/{icon_code}@2x.png`
-            })
-        except requests.exceptions.HTTPError as e:
-            # Handle cases where city is not found (404) or other API errors
-            weather_data.append({"city": city, "error": f"Could not retrieve weather data. {e}"})
+            # Raises for bad status codes (4xx or 5xx), timeouts and an open circuit
+            data = openweather.get('/data/2.5/weather', params=_weather_params(city)).json()
+            weather_data.append(_format_weather(city, data))
         except Exception as e:
-            weather_data.append({"city": city, "error": f"An unexpected error occurred. {e}"})
+            weather_data.append(_weather_error(city, e))
     
-    return weather_data
+    return _with_rule_alerts(weather_data, _rule_alerts(itinerary))
 
-def get_optimized_route_for_itinerary(itinerary: Itinerary):
+async def aget_weather_alerts_for_itinerary(itinerary: Itinerary):
     """
-    Fetches an optimized route connecting all destinations in an itinerary
-    for a specific day (or the whole trip).
+    Async version of get_weather_alerts_for_itinerary(), for async views.
+    The cities without a prefetched forecast are fetched concurrently.
     """
-    # 1. Get the coordinates of all destinations in the itinerary
-    # We order them by day number to make the route logical
-    items = itinerary.items.order_by('day_number', 'start_time').select_related('destination')
-    
-    if items.count() < 2:
-        return {"error": "At least two destinations are required to calculate a route."}
+    visits = [visit async for visit in itinerary.items.values_list('destination__city', 'day_number')]
+    city_dates = _forecast_dates(itinerary, visits)
+    if not city_dates:
+        return NO_WEATHER_DESTINATIONS
 
-    # Format coordinates for the ORS API: [[lon, lat], [lon, lat], ...]
-    coordinates = [
-        [item.destination.longitude, item.destination.latitude] for item in items
-    ]
+    forecasts = {f.city: f async for f in _stored_forecasts(city_dates) if f.date == city_dates[f.city]}
+    openweather = get_integration('openweather')
+
+    async def fetch(city):
+        try:
+            response = await openweather.aget('/data/2.5/weather', params=_weather_params(city))
+            return _format_weather(city, response.json())
+        except Exception as e:
+            return _weather_error(city, e)
+
+    live = await asyncio.gather(*(fetch(city) for city in city_dates if city not in forecasts))
+    alerts = [alert async for alert in _rule_alerts(itinerary)]
+    return _with_rule_alerts([_format_forecast(forecast) for forecast in forecasts.values()] + list(live), alerts)
+
+def upcoming_itinerary_cities(days=None):
+    """
+    The distinct cities of all itineraries that start within the next `days`
+    days (WEATHER_PREFETCH_DAYS by default) or are under way.
+    """
+    if days is None:
+        days = settings.WEATHER_PREFETCH_DAYS
+    today = timezone.localdate()
+    return list(
+        ItineraryItem.objects.filter(
+            itinerary__start_date__lte=today + timedelta(days=days), itinerary__end_date__gte=today
+        )
+        .order_by('destination__city')
+        .values_list('destination__city', flat=True)
+        .distinct()
+    )
 
-    # 2. Call the OpenRouteService API
-    api_key = settings.OPENROUTESERVICE_API_KEY
+def _daily_forecasts(data):
+    """
+    Summarises OpenWeather's 5 day / 3 hour forecast per local day: the
+    conditions closest to midday, and the day's temperature range,
+    precipitation and strongest wind. Returns {date: WeatherForecast fields}.
+    """
+    utc_offset = timedelta(seconds=data.get('city', {}).get('timezone', 0))
+    days = {}
+    for entry in data['list']:
+        local = datetime.fromtimestamp(entry['dt'], dt_timezone.utc) + utc_offset
+        main, wind = entry['main'], entry.get('wind', {})
+        rain, snow = entry.get('rain', {}).get('3h', 0.0), entry.get('snow', {}).get('3h', 0.0)
+        distance = abs(local.hour - 12)
+        day = days.setdefault(local.date(), {
+            'distance': distance, 'entry': entry, 'temp_min': main['temp'], 'temp_max': main['temp'],
+            'precipitation': 0.0, 'snow': 0.0, 'wind_speed': 0.0,
+        })
+        if distance < day['distance']:
+            day.update(distance=distance, entry=entry)
+        day['temp_min'] = min(day['temp_min'], main.get('temp_min', main['temp']))
+        day['temp_max'] = max(day['temp_max'], main.get('temp_max', main['temp']))
+        day['precipitation'] += rain + snow
+        day['snow'] += snow
+        day['wind_speed'] = max(day['wind_speed'], wind.get('speed', 0.0), wind.get('gust', 0.0))
+
+    daily = {}
+    for date, day in days.items():
+        midday = day.pop('entry')
+        del day['distance']
+        daily[date] = dict(
+            day, temperature=midday['main']['temp'], feels_like=midday['main']['feels_like'],
+            description=midday['weather'][0]['description'], icon_code=midday['weather'][0]['icon'],
+        )
+    return daily
+
+def prefetch_weather_forecasts(days=None, concurrency=None):
+    """
+    Stores the forecasts for every city of the itineraries starting within
+    `days` days, so their weather alerts don't wait on OpenWeather. Each city
+    is fetched once however many trips go there, `concurrency` at a time (the
+    OpenWeather bulkhead size by default).
+    Returns (cities, forecasts stored, cities that failed).
+    """
+    cities = upcoming_itinerary_cities(days)
+    if not cities:
+        return 0, 0, []
+    openweather = get_integration('openweather')
+
+    def fetch(city):
+        try:
+            return city, _daily_forecasts(openweather.get(FORECAST_PATH, params=_weather_params(city)).json())
+        except Exception as e:
+            logger.warning("Could not prefetch the forecast for %s: %s", city, e)
+            return city, None
+
+    fetched_at = timezone.now()
+    forecasts, failed = [], []
+    with ThreadPoolExecutor(max_workers=concurrency or openweather.options['max_concurrency']) as pool:
+        for city, daily in pool.map(fetch, cities):
+            if daily is None:
+                failed.append(city)
+                continue
+            forecasts += [
+                WeatherForecast(city=city, date=day, fetched_at=fetched_at, **fields) for day, fields in daily.items()
+            ]
+
+    WeatherForecast.objects.bulk_create(
+        forecasts, batch_size=500, update_conflicts=True, unique_fields=['city', 'date'],
+        update_fields=FORECAST_FIELDS + ['fetched_at'],
+    )
+    return len(cities), len(forecasts), failed
+
+ROUTE_PATH = '/v2/directions/driving-car/geojson'
+TOO_FEW_ROUTE_DESTINATIONS = {"error": "At least two destinations are required to calculate a route."}
+
+def _route_items(itinerary):
+    # We order them by day number to make the route logical
+    return (
+        itinerary.items.order_by('day_number', 'start_time')
+        .values_list('destination__longitude', 'destination__latitude')
+    )
+
+def _route_request(coordinates):
+    """Returns the ORS request (headers, body) for [[lon, lat], [lon, lat], ...]."""
     # ORS requires a POST request with the coordinates in the body
     headers = {
-        'Authorization': api_key,
+        'Authorization': settings.OPENROUTESERVICE_API_KEY,
         'Content-Type': 'application/json',
     }
     # We use the 'directions' endpoint with the 'driving-car' profile
@@ -118,28 +292,54 @@ def get_optimized_route_for_itinerary(itinerary: Itinerary):
         # 'radiuses' helps ORS snap points to the nearest road. -1 means infinite radius.
         "radiuses": [-1] * len(coordinates)
     }
-    
+    return headers, body
+
+def _format_route(data):
+    # Extract the key information: the route geometry, distance, and duration
+    route = data['features'][0]
+    summary = route['properties']['summary']
+
+    return {
+        # The geometry is a GeoJSON LineString, perfect for mapping libraries like Leaflet
+        "route_geometry": route['geometry']['coordinates'],
+        # Distance is in meters, Duration is in seconds
+        "total_distance_km": round(summary['distance'] / 1000, 2),
+        "total_duration_hours": round(summary['duration'] / 3600, 2),
+    }
+
+def _route_error(error):
+    if isinstance(error, UpstreamHTTPError):
+        return {"error": f"Failed to get route from ORS. {error.response.text}"}
+    if isinstance(error, IntegrationError):
+        return {"error": f"Failed to get route from ORS. {error}"}
+    return {"error": f"An unexpected error occurred. {error}"}
+
+def get_optimized_route_for_itinerary(itinerary: Itinerary):
+    """
+    Fetches an optimized route connecting all destinations in an itinerary
+    for a specific day (or the whole trip).
+    """
+    # Format coordinates for the ORS API: [[lon, lat], [lon, lat], ...]
+    coordinates = [list(point) for point in _route_items(itinerary)]
+    if len(coordinates) < 2:
+        return TOO_FEW_ROUTE_DESTINATIONS
+
+    headers, body = _route_request(coordinates)
     try:
-        response = requests.post(
-            'https://api.openrouteservice.org/v2/directions/driving-car/geojson',
-            json=body,
-            headers=headers
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        # 3. Extract the key information: the route geometry, distance, and duration
-        route = data['features'][0]
-        summary = route['properties']['summary']
-
-        return {
-            # The geometry is a GeoJSON LineString, perfect for mapping libraries like Leaflet
-            "route_geometry": route['geometry']['coordinates'],
-            # Distance is in meters, Duration is in seconds
-            "total_distance_km": round(summary['distance'] / 1000, 2),
-            "total_duration_hours": round(summary['duration'] / 3600, 2),
-        }
-    except requests.exceptions.HTTPError as e:
-        return {"error": f"Failed to get route from ORS. {e.response.text}"}
+        response = get_integration('openrouteservice').post(ROUTE_PATH, json=body, headers=headers)
+        return _format_route(response.json())
+    except Exception as e:
+        return _route_error(e)
+
+async def aget_optimized_route_for_itinerary(itinerary: Itinerary):
+    """Async version of get_optimized_route_for_itinerary(), for async views."""
+    coordinates = [list(point) async for point in _route_items(itinerary)]
+    if len(coordinates) < 2:
+        return TOO_FEW_ROUTE_DESTINATIONS
+
+    headers, body = _route_request(coordinates)
+    try:
+        response = await get_integration('openrouteservice').apost(ROUTE_PATH, json=body, headers=headers)
+        return _format_route(response.json())
     except Exception as e:
-        return {"error": f"An unexpected error occurred. {e}"}
+        return _route_error(e)
@@ -1,3 +1,289 @@
-from django.test import TestCase
+# In planner/tests.py
 
-# Create your tests here.
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from utils.metrics import metrics
+from utils.tests import StubUpstream, stub_integration
+from .alerts import evaluate_weather_rules
+from .models import Destination, Itinerary, ItineraryItem, WeatherAlert, WeatherForecast, WeatherRule
+
+
+class ItineraryIntegrationsTest(APITestCase):
+    """
+    Test suite for the (async) weather alert and route endpoints, with
+    OpenWeather and OpenRouteService replaced by local stub servers.
+    """
+
+    def setUp(self):
+        metrics.reset('integration.')
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        self.itinerary = Itinerary.objects.create(
+            user=self.user, name='GB trip', start_date=date(2025, 7, 1), end_date=date(2025, 7, 5)
+        )
+        for day, (name, city, lat, lon) in enumerate([
+            ('Deosai', 'Skardu', 35.0, 75.4),
+            ('Attabad Lake', 'Hunza', 36.3, 74.8),
+        ], 1):
+            destination = Destination.objects.create(
+                name=name, description='A long description', city=city, country='Pakistan',
+                destination_type='PARK', latitude=lat, longitude=lon
+            )
+            ItineraryItem.objects.create(itinerary=self.itinerary, destination=destination, day_number=day)
+
+        self.weather = StubUpstream()
+        self.routes = StubUpstream()
+        self.addCleanup(self.weather.close)
+        self.addCleanup(self.routes.close)
+        integrations = dict(
+            stub_integration('openweather', self.weather.url, failure_threshold=2),
+            **stub_integration('openrouteservice', self.routes.url, retries=1, retry_methods=('POST',))
+        )
+        overrides = override_settings(INTEGRATIONS=integrations)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_weather_alerts_are_fetched_per_city(self):
+        self.weather.respond(200, {
+            'main': {'temp': 12.5, 'feels_like': 10.1},
+            'weather': [{'description': 'light rain', 'icon': '10d'}],
+        })
+        response = self.client.get(reverse('itinerary-alerts', args=[self.itinerary.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(entry['city'] for entry in response.data), ['Hunza', 'Skardu'])
+        self.assertEqual(response.data[0]['description'], 'Light Rain')
+        self.assertTrue(all(path.startswith('/data/2.5/weather?') for _, path, _ in self.weather.requests))
+        self.assertEqual(metrics.snapshot('integration.openweather.')['integration.openweather.latency']['count'], 2)
+
+    def test_failing_weather_api_opens_the_circuit(self):
+        self.weather.respond(503)
+        url = reverse('itinerary-alerts', args=[self.itinerary.pk])
+        response = self.client.get(url)
+
+        # Each city gets a per-city error instead of failing the whole response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all('error' in entry for entry in response.data))
+        calls = len(self.weather.requests)
+
+        # The circuit is open now: the next request fails fast without calling the API
+        response = self.client.get(url)
+        self.assertTrue(all('circuit open' in entry['error'] for entry in response.data))
+        self.assertEqual(len(self.weather.requests), calls)
+
+    def test_other_users_itineraries_are_not_found(self):
+        other = User.objects.create_user(username='other', password='StrongPassword123')
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse('itinerary-route', args=[self.itinerary.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('itinerary-alerts', args=[self.itinerary.pk]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.routes.requests + self.weather.requests, [])
+
+    def test_route_is_retried_after_a_server_error(self):
+        self.routes.respond(502).respond(200, {'features': [{
+            'geometry': {'coordinates': [[75.4, 35.0], [74.8, 36.3]]},
+            'properties': {'summary': {'distance': 180500, 'duration': 19800}},
+        }]})
+        response = self.client.get(reverse('itinerary-route', args=[self.itinerary.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_distance_km'], 180.5)
+        self.assertEqual(response.data['total_duration_hours'], 5.5)
+        self.assertEqual([method for method, _, _ in self.routes.requests], ['POST', 'POST'])
+        self.assertEqual(metrics.get('integration.openrouteservice.retry'), 1)
+
+
+class WeatherForecastPrefetchTest(APITestCase):
+    """
+    Test suite for the `prefetch_weather_forecasts` command and the weather
+    alerts it lets us answer from the database.
+    """
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        other = User.objects.create_user(username='other', password='StrongPassword123')
+        self.trip = self.make_itinerary(self.user, 1, ['Skardu', 'Hunza'])
+        self.make_itinerary(other, 2, ['Skardu'])
+        self.make_itinerary(other, 30, ['Gilgit'])  # Beyond the forecast
+        self.make_itinerary(other, -10, ['Lahore'])  # Already over
+
+        midday = [
+            datetime.combine(self.today + timedelta(days=n), time(hour), dt_timezone.utc)
+            for n in range(5) for hour in (9, 12)
+        ]
+        self.weather = StubUpstream().respond(200, {
+            'city': {'timezone': 0},
+            'list': [{
+                'dt': int(moment.timestamp()),
+                'main': {'temp': 20.0 + moment.hour, 'feels_like': 19.0},
+                'weather': [{'description': 'scattered clouds', 'icon': '03d'}],
+                'rain': {'3h': 1.5},
+                'wind': {'speed': moment.hour / 2, 'gust': 5.0},
+            } for moment in midday],
+        })
+        self.addCleanup(self.weather.close)
+        overrides = override_settings(INTEGRATIONS=stub_integration('openweather', self.weather.url))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def make_itinerary(self, user, starts_in, cities):
+        start = self.today + timedelta(days=starts_in)
+        itinerary = Itinerary.objects.create(user=user, name='Trip', start_date=start, end_date=start + timedelta(days=3))
+        for day, city in enumerate(cities, 1):
+            destination = Destination.objects.create(
+                name=city, description='-', city=city, country='Pakistan', destination_type='PARK'
+            )
+            ItineraryItem.objects.create(itinerary=itinerary, destination=destination, day_number=day)
+        return itinerary
+
+    def test_forecasts_are_fetched_once_per_city(self):
+        call_command('prefetch_weather_forecasts', stdout=StringIO())
+
+        self.assertEqual(sorted(path.split('q=')[1].split('&')[0] for _, path, _ in self.weather.requests), ['Hunza', 'Skardu'])
+        self.assertTrue(all(path.startswith('/data/2.5/forecast?') for _, path, _ in self.weather.requests))
+        self.assertEqual(WeatherForecast.objects.count(), 10)
+        # Midday conditions, and the whole day's range and totals
+        forecast = WeatherForecast.objects.get(city='Skardu', date=self.today)
+        self.assertEqual((forecast.temperature, forecast.temp_min, forecast.temp_max), (32.0, 29.0, 32.0))
+        self.assertEqual((forecast.precipitation, forecast.wind_speed), (3.0, 6.0))
+
+        # Prefetching again updates the stored rows instead of adding more
+        call_command('prefetch_weather_forecasts', stdout=StringIO())
+        self.assertEqual(WeatherForecast.objects.count(), 10)
+
+    def test_alerts_are_answered_from_prefetched_forecasts(self):
+        call_command('prefetch_weather_forecasts', stdout=StringIO())
+        calls = len(self.weather.requests)
+
+        response = self.client.get(reverse('itinerary-alerts', args=[self.trip.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.weather.requests), calls)
+        by_city = {entry['city']: entry for entry in response.data}
+        # Each city's forecast is for the day it's visited
+        self.assertEqual(by_city['Skardu']['date'], (self.today + timedelta(days=1)).isoformat())
+        self.assertEqual(by_city['Hunza']['date'], (self.today + timedelta(days=2)).isoformat())
+        self.assertEqual(by_city['Hunza']['description'], 'Scattered Clouds')
+
+    def test_stale_forecasts_fall_back_to_current_weather(self):
+        call_command('prefetch_weather_forecasts', stdout=StringIO())
+        WeatherForecast.objects.filter(city='Hunza').update(fetched_at=timezone.now() - timedelta(days=1))
+        self.weather.requests.clear()
+
+        response = self.client.get(reverse('itinerary-alerts', args=[self.trip.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([path.split('?')[0] for _, path, _ in self.weather.requests], ['/data/2.5/weather'])
+        self.assertIn('date', {entry['city']: entry for entry in response.data}['Skardu'])
+
+
+class WeatherRuleEngineTest(APITestCase):
+    """
+    Test suite for evaluating weather rules against stored forecasts
+    (planner/alerts.py) and the alerts they add to the weather endpoint.
+    """
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        self.naran = Destination.objects.create(
+            name='Babusar Top', description='-', city='Naran', country='Pakistan', destination_type='HIKING_TRAIL'
+        )
+        self.lahore = Destination.objects.create(
+            name='Badshahi Mosque', description='-', city='Lahore', country='Pakistan', destination_type='LANDMARK'
+        )
+        # Naran on day 2 (tomorrow), Lahore on day 1 (today)
+        self.trip = self.make_itinerary(0, [(1, self.lahore), (2, self.naran)])
+        # Naran on day 1 (today), when there's no snow
+        self.other_trip = self.make_itinerary(0, [(1, self.naran)])
+
+        for offset in range(3):
+            date = self.today + timedelta(days=offset)
+            self.forecast('Naran', date, snow=12.0 if offset == 1 else 0.0, temp_min=-4.0)
+            self.forecast('Lahore', date, temp_max=44.0)
+
+        self.snow = WeatherRule.objects.create(
+            name='Snow on the pass', metric='snow', comparison='ABOVE', threshold=5, city='Naran',
+            severity='SEVERE', message='{value} mm of snow expected in {city} on {date}.'
+        )
+        self.heat = WeatherRule.objects.create(
+            name='Heatwave', metric='temp_max', comparison='ABOVE', threshold=40, message='Extreme heat.'
+        )
+        WeatherRule.objects.create(
+            name='Frost', metric='temp_min', comparison='BELOW', threshold=-10, message='Frost.'
+        )
+
+    def make_itinerary(self, starts_in, days):
+        start = self.today + timedelta(days=starts_in)
+        itinerary = Itinerary.objects.create(user=self.user, name='Trip', start_date=start, end_date=start + timedelta(days=3))
+        for day_number, destination in days:
+            ItineraryItem.objects.create(itinerary=itinerary, destination=destination, day_number=day_number)
+        return itinerary
+
+    def forecast(self, city, date, **fields):
+        values = dict(
+            temperature=10.0, feels_like=8.0, description='snow', icon_code='13d', temp_min=0.0, temp_max=20.0,
+            precipitation=fields.get('snow', 0.0), snow=0.0, wind_speed=3.0, fetched_at=timezone.now(),
+        )
+        values.update(fields)
+        WeatherForecast.objects.update_or_create(city=city, date=date, defaults=values)
+
+    def test_rules_raise_alerts_for_the_matching_itinerary_days(self):
+        self.assertEqual(evaluate_weather_rules(), 2)
+
+        snow = WeatherAlert.objects.get(rule=self.snow)
+        self.assertEqual((snow.itinerary, snow.date), (self.trip, self.today + timedelta(days=1)))
+        self.assertEqual(snow.message, f'12.0 mm of snow expected in Naran on {snow.date}.')
+        self.assertEqual(snow.severity, 'SEVERE')
+        # The other trip is in Naran on a day without snow, and nobody visits Lahore on a hot day but us
+        self.assertEqual(
+            list(WeatherAlert.objects.values_list('itinerary', 'rule')),
+            [(self.trip.pk, self.heat.pk), (self.trip.pk, self.snow.pk)],
+        )
+
+    def test_reevaluation_keeps_notified_alerts_and_drops_stale_ones(self):
+        evaluate_weather_rules()
+        WeatherAlert.objects.filter(rule=self.heat).update(notified_at=timezone.now())
+
+        # The snow forecast clears; the heatwave is still on
+        self.forecast('Naran', self.today + timedelta(days=1), snow=0.0)
+        self.assertEqual(evaluate_weather_rules(), 1)
+
+        alert = WeatherAlert.objects.get()
+        self.assertEqual(alert.rule, self.heat)
+        self.assertIsNotNone(alert.notified_at)
+
+    def test_a_shorter_window_keeps_alerts_beyond_it(self):
+        evaluate_weather_rules()
+        WeatherAlert.objects.update(notified_at=timezone.now())
+
+        # Only today: tomorrow's snow alert is outside the window, not stale
+        self.assertEqual(evaluate_weather_rules(days=0), 1)
+        snow = WeatherAlert.objects.get(rule=self.snow)
+        self.assertIsNotNone(snow.notified_at)
+        self.assertEqual(WeatherAlert.objects.count(), 2)
+
+    def test_alerts_endpoint_lists_the_alerts_per_city(self):
+        evaluate_weather_rules()
+        response = self.client.get(reverse('itinerary-alerts', args=[self.trip.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_city = {entry['city']: entry for entry in response.data}
+        self.assertEqual(by_city['Naran']['alerts'], [{
+            'date': (self.today + timedelta(days=1)).isoformat(), 'severity': 'SEVERE',
+            'message': f'12.0 mm of snow expected in Naran on {self.today + timedelta(days=1)}.',
+        }])
+        self.assertEqual([alert['message'] for alert in by_city['Lahore']['alerts']], ['Extreme heat.'])
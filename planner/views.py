@@ -8,13 +8,26 @@ from .serializers import DestinationSerializer
 from rest_framework import viewsets
 from .models import Itinerary, ItineraryItem
 from .serializers import ItinerarySerializer, ItineraryDetailSerializer, ItineraryItemSerializer
-from .services import get_weather_alerts_for_itinerary
+from .services import aget_weather_alerts_for_itinerary
 
 from django_filters.rest_framework import DjangoFilterBackend 
 from rest_framework import generics 
 from .models import CulturalEvent 
 from .serializers import CulturalEventSerializer 
-from .services import get_optimized_route_for_itinerary
+from .services import aget_optimized_route_for_itinerary
+from asgiref.sync import sync_to_async
+from jobs.services import enqueue
+from jobs.views import wants_background, job_accepted_response
+from utils.async_views import AsyncAPIView
+from utils.mixins import SparseFieldsetViewMixin
+from users.authentication import get_cached_user
+
+async def start_itinerary_job(request, kind, itinerary):
+    """Queues a background job for `itinerary` (one per itinerary at a time) and returns the 202."""
+    job, _ = await sync_to_async(enqueue)(
+        kind, {'itinerary': itinerary.pk}, key=f'itinerary:{itinerary.pk}', user=request.user
+    )
+    return job_accepted_response(request, job)
 
 class AIRecommendationView(APIView):
     """
@@ -30,7 +43,7 @@ class AIRecommendationView(APIView):
         user = request.user
         try:
             # The AI service needs the user's profile
-            recommendations = get_ai_recommendations(user.profile)
+            recommendations = get_ai_recommendations(get_cached_user(user.pk).profile)
             
             # If no recommendations are found, return a helpful message
             if not recommendations:
@@ -50,7 +63,7 @@ class AIRecommendationView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class ItineraryViewSet(viewsets.ModelViewSet):
+class ItineraryViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to create, view, update, and delete their itineraries.
     """
@@ -60,7 +73,7 @@ class ItineraryViewSet(viewsets.ModelViewSet):
         """
         This view should only return itineraries for the currently authenticated user.
         """
-        return Itinerary.objects.filter(user=self.request.user).prefetch_related('items__destination')
+        return Itinerary.objects.filter(user=self.request.user)
 
     def get_serializer_class(self):
         """
@@ -78,7 +91,7 @@ class ItineraryViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
-class ItineraryItemViewSet(viewsets.ModelViewSet):
+class ItineraryItemViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing items within a specific itinerary.
     Allows adding, updating, and removing destinations from a trip plan.
@@ -106,24 +119,29 @@ class ItineraryItemViewSet(viewsets.ModelViewSet):
         itinerary = Itinerary.objects.get(id=itinerary_id, user=self.request.user) # Security check!
         serializer.save(itinerary=itinerary)
 
-class WeatherAlertsView(APIView):
+class WeatherAlertsView(AsyncAPIView):
     """
     API endpoint to get weather alerts for a specific itinerary.
+    Async, so under ASGI waiting on the weather API doesn't hold a worker.
+    With `?background=true` (for long trips) the alerts are fetched by a
+    background job instead and the response is a 202 with the job to poll.
     """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, itinerary_pk, *args, **kwargs):
+    async def get(self, request, itinerary_pk, *args, **kwargs):
         try:
             # Security check: ensure user owns the itinerary
-            itinerary = Itinerary.objects.get(pk=itinerary_pk, user=request.user)
+            itinerary = await Itinerary.objects.aget(pk=itinerary_pk, user=request.user)
         except Itinerary.DoesNotExist:
             return Response({"error": "Itinerary not found."}, status=status.HTTP_404_NOT_FOUND)
             
-        weather_alerts = get_weather_alerts_for_itinerary(itinerary)
+        if wants_background(request):
+            return await start_itinerary_job(request, 'planner.weather_alerts', itinerary)
+        weather_alerts = await aget_weather_alerts_for_itinerary(itinerary)
         
         return Response(weather_alerts, status=status.HTTP_200_OK)
 
-class CulturalEventsView(generics.ListAPIView):
+class CulturalEventsView(SparseFieldsetViewMixin, generics.ListAPIView):
     """
     API endpoint to list and filter cultural events.
     Allows filtering by city and category.
@@ -135,20 +153,25 @@ class CulturalEventsView(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['city', 'category']
 
-class ItineraryRouteView(APIView):
+class ItineraryRouteView(AsyncAPIView):
     """
     API endpoint to get an optimized route for a specific itinerary.
+    Async, so under ASGI waiting on the routing API doesn't hold a worker.
+    With `?background=true` the route is calculated by a background job
+    instead and the response is a 202 with the job to poll.
     """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, itinerary_pk, *args, **kwargs):
+    async def get(self, request, itinerary_pk, *args, **kwargs):
         try:
             # Security check: ensure user owns the itinerary
-            itinerary = Itinerary.objects.get(pk=itinerary_pk, user=request.user)
+            itinerary = await Itinerary.objects.aget(pk=itinerary_pk, user=request.user)
         except Itinerary.DoesNotExist:
             return Response({"error": "Itinerary not found."}, status=status.HTTP_404_NOT_FOUND)
             
-        route_data = get_optimized_route_for_itinerary(itinerary)
+        if wants_background(request):
+            return await start_itinerary_job(request, 'planner.optimize_route', itinerary)
+        route_data = await aget_optimized_route_for_itinerary(itinerary)
         
         if "error" in route_data:
             # Pass along any errors from the service
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ChangeLog
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    """Read-mostly view of the sync change log, for debugging client syncs."""
+    list_display = ('id', 'user_id', 'collection', 'object_id', 'action', 'created_at')
+    list_filter = ('collection', 'action')
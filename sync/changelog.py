@@ -0,0 +1,91 @@
+# In sync/changelog.py
+"""
+Writing to the change log that drives /api/sync/.
+
+Model saves and deletes are recorded by the signals in sync/signals.py. Code
+that changes synced rows without sending signals (queryset.update(),
+bulk_create()) must call `record_changes` itself, and nothing else should
+insert ChangeLog rows (see ChangeLogWriteLock).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import ChangeLog, ChangeLogWriteLock
+
+ITINERARIES = 'itineraries'
+ITINERARY_ITEMS = 'itinerary_items'
+BOOKINGS = 'bookings'
+CONVERSATIONS = 'conversations'
+MESSAGES = 'messages'
+
+COLLECTIONS = (ITINERARIES, ITINERARY_ITEMS, BOOKINGS, CONVERSATIONS, MESSAGES)
+
+_state = threading.local()
+
+
+@contextmanager
+def without_tombstones(*collections):
+    """
+    Rows of `collections` deleted inside this block are not logged as deleted,
+    for deletes that only move data elsewhere (e.g. message archival), so
+    clients keep their copies.
+    """
+    previous = getattr(_state, 'silenced', frozenset())
+    _state.silenced = previous | set(collections)
+    try:
+        yield
+    finally:
+        _state.silenced = previous
+
+
+def tombstones_silenced(collection):
+    return collection in getattr(_state, 'silenced', ())
+
+
+def lock_feeds(user_ids):
+    """
+    Locks the change logs of `user_ids` until the outermost transaction
+    commits, so ids in each feed are taken in commit order. Locks are taken
+    in user id order, so two writers to the same pair of feeds can't deadlock.
+    """
+    def lock(ids):
+        locked = ChangeLogWriteLock.objects.select_for_update().filter(user_id__in=ids).order_by('user_id')
+        return {row.user_id for row in locked}
+
+    missing = set(user_ids) - lock(user_ids)
+    if missing:
+        # First write to these feeds: create their lock rows, then lock them
+        ChangeLogWriteLock.objects.bulk_create(
+            [ChangeLogWriteLock(user_id=user_id) for user_id in sorted(missing)], ignore_conflicts=True
+        )
+        lock(missing)
+
+
+def record_changes(collection, object_ids, user_ids, deleted=False):
+    """
+    Records that the objects `object_ids` of `collection` were created/changed
+    (or deleted) for each of `user_ids`.
+    """
+    object_ids = list(object_ids)
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not object_ids or not user_ids:
+        return
+
+    action = ChangeLog.Action.DELETE if deleted else ChangeLog.Action.UPSERT
+    with transaction.atomic():
+        lock_feeds(user_ids)
+        # Supersede the previous rows so each object appears at most once per user
+        ChangeLog.objects.filter(
+            user_id__in=user_ids, collection=collection, object_id__in=object_ids
+        ).delete()
+        ChangeLog.objects.bulk_create([
+            ChangeLog(user_id=user_id, collection=collection, object_id=object_id, action=action)
+            for user_id in user_ids
+            for object_id in object_ids
+        ])
+
+
+def record_change(collection, object_id, user_ids, deleted=False):
+    record_changes(collection, [object_id], user_ids, deleted=deleted)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:14
+
+from django.db import migrations
+
+
+def backfill_changelog(apps, schema_editor):
+    """Logs every existing synced object once, so the first sync (since=0) returns it."""
+    ChangeLog = apps.get_model('sync', 'ChangeLog')
+    sources = [
+        ('itineraries', apps.get_model('planner', 'Itinerary').objects.values_list('id', 'user_id')),
+        ('itinerary_items', apps.get_model('planner', 'ItineraryItem').objects.values_list('id', 'itinerary__user_id')),
+        ('bookings', apps.get_model('vendors', 'Booking').objects.values_list('id', 'user_id', 'service__vendor__user_id')),
+        ('conversations', apps.get_model('messaging', 'Conversation').objects.values_list('id', 'tourist_id', 'vendor_id')),
+        ('messages', apps.get_model('messaging', 'Message').objects.values_list(
+            'id', 'conversation__tourist_id', 'conversation__vendor_id'
+        )),
+    ]
+    for collection, rows in sources:
+        entries = []
+        for object_id, *user_ids in rows.order_by('id').iterator():
+            for user_id in set(user_ids):
+                entries.append(ChangeLog(user_id=user_id, collection=collection, object_id=object_id, action='U'))
+            if len(entries) >= 1000:
+                ChangeLog.objects.bulk_create(entries)
+                entries = []
+        ChangeLog.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+        ('planner', '0006_culturalevent'),
+        ('vendors', '0004_vendor_daily_stats'),
+        ('messaging', '0003_message_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+def create_lock_row(apps, schema_editor):
+    """The row writers lock, created up front so they never race to insert it."""
+    apps.get_model('sync', 'ChangeLogWriteLock').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0002_backfill_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogWriteLock',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.RunPython(create_lock_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Replaces the single change log write lock with one lock row per user."""
+
+    dependencies = [
+        ('sync', '0003_changelog_write_lock'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ChangeLogWriteLock',
+        ),
+        migrations.CreateModel(
+            name='ChangeLogWriteLock',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# In sync/models.py
+from django.db import models
+
+
+class ChangeLog(models.Model):
+    """
+    One row per synced object per user who can see it, pointing at the object's
+    latest change. A user's rows are only written while holding their
+    ChangeLogWriteLock, so the ids in each user's feed become visible in order
+    and "everything since token N" is an index
+    range scan on (user_id, id). Older rows for the same object are removed when
+    a new one is written, so the log holds at most one row per object and user,
+    and `since=0` doubles as a full initial sync.
+    """
+    class Action(models.TextChoices):
+        UPSERT = 'U', 'Created or changed'
+        DELETE = 'D', 'Deleted'
+
+    # Not a foreign key: rows are written while a user's objects are being
+    # cascade-deleted along with the user
+    user_id = models.IntegerField()
+    collection = models.CharField(max_length=32, help_text="e.g. 'itineraries', 'messages'")
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=1, choices=Action.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The sync feed: WHERE user_id = ? AND id > ? ORDER BY id
+            models.Index(fields=['user_id', 'id'], name='changelog_user_feed'),
+            # Superseding an object's previous row
+            models.Index(fields=['user_id', 'collection', 'object_id'], name='changelog_user_object'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.get_action_display()} {self.collection}/{self.object_id} for user {self.user_id}"
+
+
+class ChangeLogWriteLock(models.Model):
+    """
+    One row per user, which a transaction locks (SELECT ... FOR UPDATE)
+    before writing to that user's change log, and keeps locked until it
+    commits.
+
+    Autoincrement ids are handed out when a row is inserted, not when it is
+    committed: without the lock, a transaction holding id 10 could commit
+    after another one's id 11 had already been synced, and a client whose
+    token moved past 11 would never see row 10. With it, a transaction only
+    takes ids in a user's feed once every earlier writer to that feed has
+    committed. Writers to other users' feeds don't wait.
+    """
+    # Not a foreign key, like ChangeLog.user_id
+    user_id = models.IntegerField(primary_key=True)
+
+    def __str__(self):
+        return f"Change log write lock for user {self.user_id}"
@@ -0,0 +1,23 @@
+# In sync/serializers.py
+from rest_framework import serializers
+
+from messaging.serializers import MessageSerializer
+from planner.serializers import ItineraryItemSerializer
+
+
+class SyncItineraryItemSerializer(ItineraryItemSerializer):
+    """Itinerary items arrive on their own in a sync, so they say which itinerary they belong to."""
+
+    class Meta(ItineraryItemSerializer.Meta):
+        fields = ItineraryItemSerializer.Meta.fields + ['itinerary']
+
+
+class SyncMessageSerializer(MessageSerializer):
+    """
+    Messages with their conversation, for the sync feed. Read state isn't included:
+    it comes from the conversation's read markers, which are synced instead.
+    """
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ['conversation']
+        read_only_fields = fields
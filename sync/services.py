@@ -0,0 +1,88 @@
+# In sync/services.py
+"""
+Builds the /api/sync/ response from the change log.
+"""
+from rest_framework import serializers
+
+from messaging.models import Conversation, Message
+from messaging.pagination import done_translations
+from messaging.serializers import ConversationSerializer
+from planner.models import Itinerary, ItineraryItem
+from planner.serializers import ItinerarySerializer
+from vendors.models import Booking
+from vendors.serializers import BookingSerializer
+
+from . import changelog
+from .models import ChangeLog
+from .serializers import SyncItineraryItemSerializer, SyncMessageSerializer
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+# collection -> (queryset the current rows are read from, serializer)
+SYNC_SOURCES = {
+    changelog.ITINERARIES: (Itinerary.objects.all(), ItinerarySerializer),
+    changelog.ITINERARY_ITEMS: (ItineraryItem.objects.select_related('destination'), SyncItineraryItemSerializer),
+    changelog.BOOKINGS: (Booking.objects.select_related('service'), BookingSerializer),
+    changelog.CONVERSATIONS: (
+        Conversation.objects.select_related('tourist', 'vendor', 'service'), ConversationSerializer
+    ),
+    changelog.MESSAGES: (
+        Message.objects.select_related('sender').prefetch_related(done_translations()), SyncMessageSerializer
+    ),
+}
+
+
+def parse_sync_token(token):
+    """Sync tokens are opaque to clients; an empty token means "from the beginning"."""
+    if not token:
+        return 0
+    try:
+        value = int(token)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise serializers.ValidationError({'since': 'Invalid sync token.'})
+    return value
+
+
+def get_changes(user, since=0, limit=DEFAULT_SYNC_LIMIT, context=None):
+    """
+    Returns the objects `user` can see that were created, changed or deleted
+    after the sync token `since`, oldest change first, at most `limit` of them:
+
+        {'next': <token>, 'has_more': bool,
+         'changes': {collection: [object, ...]}, 'deleted': {collection: [id, ...]}}
+
+    A sync with nothing new is a single index probe on the change log.
+    """
+    limit = max(1, min(limit, MAX_SYNC_LIMIT))
+    entries = list(
+        ChangeLog.objects
+        .filter(user_id=user.pk, id__gt=since)
+        .order_by('id')
+        .values_list('id', 'collection', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserts = {}
+    deleted = {}
+    for _, collection, object_id, action in entries:
+        if action == ChangeLog.Action.DELETE:
+            deleted.setdefault(collection, []).append(object_id)
+        else:
+            upserts.setdefault(collection, []).append(object_id)
+
+    changes = {}
+    for collection, object_ids in upserts.items():
+        queryset, serializer_class = SYNC_SOURCES[collection]
+        rows = queryset.filter(pk__in=object_ids).order_by('pk')
+        changes[collection] = serializer_class(rows, many=True, context=context or {}).data
+
+    return {
+        'next': str(entries[-1][0] if entries else since),
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    }
@@ -0,0 +1,64 @@
+# In sync/signals.py
+"""
+Records saves and deletes of the synced models in the change log, for every
+user the object is visible to.
+"""
+from django.db.models.signals import post_save, post_delete
+
+from messaging.models import Conversation, Message
+from planner.models import Itinerary, ItineraryItem
+from vendors.models import Booking, Service
+
+from . import changelog
+
+
+def _itinerary_owners(itinerary):
+    return [itinerary.user_id]
+
+
+def _itinerary_item_owners(item):
+    return [item.itinerary.user_id]
+
+
+def _booking_owners(booking):
+    # The tourist who booked and the vendor whose service it is
+    vendor_user_id = Service.objects.filter(pk=booking.service_id).values_list('vendor__user_id', flat=True).first()
+    return [booking.user_id, vendor_user_id]
+
+
+def _conversation_owners(conversation):
+    return [conversation.tourist_id, conversation.vendor_id]
+
+
+def _message_owners(message):
+    return _conversation_owners(message.conversation)
+
+
+SYNCED_MODELS = {
+    Itinerary: (changelog.ITINERARIES, _itinerary_owners),
+    ItineraryItem: (changelog.ITINERARY_ITEMS, _itinerary_item_owners),
+    Booking: (changelog.BOOKINGS, _booking_owners),
+    Conversation: (changelog.CONVERSATIONS, _conversation_owners),
+    Message: (changelog.MESSAGES, _message_owners),
+}
+
+
+def record_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    collection, owners = SYNCED_MODELS[sender]
+    changelog.record_change(collection, instance.pk, owners(instance))
+
+
+def record_delete(sender, instance, **kwargs):
+    collection, owners = SYNCED_MODELS[sender]
+    if changelog.tombstones_silenced(collection):
+        return
+    changelog.record_change(collection, instance.pk, owners(instance), deleted=True)
+
+
+# Connected per model rather than for every sender: a post_delete receiver
+# without a sender would stop Django from fast-deleting any model's rows
+for model in SYNCED_MODELS:
+    post_save.connect(record_save, sender=model, dispatch_uid=f'sync_save_{model._meta.label_lower}')
+    post_delete.connect(record_delete, sender=model, dispatch_uid=f'sync_delete_{model._meta.label_lower}')
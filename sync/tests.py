@@ -0,0 +1,148 @@
+# In sync/tests.py
+
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from messaging.models import Conversation
+from messaging.services import post_message, mark_conversation_read
+from planner.models import Itinerary, ItineraryItem, Destination
+from sync.models import ChangeLogWriteLock
+from vendors.models import Vendor, Service, Booking
+
+
+class DeltaSyncTest(APITestCase):
+    """
+    Test suite for GET /api/sync/ and the change log behind it.
+    """
+
+    def setUp(self):
+        self.url = reverse('sync')
+        self.tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.vendor_user = User.objects.create_user(username='vendor', password='StrongPassword123')
+        vendor = Vendor.objects.create(user=self.vendor_user, business_name='Deosai Camps', contact_phone='0300')
+        self.service = Service.objects.create(
+            vendor=vendor, name='Lakeside Room', description='A room', service_type='HOTEL',
+            price=Decimal('100.00'), city='Skardu'
+        )
+        self.booking = Booking.objects.create(
+            user=self.tourist, service=self.service, service_start_date=date(2025, 7, 1), total_price=Decimal('100.00')
+        )
+        self.itinerary = Itinerary.objects.create(
+            user=self.tourist, name='GB trip', start_date=date(2025, 7, 1), end_date=date(2025, 7, 5)
+        )
+        destination = Destination.objects.create(
+            name='Deosai', description='Plains', city='Skardu', country='Pakistan', destination_type='PARK'
+        )
+        self.item = ItineraryItem.objects.create(itinerary=self.itinerary, destination=destination, day_number=1)
+        self.conversation = Conversation.objects.create(
+            service=self.service, tourist=self.tourist, vendor=self.vendor_user
+        )
+        post_message(self.conversation, self.tourist, 'Is the room free?')
+        self.client.force_authenticate(self.tourist)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, data, collection):
+        return [row['id'] for row in data['changes'].get(collection, [])]
+
+    def test_full_sync_returns_everything_the_user_can_see(self):
+        data = self.sync()
+
+        self.assertEqual(self.ids(data, 'itineraries'), [self.itinerary.id])
+        self.assertEqual(data['changes']['itinerary_items'][0]['itinerary'], self.itinerary.id)
+        self.assertEqual(self.ids(data, 'bookings'), [self.booking.id])
+        self.assertEqual(self.ids(data, 'conversations'), [self.conversation.id])
+        self.assertEqual(data['changes']['messages'][0]['body'], 'Is the room free?')
+        self.assertEqual(data['deleted'], {})
+        self.assertFalse(data['has_more'])
+
+        # The vendor sees the booking and conversation, but not the tourist's itinerary
+        self.client.force_authenticate(self.vendor_user)
+        data = self.sync()
+        self.assertEqual(sorted(data['changes']), ['bookings', 'conversations', 'messages'])
+
+    def test_sync_with_no_changes_is_a_single_query(self):
+        token = self.sync()['next']
+
+        with self.assertNumQueries(1):
+            data = self.sync(token)
+        self.assertEqual((data['next'], data['changes'], data['deleted']), (token, {}, {}))
+
+    def test_changes_and_deletes_since_the_last_token(self):
+        token = self.sync()['next']
+        booking_id, itinerary_id = self.booking.id, self.itinerary.id
+        self.itinerary.name = 'GB trip (final)'
+        self.itinerary.save()
+        self.booking.delete()
+
+        data = self.sync(token)
+        self.assertEqual(data['changes']['itineraries'][0]['name'], 'GB trip (final)')
+        self.assertNotIn('itinerary_items', data['changes'])
+        self.assertEqual(data['deleted'], {'bookings': [booking_id]})
+
+        # Deleting an itinerary leaves tombstones for its items too
+        self.itinerary.delete()
+        data = self.sync(data['next'])
+        self.assertEqual(data['deleted'], {'itinerary_items': [self.item.id], 'itineraries': [itinerary_id]})
+
+    def test_read_receipts_reach_the_sender(self):
+        token = self.sync()['next']
+        mark_conversation_read(self.conversation, self.vendor_user)
+
+        # The receipt travels on the conversation, not as a change to every message
+        data = self.sync(token)
+        self.assertNotIn('messages', data['changes'])
+        self.assertEqual(
+            data['changes']['conversations'][0]['vendor_read_up_to'], self.conversation.last_message_id
+        )
+
+    def test_large_syncs_are_paged(self):
+        for i in range(4):
+            post_message(self.conversation, self.vendor_user, f'Reply {i}')
+
+        seen = []
+        data = {'next': None, 'has_more': True}
+        while data['has_more']:
+            data = self.sync(data['next'], limit=3)
+            for rows in data['changes'].values():
+                seen.extend(rows)
+        # 1 itinerary, 1 item, 1 booking, 1 conversation and 5 messages, each once
+        self.assertEqual(len(seen), 9)
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_change_log_writes_lock_the_feeds_they_write_to(self):
+        """Ids must be taken in commit order, or a late commit could slip behind a client's token."""
+        with CaptureQueriesContext(connection) as queries:
+            post_message(self.conversation, self.vendor_user, 'Yes, it is.')
+
+        statements = [query['sql'] for query in queries]
+        lock = next(i for i, sql in enumerate(statements) if 'sync_changelogwritelock' in sql)
+        insert = next(i for i, sql in enumerate(statements) if sql.startswith('INSERT INTO "sync_changelog"'))
+        self.assertLess(lock, insert)
+        # Only the feeds written to are locked
+        self.assertEqual(
+            set(ChangeLogWriteLock.objects.values_list('user_id', flat=True)), {self.tourist.id, self.vendor_user.id}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            Itinerary.objects.create(
+                user=self.tourist, name='Hunza', start_date=date(2025, 8, 1), end_date=date(2025, 8, 3)
+            )
+        locks = [query['sql'] for query in queries if 'sync_changelogwritelock' in query['sql']]
+        # The lock row exists by now: one SELECT ... FOR UPDATE of the tourist's row
+        self.assertEqual(len(locks), 1)
+        self.assertIn(f'IN ({self.tourist.id})', locks[0])
@@ -0,0 +1,32 @@
+# In sync/views.py
+
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .services import get_changes, parse_sync_token, DEFAULT_SYNC_LIMIT
+
+
+class SyncView(APIView):
+    """
+    Delta sync for offline-first clients.
+    Accessible at: GET /api/sync/?since=<token>&limit=500
+
+    Returns the user's itineraries, itinerary items, bookings, conversations and
+    messages created or changed since `since`, plus the ids of those deleted.
+    Omit `since` for a full sync. Store the returned `next` token and pass it as
+    `since` next time; while `has_more` is true, call again straight away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        since = parse_sync_token(request.query_params.get('since'))
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SYNC_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            get_changes(request.user, since=since, limit=limit, context={'request': request}),
+            status=status.HTTP_200_OK
+        )
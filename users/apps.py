@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        # Connects the user cache, profile cache and revoked-token filter signals
+        from . import authentication, profile_cache, tokens  # noqa: F401
+        from .jobs import start_token_flushes
+        post_migrate.connect(start_token_flushes, sender=self, dispatch_uid='users_start_token_flushes')
@@ -0,0 +1,148 @@
+# In users/authentication.py
+"""
+JWT authentication without a per-request user query.
+
+SimpleJWT's JWTAuthentication loads the User row on every request. Access
+tokens minted by TouristaRefreshToken also carry the username and the
+staff/superuser flags, so `ClaimsJWTAuthentication` builds `request.user`
+from the token instead: a User instance with only those fields loaded, which
+can be compared, filtered on and assigned to foreign keys like the real one.
+Reading any other field (e.g. `request.user.email`) fetches the row.
+
+The claims are only trusted this far:
+
+- never for privileges: a token claiming `is_staff` or `is_superuser` is
+  checked against the database, so a demoted admin loses access at once;
+- only for TOKEN_CLAIMS_MAX_AGE seconds after the token was issued. Older
+  tokens are checked against the database, so a deactivated or deleted user
+  is rejected within that time in every worker, whatever the cache backend.
+  Clients that refresh their access token at least that often never pay for
+  the lookup.
+
+Saving a User also publishes its current claims, including `is_active`, to
+the cache for that long, and those outrank the token's: with a shared cache
+(or in the worker that made the change) a deactivated user is rejected on
+their next request.
+
+Views that need the rest of the user or the profile use `get_cached_user()`,
+a short-lived shared cache of the User with its profile. Any save of either
+(e.g. from UserSerializer.update) clears it.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import UserProfile
+
+# Each claim is named after the User field it carries
+CLAIM_FIELDS = ('username', 'is_staff', 'is_superuser')
+
+# Claims that can only be granted by the database
+PRIVILEGE_CLAIMS = ('is_staff', 'is_superuser')
+
+# How long get_cached_user() trusts a cached copy, unless a save clears it first
+DEFAULT_USER_CACHE_TIMEOUT = 60
+
+# How long after issue a token's claims are trusted without the database
+DEFAULT_TOKEN_CLAIMS_MAX_AGE = 5 * 60
+
+
+def claims_max_age():
+    return getattr(settings, 'TOKEN_CLAIMS_MAX_AGE', DEFAULT_TOKEN_CLAIMS_MAX_AGE)
+
+
+def token_claims_are_fresh(token):
+    """True if `token` was issued recently enough for its claims to be used as they are."""
+    issued_at = token.get('iat')
+    return issued_at is not None and timezone.now().timestamp() - issued_at < claims_max_age()
+
+
+def _claims_key(user_id):
+    return f'users:claims:{user_id}'
+
+
+def _user_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def load_user_claims(user_id):
+    """The claims to put in a new access token for `user_id`."""
+    cached = cache.get(_claims_key(user_id))
+    if cached is not None:
+        return {field: cached[field] for field in CLAIM_FIELDS}
+    return User.objects.filter(pk=user_id).values(*CLAIM_FIELDS).first() or {}
+
+
+def claims_user(user_id, claims):
+    """A User with only the id, `is_active` and the claim fields loaded."""
+    values = {'id': user_id, 'is_active': True, **{field: claims[field] for field in CLAIM_FIELDS}}
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that takes the user from the token's claims instead of the database."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        cached = cache.get(_claims_key(user_id))
+        if cached is not None and not cached['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if not all(field in validated_token for field in CLAIM_FIELDS) or not token_claims_are_fresh(validated_token):
+            # Issued before the user claims were added, or too long ago to trust them
+            return super().get_user(validated_token)
+        claims = cached or validated_token
+        if any(claims[field] for field in PRIVILEGE_CLAIMS):
+            return super().get_user(validated_token)
+        return claims_user(user_id, claims)
+
+
+def get_cached_user(user_id):
+    """The full User, with its profile, from the shared cache or the database."""
+    user = cache.get(_user_key(user_id))
+    if user is None:
+        user = User.objects.select_related('profile').get(pk=user_id)
+        timeout = getattr(settings, 'USER_CACHE_TIMEOUT', DEFAULT_USER_CACHE_TIMEOUT)
+        cache.set(_user_key(user_id), user, timeout)
+    return user
+
+
+def _publish_claims(user_id, claims):
+    # Older tokens are checked against the database anyway
+    cache.set(_claims_key(user_id), claims, claims_max_age())
+
+
+@receiver(post_save, sender=User)
+def refresh_user_cache(sender, instance, **kwargs):
+    """
+    Publishes a user's current claims (e.g. after a deactivation) so they
+    outrank those of any token issued before the change.
+    """
+    claims = {field: getattr(instance, field) for field in CLAIM_FIELDS}
+    _publish_claims(instance.pk, dict(claims, is_active=instance.is_active))
+    cache.delete(_user_key(instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def clear_user_cache(sender, instance, **kwargs):
+    claims = {field: getattr(instance, field) for field in CLAIM_FIELDS}
+    _publish_claims(instance.pk, dict(claims, is_active=False))
+    cache.delete(_user_key(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def clear_cached_profile(sender, instance, **kwargs):
+    cache.delete(_user_key(instance.user_id))
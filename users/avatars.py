@@ -0,0 +1,212 @@
+# In users/avatars.py
+"""
+The avatar upload pipeline.
+
+1. `AvatarUploadHandler` streams the upload to a temporary file on disk,
+   whatever its size, hashing it (SHA-256) as the chunks arrive.
+2. `queue_avatar()` records the hash on the profile. An image that has been
+   processed before (for any user) is linked straight away; otherwise the
+   upload is staged under `avatars/incoming/` and a `users.process_avatar`
+   job is queued.
+3. The job (`render_avatar()`) writes, from the staged upload:
+   - a square thumbnail per AVATAR_THUMBNAIL_SIZES, in WebP and JPEG;
+   - `full.jpg`, the image scaled down to fit AVATAR_MAX_DIMENSION.
+   Pixels only: EXIF (including GPS), XMP and ICC data aren't copied over.
+   The profile's `avatar` then points at `full.jpg`; until that happens it
+   keeps its previous avatar.
+
+Every file lives under `avatars/<first two hex digits>/<hash>/`, so the same
+image is stored once and a URL never changes content. That is what lets
+`serve_avatar` (users/views.py) send them with a one-year, immutable
+Cache-Control header.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from jobs.services import enqueue
+from PIL import Image, ImageOps
+
+DEFAULT_THUMBNAIL_SIZES = (64, 128, 256)
+DEFAULT_MAX_DIMENSION = 1024
+DEFAULT_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+# Images larger than this are rejected before they are decoded
+MAX_PIXELS = 40_000_000
+ACCEPTED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# Every thumbnail is written in each of these: {extension: (Pillow format, save options)}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+# Transparent pixels are flattened onto white for JPEG
+BACKGROUND = (255, 255, 255)
+
+
+def thumbnail_sizes():
+    return tuple(getattr(settings, 'AVATAR_THUMBNAIL_SIZES', DEFAULT_THUMBNAIL_SIZES))
+
+
+def max_upload_size():
+    return getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+
+def avatar_directory(sha256):
+    return f'avatars/{sha256[:2]}/{sha256}'
+
+
+def full_path(sha256):
+    """The storage name of the processed, full-size avatar."""
+    return f'{avatar_directory(sha256)}/full.jpg'
+
+
+def thumbnail_path(sha256, size, extension):
+    return f'{avatar_directory(sha256)}/{size}.{extension}'
+
+
+def staging_path(sha256):
+    return f'avatars/incoming/{sha256}'
+
+
+class AvatarUploadHandler(TemporaryFileUploadHandler):
+    """
+    Writes every uploaded file to disk (never to memory) and sets its
+    `sha256` attribute, so it is read only once.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self._hash.hexdigest()
+        return file
+
+
+def file_sha256(upload):
+    """The upload's SHA-256, from AvatarUploadHandler if it went through it."""
+    if getattr(upload, 'sha256', None):
+        return upload.sha256
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def check_avatar_upload(upload):
+    """
+    Returns a reason to reject `upload`, or None. Only the image header is
+    read: the pixels are decoded by the job.
+    """
+    if upload.size > max_upload_size():
+        return f"Avatars can be at most {max_upload_size() // (1024 * 1024)} MB."
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        return "Upload a valid image."
+    finally:
+        upload.seek(0)
+    if image_format not in ACCEPTED_FORMATS:
+        return f"Avatars must be one of {', '.join(ACCEPTED_FORMATS)}."
+    if width * height > MAX_PIXELS:
+        return "This image is too large."
+    return None
+
+
+def link_avatar(profile, sha256):
+    """Points `profile` at the processed avatar `sha256`, unless it has been replaced since."""
+    if profile.avatar_sha256 != sha256:
+        return False
+    profile.avatar = full_path(sha256)
+    profile.save()
+    return True
+
+
+def queue_avatar(profile, upload):
+    """
+    Makes `upload` the profile's avatar, and saves the profile: right away if
+    the same image has been processed before, otherwise once the returned job
+    has run. Returns the job, or None.
+    """
+    sha256 = file_sha256(upload)
+    profile.avatar_sha256 = sha256
+    if default_storage.exists(full_path(sha256)):
+        link_avatar(profile, sha256)
+        return None
+
+    if not default_storage.exists(staging_path(sha256)):
+        default_storage.save(staging_path(sha256), upload)
+    profile.save()
+    job, _ = enqueue(
+        'users.process_avatar', {'profile': profile.pk, 'sha256': sha256},
+        key=f'{profile.pk}:{sha256}', user=profile.user,
+    )
+    return job
+
+
+def _encode(image, extension):
+    image_format, options = FORMATS[extension]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        flattened = Image.new('RGB', image.size, BACKGROUND)
+        flattened.paste(image, mask=image.getchannel('A') if image.mode == 'RGBA' else None)
+        image = flattened
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _save(name, data):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+
+
+def render_avatar(sha256):
+    """
+    Writes the thumbnails and full-size image for the staged upload `sha256`,
+    then removes the upload. `full.jpg` is written last, so once it exists
+    every other file does too.
+    """
+    staged = staging_path(sha256)
+    max_dimension = getattr(settings, 'AVATAR_MAX_DIMENSION', DEFAULT_MAX_DIMENSION)
+    with default_storage.open(staged, 'rb') as upload, Image.open(upload) as original:
+        # JPEGs are decoded at the smallest scale still covering every output
+        original.draft('RGB', (max(max_dimension, *thumbnail_sizes()),) * 2)
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    for size in thumbnail_sizes():
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension in FORMATS:
+            _save(thumbnail_path(sha256, size, extension), _encode(thumbnail, extension))
+
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    _save(full_path(sha256), _encode(image, 'jpg'))
+    default_storage.delete(staged)
+
+
+def thumbnail_urls(profile, build_url=None):
+    """
+    {size: {'webp': url, 'jpeg': url}} for the profile's processed avatar,
+    or None while there is none.
+    """
+    sha256 = profile.avatar_sha256
+    if not sha256 or profile.avatar.name != full_path(sha256):
+        return None
+    build_url = build_url or (lambda url: url)
+    return {
+        str(size): {
+            'webp': build_url(default_storage.url(thumbnail_path(sha256, size, 'webp'))),
+            'jpeg': build_url(default_storage.url(thumbnail_path(sha256, size, 'jpg'))),
+        }
+        for size in thumbnail_sizes()
+    }
@@ -0,0 +1,66 @@
+# In users/jobs.py
+"""
+Avatar processing, off the request path (see users/avatars.py), and the
+periodic pruning of expired refresh tokens (see users/tokens.py).
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from jobs.models import Job
+from jobs.registry import register
+from jobs.services import enqueue
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from .avatars import full_path, link_avatar, render_avatar
+from .models import UserProfile
+
+FLUSH_EXPIRED_TOKENS = 'users.flush_expired_tokens'
+DEFAULT_FLUSH_INTERVAL = 24 * 60 * 60
+
+
+@register('users.process_avatar', concurrency=2)
+def process_avatar(job):
+    sha256 = job.payload['sha256']
+    if not default_storage.exists(full_path(sha256)):
+        render_avatar(sha256)
+    profile = UserProfile.objects.get(pk=job.payload['profile'])
+    return {'linked': link_avatar(profile, sha256)}
+
+
+def schedule_token_flush(key, delay=0):
+    """
+    Queues a `users.flush_expired_tokens` job to run in `delay` seconds,
+    unless a job with the same `key` is already queued or running.
+    """
+    job, _ = enqueue(FLUSH_EXPIRED_TOKENS, key=key, delay=delay)
+    return job
+
+
+@register(FLUSH_EXPIRED_TOKENS, concurrency=1)
+def flush_expired_tokens(job):
+    """
+    What SimpleJWT's `flushexpiredtokens` command does (their blacklist rows
+    go with them), then queues the next run.
+
+    The next run is keyed on this job, so a retry, or a rerun after the job
+    was requeued as lost, can't start a second schedule. It is only queued
+    once the delete has succeeded: a job that fails for good ends the
+    schedule, and the next `migrate` starts it again.
+    """
+    deleted, _ = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    schedule_token_flush(f'after:{job.pk}', getattr(settings, 'TOKEN_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+    return {'deleted': deleted}
+
+
+def start_token_flushes(using='default', **kwargs):
+    """
+    post_migrate receiver: queues a flush unless one is queued or running,
+    so every deployment (which runs `migrate`) has the schedule going.
+    """
+    if Job._meta.db_table not in connections[using].introspection.table_names():
+        return
+    active = Job.objects.using(using).filter(
+        kind=FLUSH_EXPIRED_TOKENS, status__in=[Job.Status.QUEUED, Job.Status.RUNNING]
+    )
+    if not active.exists():
+        schedule_token_flush('start')
@@ -4,8 +4,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from utils.models import DirtyFieldsMixin
 
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     """
     Extends the default User model to store travel-specific preferences.
     """
@@ -45,18 +46,18 @@ class UserProfile(models.Model):
         blank=True,
         help_text="User's profile picture."
     )
+    # The latest uploaded avatar's content hash; `avatar` points at its
+    # processed copy once the thumbnails are ready (see users/avatars.py)
+    avatar_sha256 = models.CharField(max_length=64, blank=True, editable=False)
 
     # This is a "magic method" to make the object readable in the admin panel.
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
-# These two functions ensure that a UserProfile is automatically created
+# This function ensures that a UserProfile is automatically created
 # whenever a new Django User is created. This is a common pattern.
+# (Saving the User doesn't touch the profile; UserSerializer.update saves both.)
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
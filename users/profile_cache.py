@@ -0,0 +1,140 @@
+# In users/profile_cache.py
+"""
+Pre-rendered responses for GET /api/auth/profile/.
+
+The profile is fetched on every app launch and screen transition but
+rarely changes, so the rendered JSON is kept in the shared cache, per user,
+with an ETag (a hash of the bytes):
+
+- a hit returns the cached bytes as they are: no query, no serializer, no renderer;
+- a request whose If-None-Match has the current ETag gets a 304 without a body;
+- a miss renders the profile as usual and stores the result.
+
+Only the plain request is cached: `?fields=` / `?expand=` and the browsable
+API go through the view as before.
+
+Saving a User or UserProfile clears the entry, but only when the save can
+have changed a serialized field, so e.g. `update_last_login`
+(`save(update_fields=['last_login'])`) leaves it alone. Each clear also bumps
+a per-user version stored next to the entry, so a response rendered from the
+old rows while the save happened is never served. Rows changed with
+QuerySet.update() aren't seen until PROFILE_CACHE_TIMEOUT expires.
+
+Hits, misses, 304s and invalidations are counted under 'profile_cache.'
+in utils.metrics.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from utils.metrics import metrics
+
+from .models import UserProfile
+from .serializers import UserProfileSerializer, UserSerializer
+
+DEFAULT_PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# The model fields the cached representation is made of
+USER_FIELDS = set(UserSerializer.Meta.fields) - {'profile'}
+PROFILE_FIELDS = set(UserProfileSerializer.Meta.fields).union(
+    *UserProfileSerializer.Meta.sparse_field_sources.values()
+)
+
+
+def _profile_key(user_id):
+    return f'users:profile:{user_id}'
+
+
+def _version_key(user_id):
+    return f'users:profile-version:{user_id}'
+
+
+def _etag(body):
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _response(etag, body):
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Per user, and revalidated on every use
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_profile_response(request, render):
+    """
+    The profile response for `request.user`, from the cache or from
+    `render()`, which returns the JSON body as bytes.
+    """
+    # Absolute URLs (e.g. the avatar's) depend on the host the request came in on
+    origin = request.build_absolute_uri('/')
+    key, version_key = _profile_key(request.user.pk), _version_key(request.user.pk)
+    found = cache.get_many([key, version_key])
+    entry, version = found.get(key), found.get(version_key, 0)
+    if entry is not None and entry['origin'] == origin and entry['version'] == version:
+        metrics.increment('profile_cache.hit')
+    else:
+        metrics.increment('profile_cache.miss')
+        body = render()
+        entry = {'origin': origin, 'version': version, 'etag': _etag(body), 'body': body}
+        timeout = getattr(settings, 'PROFILE_CACHE_TIMEOUT', DEFAULT_PROFILE_CACHE_TIMEOUT)
+        cache.set(key, entry, timeout)
+
+    if entry['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        metrics.increment('profile_cache.not_modified')
+        response = HttpResponseNotModified()
+        response['ETag'] = entry['etag']
+        return response
+    return _response(entry['etag'], entry['body'])
+
+
+def invalidate_profile(user_id):
+    metrics.increment('profile_cache.invalidated')
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), 1, None)
+    cache.delete(_profile_key(user_id))
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_save(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, USER_FIELDS):
+        invalidate_profile(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_on_profile_save(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, PROFILE_FIELDS):
+        invalidate_profile(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_on_delete(sender, instance, **kwargs):
+    invalidate_profile(instance.pk if sender is User else instance.user_id)
+
+
+def get_profile_cache_stats():
+    """Hit rates for the admin stats endpoint."""
+    counters = metrics.snapshot('profile_cache.')
+    hits = counters.get('profile_cache.hit', 0)
+    misses = counters.get('profile_cache.miss', 0)
+    lookups = hits + misses
+    return {
+        'lookups': lookups,
+        'hits': hits,
+        'misses': misses,
+        'not_modified': counters.get('profile_cache.not_modified', 0),
+        'invalidated': counters.get('profile_cache.invalidated', 0),
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+    }
@@ -3,7 +3,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from utils.models import changed_fields
+from utils.serializers import SparseFieldsetMixin
+from .avatars import check_avatar_upload, queue_avatar, thumbnail_urls
 from .models import UserProfile
+from .tokens import TouristaRefreshToken
 
 class RegisterSerializer(serializers.ModelSerializer):
     # We add a password2 field to confirm the password
@@ -44,13 +49,27 @@ class RegisterSerializer(serializers.ModelSerializer):
 
         return user
     
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Square WebP/JPEG versions of the avatar by size, once the upload has been processed
+    avatar_thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = UserProfile
         # List all the fields from your UserProfile model that you want to be viewable/editable
-        fields = ['travel_style', 'budget', 'preferred_languages', 'avatar']
+        fields = ['travel_style', 'budget', 'preferred_languages', 'avatar', 'avatar_thumbnails']
+        sparse_field_sources = {'avatar_thumbnails': ['avatar', 'avatar_sha256']}
+
+    def get_avatar_thumbnails(self, profile):
+        request = self.context.get('request')
+        return thumbnail_urls(profile, request.build_absolute_uri if request else None)
+
+    def validate_avatar(self, upload):
+        error = check_avatar_upload(upload) if upload else None
+        if error:
+            raise serializers.ValidationError(error)
+        return upload
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Nest the profile serializer
     profile = UserProfileSerializer()
 
@@ -64,16 +83,38 @@ class UserSerializer(serializers.ModelSerializer):
         profile_data = validated_data.pop('profile', {})
         profile = instance.profile
 
-        # Update the User instance
-        instance.username = validated_data.get('username', instance.username)
-        instance.email = validated_data.get('email', instance.email)
-        instance.save()
+        # Update the User instance, writing only the columns that changed
+        changed = changed_fields(instance, {
+            field: validated_data[field] for field in ('username', 'email') if field in validated_data
+        })
+        if changed:
+            instance.save(update_fields=changed)
+
+        # Update the UserProfile instance (a DirtyFieldsMixin model: only changed columns are written)
+        for field in ('travel_style', 'budget', 'preferred_languages'):
+            if field in profile_data:
+                setattr(profile, field, profile_data[field])
+        if profile_data.get('avatar'):
+            # Stored and resized in the background (see users/avatars.py)
+            queue_avatar(profile, profile_data['avatar'])
+        else:
+            if 'avatar' in profile_data:
+                profile.avatar, profile.avatar_sha256 = None, ''
+            profile.save()
+
+        return instance
+
+class TouristaTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer that also puts the user's vendor identity and verification
+    status into the access token, so vendor endpoints don't need to look them up.
+    """
+    token_class = TouristaRefreshToken
 
-        # Update the UserProfile instance
-        profile.travel_style = profile_data.get('travel_style', profile.travel_style)
-        profile.budget = profile_data.get('budget', profile.budget)
-        profile.preferred_languages = profile_data.get('preferred_languages', profile.preferred_languages)
-        profile.avatar = profile_data.get('avatar', profile.avatar)
-        profile.save()
 
-        return instance
\ No newline at end of file
+class TouristaTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that re-issues the vendor claims, so an access token
+    obtained after an admin approval carries the new status.
+    """
+    token_class = TouristaRefreshToken
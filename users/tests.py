@@ -1,9 +1,33 @@
 # In users/tests.py
 
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from jobs.models import Job
+from jobs.services import work_off
+from utils.metrics import metrics
+from .avatars import full_path, thumbnail_path
+from .jobs import FLUSH_EXPIRED_TOKENS, flush_expired_tokens, start_token_flushes
+from .models import UserProfile
+from .profile_cache import cached_profile_response
+from .tokens import BloomFilter, RevokedTokenFilter
 
 class UserRegistrationTest(APITestCase):
     """
@@ -58,4 +82,392 @@ class UserRegistrationTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         
         # 2. Check that NO user was created in the database
-        self.assertEqual(User.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(User.objects.count(), 0)
+
+class ClaimsAuthenticationTest(APITestCase):
+    """
+    Test suite for ClaimsJWTAuthentication and the shared user cache
+    (users/authentication.py).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='tourist', email='tourist@example.com', password='StrongPassword123')
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'tourist', 'password': 'StrongPassword123'}, format='json'
+        )
+        self.access = response.data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        cache.clear()
+
+    def test_requests_are_authenticated_without_a_user_query(self):
+        with self.assertNumQueries(1):  # the itineraries
+            response = self.client.get(reverse('itinerary-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tokens_without_user_claims_fall_back_to_the_database(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        with self.assertNumQueries(2):  # the user, the itineraries
+            response = self.client.get(reverse('itinerary-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_rejects_existing_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('itinerary-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_changes_outrank_the_token_claims(self):
+        url = reverse('integration-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_old_tokens_are_checked_against_the_database(self):
+        # As if deactivated by another worker: this one's cache never hears of it
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('itinerary-list')).status_code, status.HTTP_200_OK)
+
+        with override_settings(TOKEN_CLAIMS_MAX_AGE=0):
+            response = self.client.get(reverse('itinerary-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_claims_are_checked_against_the_database(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'tourist', 'password': 'StrongPassword123'}, format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        # Demoted by another worker: the token and this worker's cache still say staff
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        self.assertEqual(self.client.get(reverse('integration-stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_profile_is_read_from_the_cache_until_updated(self):
+        url = reverse('user_profile')
+        with self.assertNumQueries(1):  # the user joined with the profile
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['email'], 'tourist@example.com')
+
+        response = self.client.patch(url, {'email': 'new@example.com', 'profile': {'travel_style': 'CULTURAL'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['email'], 'new@example.com')
+        self.assertEqual(response.json()['profile']['travel_style'], 'CULTURAL')
+
+
+class ProfileUpdateTest(APITestCase):
+    """
+    Profile updates write only the columns that changed (see DirtyFieldsMixin in utils/models.py).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tourist', email='tourist@example.com', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+
+    def updates(self, queries):
+        return [query['sql'].split(' WHERE ')[0] for query in queries if query['sql'].startswith('UPDATE')]
+
+    def test_profile_patch_updates_only_the_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                reverse('user_profile'), {'email': 'tourist@example.com', 'profile': {'travel_style': 'CULTURAL'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.updates(queries), ['UPDATE "users_userprofile" SET "travel_style" = \'CULTURAL\''])
+
+    def test_unchanged_patch_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                reverse('user_profile'),
+                {'username': 'tourist', 'email': 'tourist@example.com', 'profile': {'preferred_languages': 'English'}},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.updates(queries), [])
+
+    def test_files_changed_in_place_are_saved(self):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.avatar.name = 'avatars/ab/abc/full.jpg'
+        self.assertEqual(profile.get_dirty_fields(), ['avatar'])
+        profile.save()
+        self.assertEqual(profile.get_dirty_fields(), [])
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).avatar.name, 'avatars/ab/abc/full.jpg')
+
+        # Assigning the same stored name again is no change
+        profile.avatar = 'avatars/ab/abc/full.jpg'
+        self.assertEqual(profile.get_dirty_fields(), [])
+
+    def test_saving_the_user_leaves_the_profile_alone(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Ayesha'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertFalse(any('users_userprofile' in query['sql'] for query in queries))
+
+
+class ProfileCacheTest(APITestCase):
+    """
+    Test suite for the pre-rendered profile responses (users/profile_cache.py).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='tourist', email='tourist@example.com', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('user_profile')
+        metrics.reset('profile_cache.')
+
+    def test_repeat_reads_are_served_from_the_cache_with_an_etag(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['profile']['travel_style'], 'RELAXATION')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            (metrics.get('profile_cache.hit'), metrics.get('profile_cache.miss'), metrics.get('profile_cache.not_modified')),
+            (2, 1, 1),
+        )
+
+    def test_saves_of_serialized_fields_invalidate_the_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'profile': {'travel_style': 'CULTURAL'}}, format='json')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['profile']['travel_style'], 'CULTURAL')
+
+    def test_other_saves_leave_the_cache_alone(self):
+        self.client.get(self.url)
+        self.user.last_login = self.user.date_joined
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        self.assertEqual(metrics.get('profile_cache.invalidated'), 0)
+
+    def test_a_save_during_rendering_is_not_hidden(self):
+        request = RequestFactory().get(self.url)
+        request.user = self.user
+
+        def render():
+            body = b'{"stale": true}'
+            UserProfile.objects.get(user=self.user).save(update_fields=['travel_style'])
+            return body
+
+        cached_profile_response(request, render)
+        self.assertNotIn(b'stale', self.client.get(self.url).content)
+
+    def test_sparse_fieldsets_bypass_the_cache(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, {'fields': 'username'})
+        self.assertEqual(response.data, {'username': 'tourist'})
+
+    def test_stats_are_admin_only(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(reverse('profile-cache-stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='StrongPassword123'))
+        response = self.client.get(reverse('profile-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['lookups'], response.data['misses']), (1, 1))
+
+
+class RevokedTokenFilterTest(APITestCase):
+    """
+    Test suite for the Bloom filter that keeps refreshes off the token
+    blacklist tables (users/tokens.py).
+    """
+
+    def setUp(self):
+        overrides = override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.tokens = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'tourist', 'password': 'StrongPassword123'}, format='json'
+        ).data
+
+    def refresh(self):
+        return self.client.post(reverse('token_refresh'), {'refresh': self.tokens['refresh']}, format='json')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        for n in range(1000):
+            bloom.add(f'jti-{n}')
+        self.assertTrue(all(f'jti-{n}' in bloom for n in range(1000)))
+        false_positives = sum(f'other-{n}' in bloom for n in range(10_000))
+        self.assertLess(false_positives, 50)
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=60)
+    def test_refresh_skips_the_blacklist_query(self):
+        self.assertEqual(self.refresh().status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh().status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'blacklistedtoken' in query['sql']])
+
+    def test_logged_out_tokens_cannot_be_refreshed(self):
+        self.refresh()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.post(reverse('auth_logout'), {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(self.refresh().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_blacklisted_elsewhere_are_picked_up(self):
+        self.refresh()
+        # As if another process had blacklisted it: no signal reaches this one
+        token = OutstandingToken.objects.get(jti=RefreshToken(self.tokens['refresh'])['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token)])
+
+        self.assertEqual(self.refresh().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rows_committed_out_of_order_are_picked_up(self):
+        revoked = RevokedTokenFilter(sync_interval=0)
+        first, late = [OutstandingToken.objects.get(jti=RefreshToken(self.tokens['refresh'])['jti'])] + [
+            OutstandingToken.objects.get(jti=RefreshToken(self.client.post(
+                reverse('token_obtain_pair'), {'username': 'tourist', 'password': 'StrongPassword123'}, format='json'
+            ).data['refresh'])['jti'])
+        ]
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(pk=10, token=first)])
+        self.assertTrue(revoked.might_contain(first.jti))
+
+        # Key 9 was taken before key 10 but committed after it had been read
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(pk=9, token=late)])
+        self.assertTrue(revoked.might_contain(late.jti))
+
+    def test_expired_tokens_are_flushed_on_a_schedule(self):
+        expired = OutstandingToken.objects.get(jti=RefreshToken(self.tokens['refresh'])['jti'])
+        OutstandingToken.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(days=1))
+        BlacklistedToken.objects.create(token=expired)
+        Job.objects.filter(kind=FLUSH_EXPIRED_TOKENS).delete()
+        start_token_flushes()
+
+        work_off(kinds=[FLUSH_EXPIRED_TOKENS])
+        self.assertFalse(OutstandingToken.objects.filter(pk=expired.pk).exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        # The next run is queued, and starting the schedule again doesn't add another
+        start_token_flushes()
+        queued = Job.objects.get(kind=FLUSH_EXPIRED_TOKENS, status=Job.Status.QUEUED)
+        self.assertGreater(queued.run_after, timezone.now() + timedelta(hours=23))
+
+    def test_retried_flushes_keep_a_single_schedule(self):
+        Job.objects.filter(kind=FLUSH_EXPIRED_TOKENS).delete()
+        start_token_flushes()
+        flush = Job.objects.get(kind=FLUSH_EXPIRED_TOKENS)
+
+        with mock.patch.object(OutstandingToken.objects, 'filter', side_effect=DatabaseError('connection lost')):
+            with self.assertLogs('jobs.services', 'ERROR'):
+                work_off(kinds=[FLUSH_EXPIRED_TOKENS])
+        # The failed flush is waiting for its retry, and nothing else was queued
+        self.assertEqual(list(Job.objects.filter(kind=FLUSH_EXPIRED_TOKENS, status=Job.Status.QUEUED)), [flush])
+        # Migrating meanwhile doesn't start another schedule
+        start_token_flushes()
+
+        Job.objects.filter(pk=flush.pk).update(run_after=timezone.now())
+        work_off(kinds=[FLUSH_EXPIRED_TOKENS])
+        # Running the same job again (as after its worker was presumed lost) queues nothing new
+        flush.refresh_from_db()
+        flush_expired_tokens(flush)
+        self.assertEqual(Job.objects.filter(kind=FLUSH_EXPIRED_TOKENS, status=Job.Status.QUEUED).count(), 1)
+
+
+def make_photo(size=(800, 600), color='teal', name='photo.jpg'):
+    """A JPEG upload carrying camera EXIF: a maker tag and a 90° orientation."""
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90° clockwise to display
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class AvatarPipelineTest(APITestCase):
+    """
+    Test suite for the avatar upload pipeline (users/avatars.py).
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, photo, user=None):
+        if user:
+            self.client.force_authenticate(user)
+        return self.client.patch(reverse('user_profile'), {'profile.avatar': photo}, format='multipart')
+
+    def test_thumbnails_are_generated_in_the_background(self):
+        response = self.upload(make_photo())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['profile']['avatar_thumbnails'])
+        self.assertEqual(Job.objects.filter(kind='users.process_avatar').count(), 1)
+
+        work_off()
+        profile = self.user.profile
+        profile.refresh_from_db()
+        sha256 = profile.avatar_sha256
+        self.assertEqual(profile.avatar.name, full_path(sha256))
+
+        thumbnails = self.client.get(reverse('user_profile')).json()['profile']['avatar_thumbnails']
+        self.assertEqual(sorted(thumbnails, key=int), ['64', '128', '256'])
+        self.assertTrue(thumbnails['64']['webp'].endswith(thumbnail_path(sha256, 64, 'webp')))
+        for size in (64, 128, 256):
+            for extension, image_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(thumbnail_path(sha256, size, extension)) as file, Image.open(file) as image:
+                    self.assertEqual((image.format, image.size), (image_format, (size, size)))
+                    self.assertNotIn('exif', image.info)
+        # Rotated upright, then stripped of its metadata
+        with default_storage.open(full_path(sha256)) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (600, 800))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertFalse(default_storage.exists(f'avatars/incoming/{sha256}'))
+
+    def test_the_same_image_is_stored_once(self):
+        self.upload(make_photo())
+        work_off()
+        other = User.objects.create_user(username='other', password='StrongPassword123')
+
+        response = self.upload(make_photo(), user=other)
+        self.assertIsNotNone(response.data['profile']['avatar_thumbnails'])
+        self.assertEqual(Job.objects.filter(kind='users.process_avatar').count(), 1)
+        self.assertEqual(
+            User.objects.get(pk=other.pk).profile.avatar.name, User.objects.get(pk=self.user.pk).profile.avatar.name
+        )
+
+    def test_a_newer_upload_wins(self):
+        self.upload(make_photo(color='teal'))
+        self.upload(make_photo(color='orange'))
+        work_off()
+        profile = User.objects.get(pk=self.user.pk).profile
+        self.assertEqual(profile.avatar.name, full_path(profile.avatar_sha256))
+        with default_storage.open(profile.avatar.name) as file, Image.open(file) as image:
+            self.assertGreater(image.getpixel((10, 10))[0], 200)
+
+    def test_non_images_are_rejected(self):
+        response = self.upload(SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.filter(kind='users.process_avatar').exists())
+
+    def test_avatars_are_served_with_long_lived_cache_headers(self):
+        self.upload(make_photo())
+        work_off()
+        url = self.client.get(reverse('user_profile')).json()['profile']['avatar_thumbnails']['128']['webp']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+
@@ -0,0 +1,188 @@
+# In users/tokens.py
+"""
+Refresh tokens, and the per-process filter that keeps most refreshes off
+the token blacklist tables.
+
+SimpleJWT checks every refresh token against BlacklistedToken, a join on
+the database. Revoked tokens are a tiny fraction of those presented, so
+each process keeps a Bloom filter of the blacklisted JTIs:
+
+- a JTI the filter doesn't contain was never blacklisted, and no query is made;
+- a JTI it does contain (a revoked token, or roughly one in a thousand false
+  positives) goes through SimpleJWT's database check as before.
+
+The filter pulls new blacklist rows (by primary key, so the query is cheap)
+at most every TOKEN_BLACKLIST_SYNC_INTERVAL seconds. Primary keys are taken
+when a row is inserted but only become visible when it is committed, so each
+pull also re-reads the last TOKEN_BLACKLIST_SYNC_OVERLAP keys it has seen: a
+row committed after some later ones is still picked up. Tokens blacklisted by
+the same process are added straight away. A Bloom filter can't forget, so it
+is rebuilt from the unexpired rows every TOKEN_BLACKLIST_FILTER_REBUILD
+seconds. The tables themselves are pruned by the `users.flush_expired_tokens`
+job (users/jobs.py), which reschedules itself every TOKEN_FLUSH_INTERVAL
+seconds.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from vendors.context import load_vendor_context
+from .authentication import load_user_claims
+
+DEFAULT_SYNC_INTERVAL = 1
+DEFAULT_SYNC_OVERLAP = 200
+DEFAULT_REBUILD_INTERVAL = 600
+# Room for this many JTIs before the filter is rebuilt bigger
+MIN_CAPACITY = 10_000
+FALSE_POSITIVE_RATE = 0.001
+
+
+class BloomFilter:
+    """A fixed-size set of strings that can answer "maybe" but never a false "no"."""
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        if all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions):
+            # Already in (e.g. re-read by an overlapping pull): don't use up capacity
+            return
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedTokenFilter:
+    """The process's Bloom filter of blacklisted JTIs, kept in sync with BlacklistedToken."""
+
+    def __init__(self, sync_interval=DEFAULT_SYNC_INTERVAL, rebuild_interval=DEFAULT_REBUILD_INTERVAL,
+                 sync_overlap=DEFAULT_SYNC_OVERLAP, clock=time.monotonic):
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.rebuild_interval = rebuild_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_pk = 0
+        self._synced_at = self._built_at = None
+
+    def might_contain(self, jti):
+        """False if the token is certainly not blacklisted."""
+        self._sync()
+        return jti in self._bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def _sync(self):
+        now = self._clock()
+        if self._bloom is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._bloom is None or now - self._built_at >= self.rebuild_interval:
+                self._rebuild(now)
+            elif now - self._synced_at >= self.sync_interval:
+                self._pull(now)
+                if self._bloom.count > self._bloom.capacity:
+                    self._rebuild(now)
+
+    def _rebuild(self, now):
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list('pk', 'token__jti')
+        )
+        bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(rows)))
+        for pk, jti in rows:
+            bloom.add(jti)
+            self._last_pk = max(self._last_pk, pk)
+        self._bloom = bloom
+        self._built_at = self._synced_at = now
+
+    def _pull(self, now):
+        since = self._last_pk - self.sync_overlap
+        for pk, jti in BlacklistedToken.objects.filter(pk__gt=since).values_list('pk', 'token__jti'):
+            self._bloom.add(jti)
+            self._last_pk = max(self._last_pk, pk)
+        self._synced_at = now
+
+
+_revoked_tokens = None
+_revoked_tokens_lock = threading.Lock()
+
+
+def get_revoked_token_filter():
+    """Returns the process-wide RevokedTokenFilter."""
+    global _revoked_tokens
+    if _revoked_tokens is None:
+        with _revoked_tokens_lock:
+            if _revoked_tokens is None:
+                _revoked_tokens = RevokedTokenFilter(
+                    sync_interval=getattr(settings, 'TOKEN_BLACKLIST_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL),
+                    rebuild_interval=getattr(settings, 'TOKEN_BLACKLIST_FILTER_REBUILD', DEFAULT_REBUILD_INTERVAL),
+                    sync_overlap=getattr(settings, 'TOKEN_BLACKLIST_SYNC_OVERLAP', DEFAULT_SYNC_OVERLAP),
+                )
+    return _revoked_tokens
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_revoked_token(sender, instance, **kwargs):
+    get_revoked_token_filter().add(instance.token.jti)
+
+
+@receiver(setting_changed)
+def reset_revoked_token_filter(setting, **kwargs):
+    """Starts a new filter when its settings are overridden (e.g. in tests)."""
+    global _revoked_tokens
+    if setting in ('TOKEN_BLACKLIST_SYNC_INTERVAL', 'TOKEN_BLACKLIST_FILTER_REBUILD', 'TOKEN_BLACKLIST_SYNC_OVERLAP'):
+        _revoked_tokens = None
+
+
+class TouristaRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry the user's username and staff flags
+    (see users/authentication.py) and vendor identity and verification status
+    (see vendors/context.py).
+
+    The claims are looked up every time an access token is minted, i.e. at login
+    and on every refresh, so a vendor approved by an admin gets the new status
+    on their next refresh.
+
+    The blacklist is only queried for the tokens the revoked-token filter can't rule out.
+    """
+
+    def check_blacklist(self):
+        if get_revoked_token_filter().might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            access.payload.update(load_user_claims(user_id))
+            access.payload.update(load_vendor_context(user_id).as_claims())
+        return access
@@ -6,7 +6,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import RegisterView, UserProfileView, LogoutView
+from .views import RegisterView, UserProfileView, ProfileCacheStatsView, LogoutView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='auth_register'),
@@ -15,5 +15,6 @@ urlpatterns = [
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', UserProfileView.as_view(), name='user_profile'),
+    path('profile/stats/', ProfileCacheStatsView.as_view(), name='profile-cache-stats'),
     path('logout/', LogoutView.as_view(), name='auth_logout'),
 ]
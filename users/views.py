@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.views.static import serve
 from rest_framework import generics, permissions
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from .serializers import RegisterSerializer
 from django.contrib.auth.models import User
 from .serializers import UserSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
+from utils.mixins import SparseFieldsetViewMixin
+from .authentication import get_cached_user
+from .avatars import AvatarUploadHandler
+from .profile_cache import cached_profile_response, get_profile_cache_stats
+from .tokens import TouristaRefreshToken
 
 class RegisterView(generics.CreateAPIView):
     """
@@ -16,7 +24,7 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(SparseFieldsetViewMixin, generics.RetrieveUpdateAPIView):
     """
     API endpoint for viewing and updating the authenticated user's profile.
     Handles GET (retrieve) and PUT/PATCH (update) requests.
@@ -26,12 +34,47 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     # This is the key part: only authenticated users can access this view
     permission_classes = [permissions.IsAuthenticated]
 
+    def initial(self, request, *args, **kwargs):
+        # Avatar uploads are streamed to disk and hashed on the way (see users/avatars.py)
+        if request.method in ('PUT', 'PATCH'):
+            request._request.upload_handlers = [AvatarUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Plain JSON requests are answered from the pre-rendered profile cache,
+        with an ETag (see users/profile_cache.py).
+        """
+        if request.query_params or request.accepted_media_type != JSONRenderer.media_type \
+                or not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().retrieve(request, *args, **kwargs)
+
+        def render():
+            data = self.get_serializer(self.get_object()).data
+            return request.accepted_renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+
+        return cached_profile_response(request, render)
+
     def get_object(self):
         """
         Overrides the default get_object to return the current user.
         This ensures users can only ever see or edit their own profile.
+        Reads come from the shared user cache; updates load the rows fresh.
         """
-        return self.request.user
+        if self.request.method == 'GET':
+            return get_cached_user(self.request.user.pk)
+        return User.objects.select_related('profile').get(pk=self.request.user.pk)
+
+class ProfileCacheStatsView(APIView):
+    """
+    API endpoint for ADMINS to check how well the profile cache is working in
+    this worker process: hits, misses, 304 responses and invalidations.
+    Accessible at: GET /api/auth/profile/stats/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_profile_cache_stats(), status=status.HTTP_200_OK)
 
 class LogoutView(generics.GenericAPIView):
     """
@@ -43,10 +86,20 @@ class LogoutView(generics.GenericAPIView):
         try:
             # The user must send their refresh token to be blacklisted
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = TouristaRefreshToken(refresh_token)
             token.blacklist()
 
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response({"error": "An error occurred during logout."}, status=status.HTTP_400_BAD_REQUEST)
 
+
+def serve_avatar(request, path):
+    """
+    Serves processed avatars. Their names contain the hash of their content,
+    so a URL always serves the same bytes and clients may keep them for a year.
+    Deployments serving MEDIA_ROOT from the web server should send the same header.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,48 @@
+# In utils/async_views.py
+"""
+Async DRF views, for endpoints that spend their time waiting on third-party
+services.
+
+DRF's APIView only runs sync handlers. `AsyncAPIView` keeps DRF's request
+handling (parsers, authentication, permissions, throttling, exception
+handling, renderers) and awaits `async def get/post/...` handlers. Under an
+ASGI server (core/asgi.py) the view runs on the event loop, so a request
+waiting on an upstream API holds no worker thread; under WSGI Django still
+runs it, one request per thread as before.
+
+    class WeatherAlertsView(AsyncAPIView):
+        async def get(self, request, itinerary_pk):
+            itinerary = await Itinerary.objects.aget(pk=itinerary_pk, user=request.user)
+            ...
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """An APIView whose handlers are coroutines."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication and permission checks may hit the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,408 @@
+# In utils/integrations.py
+"""
+Shared client layer for the third-party services the app calls
+(OpenWeather, OpenRouteService, the translation service).
+
+Every upstream gets, from the INTEGRATIONS setting:
+- a bulkhead: at most `max_concurrency` calls in flight per process (and
+  `async_max_concurrency` per event loop for async callers); callers wait up
+  to `queue_timeout` seconds for a slot, then fail fast, so one slow upstream
+  can't tie up every worker thread;
+- a circuit breaker: after `failure_threshold` consecutive failures calls fail
+  immediately for `reset_timeout` seconds, then a single trial call decides
+  whether to close it again;
+- retries of transient failures (connection errors, timeouts, 429/5xx) with
+  jittered exponential backoff;
+- latency, error, retry and rejection metrics under 'integration.<name>.'
+  in utils.metrics.
+
+HTTP upstreams (`HTTPIntegration`) also get keep-alive connection pools (a
+requests.Session, and an httpx.AsyncClient for async views) and (connect, read)
+timeouts on every request.
+
+An httpx.AsyncClient belongs to one event loop and is closed when that loop
+shuts down. Under an ASGI server (core/asgi.py) there is one loop per worker,
+so its connections are reused across requests. Under WSGI each async view
+runs in a loop of its own: the client, and its connections, last for that
+request only, which is why the async views should be deployed under ASGI.
+
+    from utils.integrations import get_integration
+    response = get_integration('openweather').get('/data/2.5/weather', params={...})
+    response = await get_integration('openweather').aget('/data/2.5/weather', params={...})
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+DEFAULTS = {
+    'base_url': '',
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'backoff': 0.2,
+    'backoff_max': 2.0,
+    'retry_statuses': (429, 500, 502, 503, 504),
+    'retry_methods': ('GET', 'HEAD'),
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+    'max_concurrency': 10,
+    'async_max_concurrency': 500,
+    # Idle connections kept per event loop. httpcore's pool bookkeeping grows
+    # with the square of its idle connections, so keep this well below the above
+    'async_max_keepalive': 50,
+    'queue_timeout': 1.0,
+}
+
+
+class IntegrationError(Exception):
+    """A call to a third-party service failed."""
+
+    def __init__(self, upstream, message, response=None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.response = response
+
+
+class UpstreamUnavailable(IntegrationError):
+    """The call wasn't attempted: the circuit is open or the bulkhead is full."""
+
+
+class UpstreamHTTPError(IntegrationError):
+    """The upstream answered with an error status."""
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial call."""
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Returns whether a call may go ahead. In half-open state only one trial call is let through."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Gives up a half-open trial that never reached the upstream, without judging it."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+class Upstream:
+    """Bulkhead, circuit breaker, retries and metrics around calls to one third-party service."""
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = dict(DEFAULTS, **options)
+        self.breaker = CircuitBreaker(self.options['failure_threshold'], self.options['reset_timeout'])
+        self._slots = threading.BoundedSemaphore(self.options['max_concurrency'])
+        # asyncio primitives and clients belong to one event loop
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    def _metric(self, suffix):
+        return f'integration.{self.name}.{suffix}'
+
+    def _backoff(self, attempt):
+        # "Full jitter": spreads retries from many workers over the whole window
+        cap = min(self.options['backoff_max'], self.options['backoff'] * 2 ** attempt)
+        return random.uniform(0, cap)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            metrics.increment(self._metric('circuit_open'))
+            raise UpstreamUnavailable(self.name, "circuit open")
+
+    def _reject(self):
+        metrics.increment(self._metric('rejected'))
+        self.breaker.release_trial()
+        raise UpstreamUnavailable(self.name, "too many concurrent calls")
+
+    def _should_retry(self, exc, is_failure, attempt, attempts):
+        """Records a failed attempt against the upstream and decides whether to try again."""
+        if is_failure is not None and not is_failure(exc):
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure()
+        metrics.increment(self._metric('error'))
+        if attempt + 1 >= attempts:
+            return False
+        metrics.increment(self._metric('retry'))
+        return True
+
+    def _attempt(self, fn, args, kwargs):
+        self._admit()
+        if not self._slots.acquire(timeout=self.options['queue_timeout']):
+            self._reject()
+        try:
+            with metrics.timer(self._metric('latency')):
+                return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def call(self, fn, *args, transient=(Exception,), retry=True, is_failure=None, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` through the bulkhead and circuit breaker.
+        Exceptions in `transient` count as upstream failures and are retried
+        (if `retry`); `is_failure(exc)` can refine that for a given exception.
+        Other exceptions are passed through without counting against the upstream.
+        """
+        attempts = self.options['retries'] + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                result = self._attempt(fn, args, kwargs)
+            except UpstreamUnavailable:
+                raise
+            except transient as e:
+                if not self._should_retry(e, is_failure, attempt, attempts):
+                    raise
+                time.sleep(self._backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _state_for_loop(self):
+        """Per-event-loop state: the async bulkhead, plus whatever subclasses keep there."""
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = self._loop_state[loop] = {'slots': asyncio.Semaphore(self.options['async_max_concurrency'])}
+        return state
+
+    async def _aattempt(self, fn, args, kwargs):
+        self._admit()
+        slots = self._state_for_loop()['slots']
+        try:
+            await asyncio.wait_for(slots.acquire(), self.options['queue_timeout'])
+        except asyncio.TimeoutError:
+            self._reject()
+        try:
+            with metrics.timer(self._metric('latency')):
+                return await fn(*args, **kwargs)
+        finally:
+            slots.release()
+
+    async def acall(self, fn, *args, transient=(Exception,), retry=True, is_failure=None, **kwargs):
+        """
+        Async version of call() for coroutine functions. Waiting calls don't hold
+        a thread, so the bulkhead is sized separately, by `async_max_concurrency`.
+        """
+        attempts = self.options['retries'] + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                result = await self._aattempt(fn, args, kwargs)
+            except UpstreamUnavailable:
+                raise
+            except transient as e:
+                if not self._should_retry(e, is_failure, attempt, attempts):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return result
+
+
+# Keeps the closing tasks alive: the event loop only holds weak references to tasks
+_client_closers = set()
+
+
+async def _close_on_shutdown(client):
+    """
+    Waits until cancelled, then closes `client`. asyncio.run() (used by ASGI
+    servers, and by asgiref's async_to_sync for async views under WSGI)
+    cancels the tasks still pending, and waits for them, before closing its loop.
+    """
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+
+class HTTPIntegration(Upstream):
+    """
+    An Upstream spoken to over HTTP, with a keep-alive connection pool: a
+    requests.Session for sync callers and an httpx.AsyncClient per event loop
+    for async ones (aget/apost).
+    """
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.options['max_concurrency'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._ssl_context = None
+
+    def _check_status(self, response):
+        if response.status_code >= 400:
+            raise UpstreamHTTPError(self.name, f"HTTP {response.status_code}", response=response)
+        return response
+
+    def _is_failure(self, exc):
+        # A 404 for an unknown city says nothing about the upstream's health
+        return not isinstance(exc, UpstreamHTTPError) or exc.status_code in self.options['retry_statuses']
+
+    def _send(self, method, url, **kwargs):
+        return self._check_status(self.session.request(method, url, **kwargs))
+
+    def request(self, method, path, **kwargs):
+        """
+        Sends a request to `base_url + path` and returns the requests.Response.
+        Raises UpstreamHTTPError for 4xx/5xx answers (after retrying 429/5xx),
+        UpstreamUnavailable when the call wasn't attempted, and IntegrationError
+        for connection errors and timeouts.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', (self.options['connect_timeout'], self.options['read_timeout']))
+        try:
+            return self.call(
+                self._send, method, self.options['base_url'] + path,
+                transient=(requests.RequestException, UpstreamHTTPError),
+                retry=method in self.options['retry_methods'],
+                is_failure=self._is_failure,
+                **kwargs
+            )
+        except requests.Timeout as e:
+            raise IntegrationError(self.name, "timed out") from e
+        except requests.RequestException as e:
+            raise IntegrationError(self.name, f"connection failed ({e.__class__.__name__})") from e
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def _async_client(self):
+        state = self._state_for_loop()
+        if 'client' not in state:
+            if self._ssl_context is None:
+                # Loading the CA bundle takes tens of milliseconds; do it once, not per
+                # event loop (under WSGI every async view gets a fresh loop)
+                self._ssl_context = httpx.create_ssl_context()
+            limits = httpx.Limits(
+                max_connections=self.options['async_max_concurrency'],
+                max_keepalive_connections=self.options['async_max_keepalive'],
+            )
+            client = state['client'] = httpx.AsyncClient(
+                base_url=self.options['base_url'],
+                timeout=httpx.Timeout(self.options['read_timeout'], connect=self.options['connect_timeout']),
+                limits=limits,
+                verify=self._ssl_context,
+            )
+            closer = asyncio.get_running_loop().create_task(_close_on_shutdown(client))
+            _client_closers.add(closer)
+            closer.add_done_callback(_client_closers.discard)
+        return state['client']
+
+    async def _asend(self, method, path, **kwargs):
+        return self._check_status(await self._async_client().request(method, path, **kwargs))
+
+    async def arequest(self, method, path, **kwargs):
+        """Async version of request(); returns an httpx.Response."""
+        method = method.upper()
+        try:
+            return await self.acall(
+                self._asend, method, path,
+                transient=(httpx.TransportError, UpstreamHTTPError),
+                retry=method in self.options['retry_methods'],
+                is_failure=self._is_failure,
+                **kwargs
+            )
+        except httpx.TimeoutException as e:
+            raise IntegrationError(self.name, "timed out") from e
+        except httpx.TransportError as e:
+            raise IntegrationError(self.name, f"connection failed ({e.__class__.__name__})") from e
+
+    async def aget(self, path, **kwargs):
+        return await self.arequest('GET', path, **kwargs)
+
+    async def apost(self, path, **kwargs):
+        return await self.arequest('POST', path, **kwargs)
+
+
+_integrations = {}
+_integrations_lock = threading.Lock()
+
+
+def get_integration(name):
+    """
+    Returns the process-wide client for the upstream `name`, configured from
+    settings.INTEGRATIONS[name]. Upstreams with a `base_url` are HTTPIntegrations.
+    """
+    with _integrations_lock:
+        if name not in _integrations:
+            options = getattr(settings, 'INTEGRATIONS', {}).get(name, {})
+            cls = HTTPIntegration if options.get('base_url') else Upstream
+            _integrations[name] = cls(name, **options)
+        return _integrations[name]
+
+
+def get_integration_stats():
+    """Per-upstream circuit state and metrics, for the admin stats endpoint."""
+    with _integrations_lock:
+        upstreams = dict(_integrations)
+    return {
+        name: dict(metrics.snapshot(f'integration.{name}.'), circuit=upstream.breaker.state)
+        for name, upstream in upstreams.items()
+    }
+
+
+@receiver(setting_changed)
+def reset_integrations(setting, **kwargs):
+    """Rebuilds the clients when INTEGRATIONS is overridden (e.g. in tests)."""
+    if setting == 'INTEGRATIONS':
+        with _integrations_lock:
+            _integrations.clear()
@@ -0,0 +1,18 @@
+# In utils/jobs.py
+"""Background batch translation (POST /api/utils/translate/batch/?background=true)."""
+import hashlib
+import json
+
+from jobs.registry import register
+from .translation import translate_batch
+
+
+def batch_job_key(user_id, payload):
+    """The same batch asked for twice by a user while it is queued shares one job."""
+    return f'{user_id}:' + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+@register('utils.batch_translation', concurrency=2)
+def batch_translation(job):
+    payload = job.payload
+    return {"results": translate_batch(payload['texts'], payload['targets'], payload['source'])}
@@ -0,0 +1,70 @@
+# In utils/metrics.py
+"""
+In-process counters and timings for the app's caches and outbound integrations.
+
+Values live in the worker process that recorded them; they're meant for quick
+hit-rate and latency checks (admin endpoints, benchmarks), not as a replacement
+for a metrics system.
+
+    from utils.metrics import metrics
+    metrics.increment('translation.lru_hit')
+    with metrics.timer('translation.upstream'):
+        ...
+    metrics.snapshot('translation.')
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """Thread-safe named counters and timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name, seconds):
+        """Records one duration under `name` (count, total and max are kept)."""
+        with self._lock:
+            count, total, longest = self._timings.get(name, (0, 0.0, 0.0))
+            self._timings[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self, prefix=''):
+        """Returns the counters and timings whose names start with `prefix`."""
+        with self._lock:
+            data = {name: value for name, value in self._counters.items() if name.startswith(prefix)}
+            for name, (count, total, longest) in self._timings.items():
+                if name.startswith(prefix):
+                    data[name] = {
+                        'count': count,
+                        'avg_ms': round(total / count * 1000, 3),
+                        'max_ms': round(longest * 1000, 3),
+                    }
+        return data
+
+    def reset(self, prefix=''):
+        with self._lock:
+            for store in (self._counters, self._timings):
+                for name in [name for name in store if name.startswith(prefix)]:
+                    del store[name]
+
+
+metrics = Metrics()
@@ -0,0 +1,168 @@
+# In utils/mixins.py
+"""
+View-side support for sparse fieldsets (see utils/serializers.py).
+
+`SparseFieldsetViewMixin` reads `?fields=` and `?expand=` into the serializer
+context and shapes the queryset to match the fields that are left, so a client
+asking for `?fields=id,status` neither joins nor loads the columns it didn't ask for.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .serializers import EXPAND_ALL, parse_field_tree, get_nested_serializer
+
+READ_ACTIONS = ('list', 'retrieve')
+
+
+class QueryPlan:
+    """The columns, joins and prefetches a serializer needs from one model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.only = set()
+        self.unrestricted = False
+        self.select_related = {}
+        self.prefetch_related = {}
+
+    def only_paths(self, prefix=''):
+        if self.unrestricted:
+            paths = {f.name for f in self.model._meta.concrete_fields}
+        else:
+            paths = set(self.only)
+        paths = {prefix + path for path in paths}
+        for name, plan in self.select_related.items():
+            paths.add(prefix + name)
+            paths |= plan.only_paths(f'{prefix}{name}__')
+        return paths
+
+    def select_paths(self, prefix=''):
+        paths = set()
+        for name, plan in self.select_related.items():
+            paths.add(prefix + name)
+            paths |= plan.select_paths(f'{prefix}{name}__')
+        return paths
+
+    def apply(self, queryset):
+        selects = self.select_paths()
+        if selects:
+            queryset = queryset.select_related(*selects)
+        for name, plan in self.prefetch_related.items():
+            related = plan.apply(plan.model._default_manager.all())
+            queryset = queryset.prefetch_related(Prefetch(name, queryset=related))
+        if not self.unrestricted or self.select_related:
+            queryset = queryset.only(*self.only_paths())
+        return queryset
+
+
+def _prefetch_plan(relation, plan=None):
+    plan = plan or QueryPlan(relation.related_model)
+    if relation.one_to_many:
+        # The prefetched rows need their FK back to us to be matched up
+        plan.only.add(relation.remote_field.name)
+    return plan
+
+
+def _add_path(plan, model, parts):
+    """Records a dotted source path like ['service', 'vendor', 'business_name']."""
+    name = parts[0]
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # A property or method: we can't tell what it reads, so load everything
+        plan.unrestricted = True
+        return
+
+    if not field.is_relation:
+        plan.only.add(field.name)
+        return
+
+    if field.many_to_one or field.one_to_one:
+        if field.concrete and len(parts) == 1:
+            # Just the primary key, e.g. a PrimaryKeyRelatedField
+            plan.only.add(field.name)
+            return
+        child = plan.select_related.setdefault(name, QueryPlan(field.related_model))
+        if len(parts) == 1:
+            child.unrestricted = True
+        else:
+            _add_path(child, field.related_model, parts[1:])
+        return
+
+    # Reverse foreign keys and many-to-many relations are prefetched
+    child = plan.prefetch_related.setdefault(name, _prefetch_plan(field))
+    if len(parts) == 1:
+        child.unrestricted = True
+    else:
+        _add_path(child, field.related_model, parts[1:])
+
+
+def build_query_plan(serializer, model):
+    """Works out what `serializer` (after pruning) reads from `model`."""
+    plan = QueryPlan(model)
+    declared_sources = getattr(getattr(serializer, 'Meta', None), 'sparse_field_sources', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, serializers.HiddenField):
+            continue
+        if name in declared_sources:
+            for path in declared_sources[name]:
+                _add_path(plan, model, path.split('__'))
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            plan.unrestricted = True
+            continue
+
+        nested = get_nested_serializer(field)
+        parts = field.source.split('.')
+        if isinstance(nested, serializers.ModelSerializer):
+            try:
+                relation = model._meta.get_field(parts[0])
+            except FieldDoesNotExist:
+                plan.unrestricted = True
+                continue
+            nested_plan = build_query_plan(nested, relation.related_model)
+            if relation.many_to_one or relation.one_to_one:
+                plan.select_related[parts[0]] = nested_plan
+            else:
+                plan.prefetch_related[parts[0]] = _prefetch_plan(relation, nested_plan)
+        else:
+            _add_path(plan, model, parts)
+    return plan
+
+
+class SparseFieldsetViewMixin:
+    """
+    Mixin for generic views/viewsets whose serializers use SparseFieldsetMixin.
+
+    Nested objects are compact in lists and expanded in full on other actions,
+    unless the client passes `?expand=` explicitly.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        request = self.request
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return context
+
+        params = request.query_params
+        context['sparse_fields'] = parse_field_tree(params.get('fields'))
+        if 'expand' in params:
+            context['sparse_expand'] = parse_field_tree(params.get('expand'))
+        elif getattr(self, 'action', 'list') != 'list':
+            context['sparse_expand'] = EXPAND_ALL
+        else:
+            context['sparse_expand'] = {}
+        return context
+
+    def optimize_queryset(self, queryset):
+        """Applies only()/select_related()/prefetch_related() for the requested fields."""
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        return build_query_plan(serializer, queryset.model).apply(queryset)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        action = getattr(self, 'action', None)
+        if action in READ_ACTIONS or (action is None and self.request.method in ('GET', 'HEAD')):
+            queryset = self.optimize_queryset(queryset)
+        return queryset
@@ -1,3 +1,124 @@
+# In utils/models.py
+import copy
+
 from django.db import models
+from django.db.models.fields.files import FieldFile
+
+
+def changed_fields(instance, values):
+    """
+    Assigns `values` ({field name: value}) to `instance` and returns the names
+    of the fields whose value actually changed, for `save(update_fields=...)`.
+    For models that can't use DirtyFieldsMixin, such as django.contrib.auth's User.
+    """
+    changed = []
+    for name, value in values.items():
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed.append(name)
+    return changed
+
+
+class DirtyFieldsMixin(models.Model):
+    """
+    Remembers the values a model instance was loaded (or last saved) with, so
+    that `save()` only writes the columns that changed, and doesn't query at
+    all when nothing did:
+
+        vendor = Vendor.objects.get(pk=pk)
+        vendor.is_verified = True
+        vendor.save()   # UPDATE ... SET is_verified = true
+        vendor.save()   # no query
+
+    New instances, and saves with explicit `update_fields`, behave as usual.
+    The remembered values are those this instance last read or wrote: changes
+    made elsewhere since (another instance, another request, QuerySet.update())
+    aren't seen until `refresh_from_db()`. Code that needs the row's current
+    state, like the booking rollups, must read it rather than rely on them.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_saved_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_saved_values(fields)
+
+    def _remember_saved_values(self, fields=None):
+        saved = getattr(self, '_saved_values', None) if fields is not None else None
+        if saved is None:
+            saved = self._saved_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (fields is None or field.name in fields or field.attname in fields):
+                saved[field.attname] = self._comparable_value(self.__dict__[field.attname])
+
+    @staticmethod
+    def _comparable_value(value):
+        """A snapshot of `value` that later changes to the live value can't alter."""
+        # Mutable values (e.g. JSONField) are compared against a copy
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        # Files by their stored name: a FieldFile is changed in place (`.name = ...`),
+        # and a new, not yet stored upload always counts as a change
+        if isinstance(value, FieldFile) and value._committed:
+            return value.name
+        return value
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields changed since the instance was loaded or last
+        saved, or None if the instance has never been loaded or saved.
+        """
+        saved = getattr(self, '_saved_values', None)
+        if saved is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in saved
+                 or self._comparable_value(self.__dict__[field.attname]) != saved[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                # auto_now fields are set on every save
+                dirty += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.name not in dirty
+                ]
+                kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        self._remember_saved_values(kwargs.get('update_fields'))
+
+
+class TranslationEntry(models.Model):
+    """
+    The shared, persistent level of the translation cache (see utils/translation.py).
+    Keyed by the hash of the normalized text, so the text itself isn't stored twice.
+    """
+    text_hash = models.CharField(max_length=64)
+    # The requested source language, 'auto' when it was detected
+    source = models.CharField(max_length=12)
+    target = models.CharField(max_length=12)
+    translated_text = models.TextField()
+    detected_source = models.CharField(max_length=12)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['text_hash', 'source', 'target'], name='translation_entry_key'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.source}->{self.target} {self.text_hash[:12]}"
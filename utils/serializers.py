@@ -0,0 +1,110 @@
+# In utils/serializers.py
+"""
+Sparse fieldsets for the project's serializers.
+
+Clients can ask for just the fields they need and choose which nested objects
+are expanded to their full representation:
+
+    GET /api/vendors/bookings/?fields=id,status,service.name
+    GET /api/vendors/bookings/?expand=service
+
+Nested paths use dots. Unrequested fields are dropped from the serializer when it
+is created, before any data is read, and `utils.mixins.SparseFieldsetViewMixin`
+uses the remaining fields to pick `only()`/`select_related()`/`prefetch_related()`.
+
+Serializers opt in with `SparseFieldsetMixin` and can declare in their Meta:
+- `expandable_fields`: {name: full serializer class} used instead of the compact
+  nested serializer that is declared on the class.
+- `sparse_field_sources`: {name: [model paths]} for SerializerMethodFields, so the
+  queryset optimiser knows which columns/relations they read.
+"""
+from rest_framework import serializers
+
+EXPAND_ALL = '*'
+
+
+def parse_field_tree(value):
+    """
+    Turns "id,service.name,service.city" into {'id': {}, 'service': {'name': {}, 'city': {}}}.
+    An empty dict means "this field, in full".
+    """
+    tree = {}
+    if not value:
+        return tree
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def get_nested_serializer(field):
+    """Returns the serializer behind a (possibly many=True) nested field."""
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    return field
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin that prunes and expands fields from the `fields`/`expand`
+    trees the view puts in the serializer context (see SparseFieldsetViewMixin).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = getattr(self, '_context', {})
+        if 'sparse_fields' in context or 'sparse_expand' in context:
+            self.apply_sparse_fieldset(context.get('sparse_fields') or {}, context.get('sparse_expand') or {})
+
+    def apply_sparse_fieldset(self, fields, expand):
+        """Expands, then prunes this serializer's fields and recurses into nested ones."""
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        if expand == EXPAND_ALL:
+            to_expand = {name: EXPAND_ALL for name in expandable}
+        else:
+            to_expand = expand
+
+        for name in to_expand:
+            if name in expandable and name in self.fields:
+                current = self.fields[name]
+                kwargs = {'many': isinstance(current, serializers.ListSerializer), 'read_only': True}
+                if current.source != name:
+                    kwargs['source'] = current.source
+                self.fields[name] = expandable[name](**kwargs)
+
+        if fields:
+            for name in list(self.fields):
+                field = self.fields[name]
+                if name not in fields and not (field.write_only or isinstance(field, serializers.HiddenField)):
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            nested = get_nested_serializer(field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested_expand = EXPAND_ALL if expand == EXPAND_ALL else expand.get(name, {})
+                nested.apply_sparse_fieldset(fields.get(name) or {}, nested_expand)
+
+
+class BatchTranslationSerializer(serializers.Serializer):
+    """Input of the batch translation endpoint (see utils.views.BatchTranslationView)."""
+    MAX_TEXTS = 100
+    MAX_TARGETS = 10
+    MAX_TEXT_LENGTH = 5000
+
+    texts = serializers.ListField(
+        child=serializers.CharField(max_length=MAX_TEXT_LENGTH), min_length=1, max_length=MAX_TEXTS
+    )
+    target_languages = serializers.ListField(
+        child=serializers.ChoiceField(choices=[]), min_length=1, max_length=MAX_TARGETS
+    )
+    source_language = serializers.ChoiceField(choices=[], required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from googletrans import LANGUAGES
+        self.fields['target_languages'].child.choices = list(LANGUAGES)
+        self.fields['source_language'].choices = list(LANGUAGES)
@@ -1,3 +1,514 @@
-from django.test import TestCase
+# In utils/tests.py
 
-# Create your tests here.
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from planner.models import Itinerary, ItineraryItem, Destination
+from vendors.models import Vendor, Service, Booking
+from .integrations import IntegrationError, UpstreamHTTPError, UpstreamUnavailable, get_integration
+from .metrics import metrics
+from .models import TranslationEntry
+from .serializers import parse_field_tree
+from . import translation
+
+
+class SparseFieldsetTest(APITestCase):
+    """
+    Test suite for the ?fields= / ?expand= mechanism in utils.serializers and utils.mixins.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        vendor_user = User.objects.create_user(username='vendor', password='StrongPassword123')
+        vendor = Vendor.objects.create(user=vendor_user, business_name='Deosai Camps', contact_phone='0300')
+        service = Service.objects.create(
+            vendor=vendor, name='Lakeside Room', description='A long description', service_type='HOTEL',
+            price=Decimal('100.00'), city='Skardu'
+        )
+        Booking.objects.create(
+            user=self.user, service=service, service_start_date=date(2025, 7, 1), total_price=Decimal('100.00')
+        )
+        self.itinerary = Itinerary.objects.create(
+            user=self.user, name='GB trip', start_date=date(2025, 7, 1), end_date=date(2025, 7, 5)
+        )
+        destination = Destination.objects.create(
+            name='Deosai', description='A very long description', city='Skardu', country='Pakistan',
+            destination_type='PARK'
+        )
+        ItineraryItem.objects.create(itinerary=self.itinerary, destination=destination, day_number=1)
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_parse_field_tree(self):
+        self.assertEqual(
+            parse_field_tree('id, service.name,service.city'),
+            {'id': {}, 'service': {'name': {}, 'city': {}}}
+        )
+
+    def test_list_uses_the_compact_nested_representation(self):
+        data, _ = self.get('/api/vendors/bookings/')
+        self.assertNotIn('description', data[0]['service'])
+
+        data, _ = self.get('/api/vendors/bookings/?expand=service')
+        self.assertEqual(data[0]['service']['description'], 'A long description')
+
+    def test_unrequested_fields_are_neither_serialized_nor_loaded(self):
+        data, queries = self.get('/api/vendors/bookings/?fields=id,status')
+
+        self.assertEqual(data, [{'id': data[0]['id'], 'status': 'PENDING'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0])
+        self.assertNotIn('total_price', queries[0])
+
+    def test_nested_fields_pick_the_joins_and_prefetches(self):
+        data, queries = self.get(f'/api/planner/itineraries/{self.itinerary.id}/?fields=name,items.destination.name')
+
+        self.assertEqual(data, {'name': 'GB trip', 'items': [{'destination': {'name': 'Deosai'}}]})
+        # The itinerary, then its items joined with their destination
+        self.assertEqual(len(queries), 2)
+        self.assertIn('JOIN "planner_destination"', queries[1])
+        self.assertNotIn('description', queries[1])
+
+    def test_detail_views_expand_nested_objects_by_default(self):
+        data, _ = self.get(f'/api/planner/itineraries/{self.itinerary.id}/')
+        self.assertEqual(data['items'][0]['destination']['description'], 'A very long description')
+
+
+class TranslationCacheTest(APITestCase):
+    """
+    Test suite for the two-level translation cache behind TranslationView.
+    The upstream service is replaced by a stub: tests never call the network.
+    """
+
+    def setUp(self):
+        translation.clear_local_cache()
+        metrics.reset('translation.')
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(translation, 'translate_upstream', return_value=('فی رات کتنا؟', 'en'))
+        self.upstream = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        async def async_upstream(text, target, source):
+            return self.upstream(text, target, source)
+        patcher = mock.patch.object(translation, 'atranslate_upstream', async_upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_phrases_are_translated_once(self):
+        first = translation.translate('How much per night?', 'ur')
+        second = translation.translate('  How much   per night? ', 'ur')
+
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual(first.text, second.text)
+        self.assertEqual(TranslationEntry.objects.count(), 1)
+        stats = translation.get_translation_stats()
+        self.assertEqual((stats['lru_hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_shared_store_survives_a_cold_process_cache(self):
+        translation.translate('How much per night?', 'ur')
+        translation.clear_local_cache()
+
+        with self.assertNumQueries(1):
+            result = translation.translate('How much per night?', 'ur')
+        self.assertEqual(result.source, 'en')
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual(translation.get_translation_stats()['store_hits'], 1)
+
+    def test_concurrent_identical_requests_share_one_upstream_call(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_upstream(text, target, source):
+            started.set()
+            release.wait(5)
+            return ('ہیلو', 'en')
+
+        self.upstream.side_effect = slow_upstream
+        results = []
+        # Only the leader touches the database; keep these threads off it
+        with mock.patch.object(translation, '_load', return_value=None), \
+                mock.patch.object(translation, '_store'):
+            threads = [threading.Thread(target=lambda: results.append(translation.translate('Hello', 'ur')))]
+            threads[0].start()
+            started.wait(5)
+            threads += [threading.Thread(target=lambda: results.append(translation.translate('Hello', 'ur')))
+                        for _ in range(4)]
+            for thread in threads[1:]:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while metrics.get('translation.coalesced') < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual([result.text for result in results], ['ہیلو'] * 5)
+
+    def test_waiting_on_a_stuck_leader_is_a_translation_error(self):
+        # Another request is translating 'Hello' and doesn't finish in time
+        leader, _ = translation._claim(translation.cache_key('Hello', 'ur', translation.AUTO_DETECT))
+        self.addCleanup(translation._release, translation.cache_key('Hello', 'ur', translation.AUTO_DETECT))
+
+        with mock.patch.object(translation, 'COALESCE_TIMEOUT', 0.05):
+            with self.assertRaises(translation.TranslationError):
+                translation.translate('Hello', 'ur')
+            with self.assertRaises(translation.TranslationError):
+                async_to_sync(translation.atranslate)('Hello', 'ur')
+            response = self.client.post(
+                reverse('text-translation'), {'text': 'Hello', 'target_language': 'ur'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn('error', response.data)
+        # The leader can still finish: the waiters gave up without cancelling it
+        self.assertFalse(leader.cancelled())
+        self.assertEqual(self.upstream.call_count, 0)
+
+    def test_async_and_sync_callers_share_the_cache(self):
+        first = async_to_sync(translation.atranslate)('How much per night?', 'ur')
+        second = translation.translate('How much per night?', 'ur')
+        translation.clear_local_cache()
+        third = async_to_sync(translation.atranslate)('How much per night?', 'ur')
+
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual({first.text, second.text, third.text}, {'فی رات کتنا؟'})
+        stats = translation.get_translation_stats()
+        self.assertEqual((stats['misses'], stats['lru_hits'], stats['store_hits']), (1, 1, 1))
+
+    def test_view_serves_cached_translations(self):
+        url = reverse('text-translation')
+        for _ in range(3):
+            response = self.client.post(url, {'text': 'How much per night?', 'target_language': 'ur'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['translated_text'], 'فی رات کتنا؟')
+        self.assertEqual(response.data['source_language'], 'english')
+        self.assertEqual(self.upstream.call_count, 1)
+
+    def test_upstream_failures_are_not_cached(self):
+        self.upstream.side_effect = translation.TranslationError('timed out')
+        response = self.client.post(
+            reverse('text-translation'), {'text': 'Hello', 'target_language': 'ur'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(TranslationEntry.objects.exists())
+        self.assertEqual(translation.get_translation_stats()['errors'], 1)
+
+    def test_stats_are_for_admins_only(self):
+        url = reverse('translation-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='StrongPassword123'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+class FakeAsyncTranslator:
+    """Stands in for googletrans 4.x's asyncio-based Translator."""
+    instances = 0
+
+    def __init__(self, **kwargs):
+        FakeAsyncTranslator.instances += 1
+
+    async def translate(self, text, dest='en', src='auto'):
+        return mock.Mock(text=f'{text} [{dest}]', src='en')
+
+
+class BatchTranslationTest(APITestCase):
+    """
+    Test suite for POST /api/utils/translate/batch/ and translation.translate_many().
+    """
+
+    def setUp(self):
+        translation.clear_local_cache()
+        metrics.reset('translation.')
+        self.user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('batch-translation')
+
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        patcher = mock.patch.object(translation, 'translate_upstream', side_effect=self.fake_upstream)
+        self.upstream = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_upstream(self, text, target, source):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if text == 'Broken':
+            raise translation.TranslationError('upstream refused')
+        return (f'{text} [{target}]', 'en')
+
+    def test_batch_dedupes_and_translates_concurrently(self):
+        texts = [f'Phrase {i}' for i in range(6)] + ['Phrase 0', ' Phrase  1 ']
+        response = self.client.post(self.url, {'texts': texts, 'target_languages': ['ur', 'ar']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results[6]['translations']['ur']['translated_text'], 'Phrase 0 [ur]')
+        self.assertEqual(results[7]['translations']['ar']['translated_text'], 'Phrase 1 [ar]')
+        # 6 distinct texts x 2 languages, run side by side
+        self.assertEqual(self.upstream.call_count, 12)
+        self.assertGreater(self.peak, 1)
+        self.assertEqual(TranslationEntry.objects.count(), 12)
+
+    def test_cached_items_skip_upstream(self):
+        translation.translate('Hello', 'ur')
+        self.upstream.reset_mock()
+        translation.clear_local_cache()
+
+        self.client.post(self.url, {'texts': ['Hello', 'Goodbye'], 'target_languages': ['ur']}, format='json')
+        self.assertEqual([c.args[0] for c in self.upstream.call_args_list], ['Goodbye'])
+
+    def test_failures_are_reported_per_item(self):
+        response = self.client.post(self.url, {'texts': ['Hello', 'Broken'], 'target_languages': ['ur']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['translations']['ur']['translated_text'], 'Hello [ur]')
+        self.assertEqual(response.data['results'][1]['translations']['ur'], {'error': 'upstream refused'})
+        self.assertFalse(TranslationEntry.objects.filter(target='ur', translated_text__startswith='Broken').exists())
+
+    def test_invalid_language_is_rejected(self):
+        response = self.client.post(self.url, {'texts': ['Hello'], 'target_languages': ['xx']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_can_run_in_the_background(self):
+        from jobs.services import work_off
+
+        body = {'texts': ['Hello', 'Thank you'], 'target_languages': ['ur']}
+        response = self.client.post(self.url + '?background=true', body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.upstream.call_count, 0)
+
+        work_off(kinds=['utils.batch_translation'])
+        job = self.client.get(response['Location']).data
+        self.assertEqual(job['status'], 'SUCCEEDED')
+        self.assertEqual(job['result']['results'][1]['translations']['ur']['translated_text'], 'Thank you [ur]')
+
+    def test_upstream_client_is_created_once_and_reused(self):
+        FakeAsyncTranslator.instances = 0
+        client = translation.UpstreamClient()
+        with mock.patch('googletrans.Translator', FakeAsyncTranslator):
+            results = [client.translate('Hello', 'ur', 'auto').text for _ in range(3)]
+
+        self.assertEqual(results, ['Hello [ur]'] * 3)
+        self.assertEqual(FakeAsyncTranslator.instances, 1)
+
+
+class StubUpstream:
+    """
+    A local HTTP server standing in for a third-party API. Queue answers with
+    `respond(status, body, delay)`; once the queue is empty the last answer is
+    repeated. Every request path is recorded in `requests`.
+    """
+
+    def __init__(self):
+        self.answers = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _answer(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                stub.requests.append((self.command, self.path, self.rfile.read(length)))
+                status_code, body, delay = stub.answers.pop(0) if len(stub.answers) > 1 else stub.answers[0]
+                time.sleep(delay)
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status_code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except OSError:
+                    pass  # The client gave up waiting
+
+            do_GET = do_POST = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, status_code=200, body=None, delay=0):
+        self.answers.append((status_code, {} if body is None else body, delay))
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stub_integration(name, url, **options):
+    """INTEGRATIONS setting pointing `name` at a stub, with no backoff so tests stay fast."""
+    return {name: dict({'base_url': url, 'backoff': 0, 'backoff_max': 0}, **options)}
+
+
+class IntegrationClientTest(APITestCase):
+    """
+    Test suite for the shared outbound client layer in utils.integrations,
+    run against a local stub server.
+    """
+
+    def setUp(self):
+        metrics.reset('integration.')
+        self.stub = StubUpstream()
+        self.addCleanup(self.stub.close)
+
+    def integration(self, **options):
+        overrides = override_settings(INTEGRATIONS=stub_integration('stub', self.stub.url, **options))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        return get_integration('stub')
+
+    def test_transient_errors_are_retried(self):
+        self.stub.respond(503).respond(502).respond(200, {'ok': True})
+        client = self.integration(retries=2)
+
+        self.assertEqual(client.get('/ping').json(), {'ok': True})
+        self.assertEqual(len(self.stub.requests), 3)
+        stats = metrics.snapshot('integration.stub.')
+        self.assertEqual(stats['integration.stub.retry'], 2)
+        self.assertEqual(stats['integration.stub.latency']['count'], 3)
+
+    def test_client_errors_are_not_retried_and_keep_the_circuit_closed(self):
+        self.stub.respond(404, {'message': 'city not found'})
+        client = self.integration(retries=2, failure_threshold=1)
+
+        with self.assertRaises(UpstreamHTTPError) as raised:
+            client.get('/weather')
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_posts_are_only_retried_when_allowed(self):
+        self.stub.respond(503)
+        client = self.integration(retries=2)
+
+        with self.assertRaises(UpstreamHTTPError):
+            client.post('/bookings', json={})
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_read_timeout(self):
+        self.stub.respond(200, delay=0.5)
+        client = self.integration(read_timeout=0.1, retries=0)
+
+        with self.assertRaisesMessage(IntegrationError, 'timed out'):
+            client.get('/slow')
+        self.assertEqual(metrics.get('integration.stub.error'), 1)
+
+    def test_circuit_opens_and_recovers(self):
+        self.stub.respond(500).respond(500).respond(200, {'ok': True})
+        client = self.integration(retries=0, failure_threshold=2, reset_timeout=0.2)
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamHTTPError):
+                client.get('/flaky')
+        # Open: fails fast without reaching the upstream
+        with self.assertRaises(UpstreamUnavailable):
+            client.get('/flaky')
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(metrics.get('integration.stub.circuit_open'), 1)
+
+        time.sleep(0.25)
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.get('/flaky').json(), {'ok': True})
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_bulkhead_limits_concurrent_calls(self):
+        self.stub.respond(200, delay=0.3)
+        client = self.integration(max_concurrency=2, queue_timeout=0.05)
+        outcomes = []
+
+        def call():
+            try:
+                client.get('/slow')
+                outcomes.append('ok')
+            except UpstreamUnavailable:
+                outcomes.append('rejected')
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['ok', 'ok', 'rejected', 'rejected'])
+        self.assertEqual(metrics.get('integration.stub.rejected'), 2)
+        # The rejected calls never reached the upstream, nor counted against it
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_async_requests_share_the_resilience_policy(self):
+        self.stub.respond(503).respond(200, {'ok': True})
+        client = self.integration(retries=1, failure_threshold=2, reset_timeout=60)
+
+        response = async_to_sync(client.aget)('/ping', params={'q': 'Skardu'})
+        self.assertEqual(response.json(), {'ok': True})
+        self.assertEqual(self.stub.requests[-1][1], '/ping?q=Skardu')
+        self.assertEqual(metrics.get('integration.stub.retry'), 1)
+
+        # A failure seen by an async caller opens the circuit for sync callers too
+        self.stub.answers = [(500, {}, 0)]
+        with self.assertRaises(UpstreamHTTPError):
+            async_to_sync(client.aget)('/ping')
+        with self.assertRaises(UpstreamUnavailable):
+            client.get('/ping')
+
+    def test_async_clients_are_closed_with_their_event_loop(self):
+        self.stub.respond(200, {'ok': True})
+        integration = self.integration()
+        clients = []
+
+        async def fetch():
+            await integration.aget('/ping')
+            clients.append(integration._async_client())
+
+        # Under WSGI every async view runs in its own event loop
+        async_to_sync(fetch)()
+        async_to_sync(fetch)()
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(all(client.is_closed for client in clients))
+
+    def test_stats_are_for_admins_only(self):
+        self.stub.respond(200)
+        self.integration().get('/ping')
+        url = reverse('integration-stats')
+        user = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stub']['circuit'], 'closed')
+        self.assertEqual(response.data['stub']['integration.stub.latency']['count'], 1)
@@ -0,0 +1,514 @@
+# In utils/translation.py
+"""
+Cached text translation.
+
+Translations are looked up in two cache levels before the upstream service
+(googletrans) is called:
+
+1. an in-process LRU of TRANSLATION_LRU_SIZE entries, answered in microseconds;
+2. the TranslationEntry table, shared by every worker and kept across restarts.
+
+Both are keyed by (sha256 of the normalized text, source, target). Concurrent
+requests for the same key while it is being translated wait for the first
+request's result instead of calling upstream again. Hit/miss counters are
+recorded under 'translation.' in utils.metrics.
+
+`atranslate` is the same lookup for async views, awaiting the store and the
+upstream instead of blocking a thread.
+
+`translate_many` does the same for a batch: duplicates are collapsed, both
+cache levels are read in bulk, and the misses are sent upstream concurrently
+through a shared pool of at most TRANSLATION_MAX_CONCURRENCY calls. Every
+upstream call reuses one long-lived googletrans client (and its connection pool)
+and goes through the 'googletrans' integration (see utils/integrations.py) for
+its timeouts, retries, circuit breaker and bulkhead.
+"""
+import asyncio
+import hashlib
+import inspect
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+
+from .integrations import get_integration
+from .metrics import metrics
+from .models import TranslationEntry
+
+AUTO_DETECT = 'auto'
+DEFAULT_LRU_SIZE = 10_000
+DEFAULT_MAX_CONCURRENCY = 8
+# How long a coalesced request waits for the request doing the translation
+COALESCE_TIMEOUT = 30
+# Failures of the upstream itself, as opposed to e.g. an unsupported language
+UPSTREAM_FAILURES = (OSError, TimeoutError, httpx.HTTPError)
+
+Translation = namedtuple('Translation', ['original', 'text', 'source', 'target'])
+
+
+class TranslationError(Exception):
+    """The upstream translation service failed."""
+
+
+def normalize_text(text):
+    """Trims, collapses whitespace and applies Unicode NFC, so trivially different inputs share a cache entry."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def language_code(preference):
+    """
+    Turns a free-text language preference such as 'Urdu, English' or 'ur'
+    into the code of the first language the translator supports, or None.
+    """
+    from googletrans import LANGUAGES
+
+    codes_by_name = {name: code for code, name in LANGUAGES.items()}
+    for part in (preference or '').split(','):
+        value = part.strip().lower()
+        if value in LANGUAGES:
+            return value
+        if value in codes_by_name:
+            return codes_by_name[value]
+    return None
+
+
+def cache_key(text, target, source=AUTO_DETECT):
+    digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+    return (digest, source, target)
+
+
+class LRUCache:
+    """A small thread-safe least-recently-used cache."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_lru = LRUCache(getattr(settings, 'TRANSLATION_LRU_SIZE', DEFAULT_LRU_SIZE))
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class UpstreamClient:
+    """
+    One long-lived googletrans client for the whole process.
+
+    googletrans 4.x is asyncio-based and its client is bound to the event loop
+    it was created on, so the client lives on a private event loop in a daemon
+    thread and calls are submitted to it from any thread. With the older
+    synchronous googletrans the client is simply shared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._translator = None
+        self._loop = None
+
+    def _start(self, options):
+        from googletrans import Translator
+
+        timeout = httpx.Timeout(options['read_timeout'], connect=options['connect_timeout'])
+        if inspect.iscoroutinefunction(Translator.translate):
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name='translation-upstream', daemon=True).start()
+            # Created on the loop it will be used from
+            coroutine = self._create(Translator, timeout)
+            self._translator = asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+        else:
+            self._translator = Translator(timeout=timeout)
+
+    @staticmethod
+    async def _create(translator_class, timeout):
+        return translator_class(timeout=timeout)
+
+    def _call(self, text, target, source, timeout):
+        if self._loop is not None:
+            coroutine = self._translator.translate(text, dest=target, src=source)
+            return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+        return self._translator.translate(text, dest=target, src=source)
+
+    async def _acall(self, text, target, source, timeout):
+        if self._loop is not None:
+            coroutine = self._translator.translate(text, dest=target, src=source)
+            future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        translate = sync_to_async(self._translator.translate, thread_sensitive=False)
+        return await asyncio.wait_for(translate(text, dest=target, src=source), timeout)
+
+    def _prepare(self):
+        """Returns the integration and the timeout for one call, starting the client on first use."""
+        upstream = get_integration('googletrans')
+        options = upstream.options
+        with self._lock:
+            if self._translator is None:
+                self._start(options)
+        # Bounds the whole call, however many requests googletrans makes for it
+        return upstream, options['connect_timeout'] + options['read_timeout']
+
+    def translate(self, text, target, source):
+        upstream, timeout = self._prepare()
+        return upstream.call(self._call, text, target, source, timeout, transient=UPSTREAM_FAILURES)
+
+    async def atranslate(self, text, target, source):
+        """Async version of translate(): the caller's event loop isn't blocked while waiting."""
+        upstream, timeout = self._prepare()
+        return await upstream.acall(self._acall, text, target, source, timeout, transient=UPSTREAM_FAILURES)
+
+
+_client = UpstreamClient()
+_upstream_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'TRANSLATION_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY),
+    thread_name_prefix='translation',
+)
+
+
+def translate_upstream(text, target, source=AUTO_DETECT):
+    """Calls the upstream service. Returns (translated text, detected source language)."""
+    try:
+        result = _client.translate(text, target, source)
+    except Exception as e:
+        raise TranslationError(str(e) or e.__class__.__name__) from e
+    return result.text, result.src
+
+
+async def atranslate_upstream(text, target, source=AUTO_DETECT):
+    """Async version of translate_upstream()."""
+    try:
+        result = await _client.atranslate(text, target, source)
+    except Exception as e:
+        raise TranslationError(str(e) or e.__class__.__name__) from e
+    return result.text, result.src
+
+
+def _load(key):
+    digest, source, target = key
+    row = (
+        TranslationEntry.objects
+        .filter(text_hash=digest, source=source, target=target)
+        .values_list('translated_text', 'detected_source')
+        .first()
+    )
+    return tuple(row) if row else None
+
+
+async def _aload(key):
+    digest, source, target = key
+    row = await (
+        TranslationEntry.objects
+        .filter(text_hash=digest, source=source, target=target)
+        .values_list('translated_text', 'detected_source')
+        .afirst()
+    )
+    return tuple(row) if row else None
+
+
+def _store(key, value):
+    digest, source, target = key
+    try:
+        TranslationEntry.objects.create(
+            text_hash=digest, source=source, target=target, translated_text=value[0], detected_source=value[1]
+        )
+    except IntegrityError:
+        # Another worker stored it first
+        pass
+
+
+async def _astore(key, value):
+    digest, source, target = key
+    try:
+        await TranslationEntry.objects.acreate(
+            text_hash=digest, source=source, target=target, translated_text=value[0], detected_source=value[1]
+        )
+    except IntegrityError:
+        pass
+
+
+def _timed_upstream(text, target, source):
+    try:
+        with metrics.timer('translation.upstream'):
+            return translate_upstream(text, target, source)
+    except TranslationError:
+        metrics.increment('translation.error')
+        raise
+
+
+async def _atimed_upstream(text, target, source):
+    try:
+        with metrics.timer('translation.upstream'):
+            return await atranslate_upstream(text, target, source)
+    except TranslationError:
+        metrics.increment('translation.error')
+        raise
+
+
+def _translate_and_store(key, text, target, source):
+    value = _load(key)
+    if value is not None:
+        metrics.increment('translation.store_hit')
+    else:
+        metrics.increment('translation.miss')
+        value = _timed_upstream(text, target, source)
+        _store(key, value)
+    _lru.set(key, value)
+    return value
+
+
+def _claim(key):
+    """Returns (future, leader): the leader translates `key`, everyone else waits on its future."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _release(key):
+    with _inflight_lock:
+        del _inflight[key]
+
+
+def _coalesce_timed_out():
+    return TranslationError(f"Timed out after {COALESCE_TIMEOUT}s waiting for the same translation in another request.")
+
+
+def translate(text, target, source=AUTO_DETECT):
+    """Translates `text` into `target`, through the cache. Raises TranslationError."""
+    key = cache_key(text, target, source)
+    value = _lru.get(key)
+    if value is not None:
+        metrics.increment('translation.lru_hit')
+        return Translation(text, value[0], value[1], target)
+
+    future, leader = _claim(key)
+    if not leader:
+        metrics.increment('translation.coalesced')
+        try:
+            value = future.result(timeout=COALESCE_TIMEOUT)
+        except TimeoutError as e:
+            raise _coalesce_timed_out() from e
+        return Translation(text, value[0], value[1], target)
+
+    try:
+        value = _translate_and_store(key, normalize_text(text), target, source)
+        future.set_result(value)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release(key)
+    return Translation(text, value[0], value[1], target)
+
+
+async def atranslate(text, target, source=AUTO_DETECT):
+    """
+    Async version of translate(), for async views: the shared store and the
+    upstream service are waited on without holding a thread. Requests coalesce
+    with sync callers translating the same text.
+    """
+    key = cache_key(text, target, source)
+    value = _lru.get(key)
+    if value is not None:
+        metrics.increment('translation.lru_hit')
+        return Translation(text, value[0], value[1], target)
+
+    future, leader = _claim(key)
+    if not leader:
+        metrics.increment('translation.coalesced')
+        try:
+            # Shielded: cancelling the wrapper on timeout would cancel the leader's future
+            value = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), COALESCE_TIMEOUT)
+        except TimeoutError as e:
+            raise _coalesce_timed_out() from e
+        return Translation(text, value[0], value[1], target)
+
+    try:
+        value = await _aload(key)
+        if value is not None:
+            metrics.increment('translation.store_hit')
+        else:
+            metrics.increment('translation.miss')
+            value = await _atimed_upstream(normalize_text(text), target, source)
+            await _astore(key, value)
+        _lru.set(key, value)
+        future.set_result(value)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release(key)
+    return Translation(text, value[0], value[1], target)
+
+
+def _load_many(keys):
+    """Reads many keys from the shared store in one query per source language."""
+    found = {}
+    by_source = {}
+    for digest, source, target in keys:
+        by_source.setdefault(source, (set(), set()))
+        by_source[source][0].add(digest)
+        by_source[source][1].add(target)
+    for source, (digests, targets) in by_source.items():
+        rows = TranslationEntry.objects.filter(
+            source=source, text_hash__in=digests, target__in=targets
+        ).values_list('text_hash', 'target', 'translated_text', 'detected_source')
+        for digest, target, text, detected in rows:
+            found[(digest, source, target)] = (text, detected)
+    return {key: value for key, value in found.items() if key in keys}
+
+
+def translate_many(texts, targets, source=AUTO_DETECT):
+    """
+    Translates every text into every target language. Returns a dict mapping
+    (text, target) to a Translation, or to the TranslationError raised for it;
+    one failing item doesn't fail the others.
+    """
+    wanted = {}
+    for text in texts:
+        for target in targets:
+            wanted.setdefault(cache_key(text, target, source), []).append((text, target))
+
+    values = {}
+    for key in wanted:
+        value = _lru.get(key)
+        if value is not None:
+            metrics.increment('translation.lru_hit')
+            values[key] = value
+
+    missing = [key for key in wanted if key not in values]
+    if missing:
+        stored = _load_many(set(missing))
+        metrics.increment('translation.store_hit', len(stored))
+        for key, value in stored.items():
+            _lru.set(key, value)
+        values.update(stored)
+
+    # Claim the keys nobody else is translating right now; wait for the rest
+    leading, following = {}, {}
+    with _inflight_lock:
+        for key in wanted:
+            if key in values:
+                continue
+            if key in _inflight:
+                following[key] = _inflight[key]
+            else:
+                leading[key] = _inflight[key] = Future()
+    metrics.increment('translation.miss', len(leading))
+    metrics.increment('translation.coalesced', len(following))
+
+    calls = {
+        key: _upstream_pool.submit(_timed_upstream, normalize_text(wanted[key][0][0]), key[2], source)
+        for key in leading
+    }
+    new_entries = []
+    try:
+        for key, call in calls.items():
+            try:
+                value = values[key] = call.result()
+            except TranslationError as e:
+                values[key] = e
+                leading[key].set_exception(e)
+                continue
+            _lru.set(key, value)
+            leading[key].set_result(value)
+            new_entries.append(TranslationEntry(
+                text_hash=key[0], source=key[1], target=key[2], translated_text=value[0], detected_source=value[1]
+            ))
+    finally:
+        with _inflight_lock:
+            for key, future in leading.items():
+                if not future.done():
+                    future.set_exception(TranslationError('Translation was abandoned.'))
+                del _inflight[key]
+    TranslationEntry.objects.bulk_create(new_entries, ignore_conflicts=True)
+
+    for key, future in following.items():
+        try:
+            values[key] = future.result(timeout=COALESCE_TIMEOUT)
+        except Exception as e:
+            values[key] = e if isinstance(e, TranslationError) else TranslationError(str(e) or 'Timed out.')
+
+    results = {}
+    for key, requests in wanted.items():
+        value = values[key]
+        for text, target in requests:
+            results[(text, target)] = value if isinstance(value, Exception) else Translation(text, value[0], value[1], target)
+    return results
+
+
+def get_translation_stats():
+    """Cache hit rates for the admin stats endpoint."""
+    counters = metrics.snapshot('translation.')
+    lru_hits = counters.get('translation.lru_hit', 0)
+    store_hits = counters.get('translation.store_hit', 0)
+    misses = counters.get('translation.miss', 0)
+    lookups = lru_hits + store_hits + misses
+    return {
+        'lookups': lookups,
+        'lru_hits': lru_hits,
+        'store_hits': store_hits,
+        'misses': misses,
+        'coalesced': counters.get('translation.coalesced', 0),
+        'errors': counters.get('translation.error', 0),
+        'hit_rate': round((lru_hits + store_hits) / lookups, 4) if lookups else None,
+        'lru_size': len(_lru),
+        'upstream': counters.get('translation.upstream'),
+    }
+
+
+def clear_local_cache():
+    """Empties this process's LRU (the shared store is kept)."""
+    _lru.clear()
+
+
+def translate_batch(texts, targets, source=AUTO_DETECT):
+    """
+    translate_many() shaped for the batch translation endpoint: one item per
+    text, with a translation or an "error" per target language.
+    """
+    from googletrans import LANGUAGES
+
+    translations = translate_many(texts, targets, source)
+    results = []
+    for text in texts:
+        item = {"original_text": text, "translations": {}}
+        for target in targets:
+            translation = translations[(text, target)]
+            if isinstance(translation, TranslationError):
+                item["translations"][target] = {"error": str(translation)}
+            else:
+                item["translations"][target] = {
+                    "translated_text": translation.text,
+                    "source_language": LANGUAGES.get(translation.source, translation.source),
+                }
+        results.append(item)
+    return results
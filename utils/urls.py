@@ -1,7 +1,10 @@
 # In utils/urls.py
 from django.urls import path
-from .views import TranslationView
+from .views import TranslationView, BatchTranslationView, TranslationStatsView, IntegrationStatsView
 
 urlpatterns = [
     path('translate/', TranslationView.as_view(), name='text-translation'),
+    path('translate/batch/', BatchTranslationView.as_view(), name='batch-translation'),
+    path('translate/stats/', TranslationStatsView.as_view(), name='translation-stats'),
+    path('integrations/stats/', IntegrationStatsView.as_view(), name='integration-stats'),
 ]
\ No newline at end of file
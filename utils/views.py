@@ -6,16 +6,25 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
-from googletrans import Translator, LANGUAGES
+from googletrans import LANGUAGES
 
-class TranslationView(APIView):
+from .async_views import AsyncAPIView
+from .integrations import get_integration_stats
+from .serializers import BatchTranslationSerializer
+from .translation import atranslate, translate_batch, get_translation_stats, TranslationError, AUTO_DETECT
+from .jobs import batch_job_key
+from jobs.services import enqueue
+from jobs.views import wants_background, job_accepted_response
+
+class TranslationView(AsyncAPIView):
     """
     API endpoint for translating text.
-    Requires authentication.
+    Requires authentication. Async, so under ASGI a request waiting on the
+    translation service doesn't hold a worker.
     """
     permission_classes = [permissions.IsAuthenticated]
     
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         """
         Accepts text and a target language, returns the translation.
         """
@@ -36,19 +45,76 @@ class TranslationView(APIView):
             )
 
         try:
-            translator = Translator()
-            translation = translator.translate(text_to_translate, dest=target_language)
+            # Served from the translation cache when anyone has translated this text before
+            translation = await atranslate(text_to_translate, target_language)
             
             response_data = {
-                "original_text": translation.origin,
+                "original_text": translation.original,
                 "translated_text": translation.text,
-                "source_language": LANGUAGES.get(translation.src, translation.src),
-                "target_language": LANGUAGES.get(translation.dest, translation.dest)
+                "source_language": LANGUAGES.get(translation.source, translation.source),
+                "target_language": LANGUAGES.get(translation.target, translation.target)
             }
             return Response(response_data, status=status.HTTP_200_OK)
 
-        except Exception as e:
+        except TranslationError as e:
             return Response(
                 {"error": "Translation service failed.", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class BatchTranslationView(APIView):
+    """
+    API endpoint for translating many texts into one or more languages at once.
+    Requires authentication.
+    Accessible at: POST /api/utils/translate/batch/
+        {"texts": ["Hello", "Thank you"], "target_languages": ["ur", "ar"], "source_language": "en"}
+
+    Repeated texts are translated once, cached translations are served from the
+    cache, and the rest are translated concurrently. A failed item carries an
+    "error" instead of a translation; the rest of the batch is unaffected.
+    With `?background=true` the batch is queued instead: the response is a 202
+    with the job to poll, whose result holds the same "results".
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchTranslationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        texts = serializer.validated_data['texts']
+        targets = list(dict.fromkeys(serializer.validated_data['target_languages']))
+        source = serializer.validated_data.get('source_language', AUTO_DETECT)
+
+        if wants_background(request):
+            payload = {'texts': texts, 'targets': targets, 'source': source}
+            job, _ = enqueue('utils.batch_translation', payload, key=batch_job_key(request.user.pk, payload), user=request.user)
+            return job_accepted_response(request, job)
+
+        results = translate_batch(texts, targets, source)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class TranslationStatsView(APIView):
+    """
+    API endpoint for ADMINS to check how well the translation cache is working
+    in this worker process: hits per cache level, misses, coalesced requests
+    and upstream latency.
+    Accessible at: GET /api/utils/translate/stats/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_translation_stats(), status=status.HTTP_200_OK)
+
+
+class IntegrationStatsView(APIView):
+    """
+    API endpoint for ADMINS to see how the third-party services are behaving
+    from this worker process: circuit state, call latency, errors, retries
+    and calls turned away by the circuit breaker or the bulkhead.
+    Accessible at: GET /api/utils/integrations/stats/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_integration_stats(), status=status.HTTP_200_OK)
@@ -1,11 +1,16 @@
 from django.contrib import admin
-from .models import Vendor, Service
+from .models import Vendor, Service, PriceRule
 
 class ServiceInline(admin.TabularInline):
     """Allows editing services directly from the vendor's admin page."""
     model = Service
     extra = 1 # Show one extra blank form for a new service
 
+class PriceRuleInline(admin.TabularInline):
+    """Allows editing seasonal/weekday price rules from the service's admin page."""
+    model = PriceRule
+    extra = 1
+
 @admin.register(Vendor)
 class VendorAdmin(admin.ModelAdmin):
     """Admin view for Vendors."""
@@ -19,4 +24,5 @@ class ServiceAdmin(admin.ModelAdmin):
     """Admin view for Services."""
     list_display = ('name', 'vendor', 'service_type', 'city', 'price', 'is_available')
     list_filter = ('service_type', 'city', 'is_available')
-    search_fields = ('name', 'description', 'vendor__business_name')
\ No newline at end of file
+    search_fields = ('name', 'description', 'vendor__business_name')
+    inlines = [PriceRuleInline]
\ No newline at end of file
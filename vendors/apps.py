@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class VendorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vendors'
+
+    def ready(self):
+        # Connects the Booking signals that keep the dashboard rollups up to date
+        # and the Vendor signals that keep the vendor context cache fresh
+        from . import stats, context  # noqa: F401
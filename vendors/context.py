@@ -0,0 +1,120 @@
+# In vendors/context.py
+"""
+Request-scoped vendor identity.
+
+A vendor request used to look up `request.user.vendor_profile` in the permission
+check, the queryset, the serializer and perform_create. Instead, the vendor id
+and verification status are resolved once per request, from (in order):
+
+1. the verified-vendor cache, which Vendor saves (e.g. an admin approval) write to,
+2. the `vendor_id`/`vendor_verified` claims in the JWT access token, as long as
+   it was issued less than TOKEN_CLAIMS_MAX_AGE seconds ago
+   (see users/authentication.py),
+3. the database, as a last resort (the result is cached for a short time).
+
+Saves are only published to the cache for TOKEN_CLAIMS_MAX_AGE seconds too,
+which is as long as any token's claims can outrank the database. So with a
+per-process cache, a worker that didn't see a vendor being suspended stops
+trusting the old "verified" claim within that time.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.authentication import claims_max_age, token_claims_are_fresh
+
+from .models import Vendor
+
+VENDOR_ID_CLAIM = 'vendor_id'
+VENDOR_VERIFIED_CLAIM = 'vendor_verified'
+
+# How long a database lookup is trusted for
+VENDOR_CACHE_TIMEOUT = 60
+
+
+def _cache_key(user_id):
+    return f'vendors:context:{user_id}'
+
+
+class VendorContext:
+    """What a request needs to know about the current user's vendor profile."""
+    __slots__ = ('user_id', 'vendor_id', 'is_verified')
+
+    def __init__(self, user_id, vendor_id=None, is_verified=False):
+        self.user_id = user_id
+        self.vendor_id = vendor_id
+        self.is_verified = bool(vendor_id) and is_verified
+
+    @property
+    def is_vendor(self):
+        return self.vendor_id is not None
+
+    def as_vendor(self):
+        """
+        Returns a Vendor instance that can be assigned to foreign keys
+        without fetching the row.
+        """
+        vendor = Vendor(pk=self.vendor_id, user_id=self.user_id, is_verified=self.is_verified)
+        vendor._state.adding = False
+        return vendor
+
+    def as_claims(self):
+        return {VENDOR_ID_CLAIM: self.vendor_id, VENDOR_VERIFIED_CLAIM: self.is_verified}
+
+
+def load_vendor_context(user_id):
+    """Resolves the vendor context from the cache, or the database on a miss."""
+    cached = cache.get(_cache_key(user_id))
+    if cached is not None:
+        return VendorContext(user_id, *cached)
+    return _load_from_database(user_id)
+
+
+def _load_from_database(user_id):
+    row = Vendor.objects.filter(user_id=user_id).values_list('pk', 'is_verified').first()
+    context = VendorContext(user_id, *row) if row else VendorContext(user_id)
+    cache.set(_cache_key(user_id), (context.vendor_id, context.is_verified), VENDOR_CACHE_TIMEOUT)
+    return context
+
+
+def _context_from_claims(request):
+    token = getattr(request, 'auth', None)
+    if token is None or not hasattr(token, 'get'):
+        return None
+    # Only a positive claim is trusted: a vendor who has been approved since the
+    # token was issued still has `vendor_verified: false` in it.
+    if token.get(VENDOR_VERIFIED_CLAIM) and token.get(VENDOR_ID_CLAIM) and token_claims_are_fresh(token):
+        return VendorContext(request.user.pk, token[VENDOR_ID_CLAIM], True)
+    return None
+
+
+def get_vendor_context(request):
+    """Returns the VendorContext of the request's user, resolving it at most once per request."""
+    context = getattr(request, '_vendor_context', None)
+    if context is not None:
+        return context
+
+    user_id = request.user.pk
+    cached = cache.get(_cache_key(user_id))
+    if cached is not None:
+        context = VendorContext(user_id, *cached)
+    else:
+        # The cache has just been checked: go straight to the database
+        context = _context_from_claims(request) or _load_from_database(user_id)
+
+    request._vendor_context = context
+    return context
+
+
+@receiver(post_save, sender=Vendor)
+def refresh_vendor_cache(sender, instance, **kwargs):
+    """
+    Publishes a vendor's new status (e.g. after VendorAdminViewSet.approve).
+    It is kept for as long as claims are trusted, so it outranks the claims of
+    any token issued before the change.
+    """
+    cache.set(_cache_key(instance.user_id), (instance.pk, instance.is_verified), claims_max_age())
+
+
+@receiver(post_delete, sender=Vendor)
+def clear_vendor_cache(sender, instance, **kwargs):
+    cache.set(_cache_key(instance.user_id), (None, False), claims_max_age())
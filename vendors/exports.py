@@ -0,0 +1,37 @@
+# In vendors/exports.py
+"""Column definitions for the streaming vendor/booking exports (see utils/export.py)."""
+from utils.export import ExportColumn
+
+BOOKING_EXPORT_COLUMNS = [
+    ExportColumn('id'),
+    ExportColumn('booking_date'),
+    ExportColumn('service_id'),
+    ExportColumn('service_name', 'service__name'),
+    ExportColumn('tourist', 'user__username'),
+    ExportColumn('service_start_date'),
+    ExportColumn('service_end_date'),
+    ExportColumn('guests'),
+    ExportColumn('hours'),
+    ExportColumn('status'),
+    ExportColumn('total_price'),
+]
+
+SERVICE_EXPORT_COLUMNS = [
+    ExportColumn('id'),
+    ExportColumn('vendor_id'),
+    ExportColumn('name'),
+    ExportColumn('service_type'),
+    ExportColumn('city'),
+    ExportColumn('price'),
+    ExportColumn('price_per'),
+    ExportColumn('is_available'),
+]
+
+VENDOR_EXPORT_COLUMNS = [
+    ExportColumn('id'),
+    ExportColumn('username', 'user__username'),
+    ExportColumn('business_name'),
+    ExportColumn('contact_phone'),
+    ExportColumn('is_verified'),
+    ExportColumn('created_at'),
+]
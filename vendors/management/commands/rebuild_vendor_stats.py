@@ -0,0 +1,15 @@
+# In vendors/management/commands/rebuild_vendor_stats.py
+from django.core.management.base import BaseCommand
+
+from vendors.stats import rebuild_vendor_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the vendor dashboard rollups (VendorDailyStats) from the bookings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, help="Only rebuild the rollups of this vendor id.")
+
+    def handle(self, *args, **options):
+        rows = rebuild_vendor_stats(vendor_id=options.get('vendor'))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} vendor stats rows."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0002_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='guests',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='hours',
+            field=models.PositiveIntegerField(blank=True, help_text='For services priced per hour', null=True),
+        ),
+        migrations.CreateModel(
+            name='PriceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField(blank=True, help_text='First day of the season (inclusive).', null=True)),
+                ('end_date', models.DateField(blank=True, help_text='Last day of the season (inclusive).', null=True)),
+                ('weekdays', models.CharField(blank=True, help_text='Comma-separated weekdays the rule applies to (0=Monday ... 6=Sunday). Empty means every day.', max_length=20)),
+                ('multiplier', models.DecimalField(decimal_places=2, help_text='e.g. 1.25 for +25%, 0.90 for -10%', max_digits=5)),
+                ('is_active', models.BooleanField(default=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rules', to='vendors.service')),
+            ],
+        ),
+    ]
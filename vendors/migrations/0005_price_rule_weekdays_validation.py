@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:10
+
+import vendors.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendors', '0004_vendor_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pricerule',
+            name='weekdays',
+            field=models.CharField(blank=True, help_text='Comma-separated weekdays the rule applies to (0=Monday ... 6=Sunday). Empty means every day.', max_length=20, validators=[vendors.models.validate_weekdays]),
+        ),
+    ]
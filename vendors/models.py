@@ -1,7 +1,21 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from utils.models import DirtyFieldsMixin
 
-class Vendor(models.Model):
+WEEKDAY_NUMBERS = {str(day) for day in range(7)}
+
+def validate_weekdays(value):
+    """Rejects anything but comma-separated weekday numbers (0=Monday ... 6=Sunday)."""
+    days = [day.strip() for day in value.split(',') if day.strip()]
+    invalid = [day for day in days if day not in WEEKDAY_NUMBERS]
+    if invalid:
+        raise ValidationError(
+            "Weekdays must be numbers from 0 (Monday) to 6 (Sunday), separated by commas. Not valid: %(days)s",
+            code='invalid_weekdays', params={'days': ', '.join(invalid)},
+        )
+
+class Vendor(DirtyFieldsMixin, models.Model):
     """
     Represents a local business or service provider.
     Each vendor is linked to a standard User account.
@@ -18,7 +32,7 @@ class Vendor(models.Model):
     def __str__(self):
         return self.business_name
 
-class Service(models.Model):
+class Service(DirtyFieldsMixin, models.Model):
     """
     Represents a specific service offered by a vendor (e.g., a hotel room, a guided tour).
     """
@@ -40,8 +54,37 @@ class Service(models.Model):
 
     def __str__(self):
         return f"{self.name} by {self.vendor.business_name}"
-    
-class Booking(models.Model):
+
+class PriceRule(models.Model):
+    """
+    A seasonal and/or weekday price adjustment for a service.
+    Every active rule that matches a date multiplies the base price for that date,
+    so a "summer season" rule and a "weekend" rule can be combined.
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='price_rules')
+    name = models.CharField(max_length=100)
+    # Leave both dates empty for a rule that applies all year round
+    start_date = models.DateField(null=True, blank=True, help_text="First day of the season (inclusive).")
+    end_date = models.DateField(null=True, blank=True, help_text="Last day of the season (inclusive).")
+    weekdays = models.CharField(
+        max_length=20,
+        blank=True,
+        validators=[validate_weekdays],
+        help_text="Comma-separated weekdays the rule applies to (0=Monday ... 6=Sunday). Empty means every day."
+    )
+    multiplier = models.DecimalField(max_digits=5, decimal_places=2, help_text="e.g. 1.25 for +25%, 0.90 for -10%")
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} (x{self.multiplier}) for {self.service.name}"
+
+    def get_weekdays(self):
+        """Returns the set of weekday numbers this rule applies to."""
+        if not self.weekdays:
+            return set(range(7))
+        return {int(day) for day in self.weekdays.split(',') if day.strip()}
+
+class Booking(DirtyFieldsMixin, models.Model):
     """
     Represents a booking made by a user for a specific service.
     """
@@ -60,6 +103,9 @@ class Booking(models.Model):
     # The date the service is for (e.g., hotel check-in date)
     service_start_date = models.DateField()
     service_end_date = models.DateField(null=True, blank=True, help_text="For multi-day services like hotels")
+    # Party size and duration, used to price "per person" and "per hour" services
+    guests = models.PositiveIntegerField(default=1)
+    hours = models.PositiveIntegerField(null=True, blank=True, help_text="For services priced per hour")
     
     status = models.CharField(
         max_length=20,
@@ -73,3 +119,30 @@ class Booking(models.Model):
 
     def __str__(self):
         return f"Booking by {self.user.username} for {self.service.name} on {self.service_start_date}"
+
+class VendorDailyStats(models.Model):
+    """
+    Rollup of a service's bookings for one day (the booking's service_start_date).
+    Kept up to date incrementally by the Booking signals in vendors/stats.py,
+    so the vendor dashboard never has to scan the bookings table.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='daily_stats')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+
+    pending_count = models.PositiveIntegerField(default=0)
+    confirmed_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    # Only CONFIRMED and COMPLETED bookings count towards revenue
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('service', 'day')
+        indexes = [
+            models.Index(fields=['vendor', 'day']),
+        ]
+        verbose_name_plural = "Vendor daily stats"
+
+    def __str__(self):
+        return f"Stats for {self.service_id} on {self.day}"
@@ -0,0 +1,187 @@
+# In vendors/pricing.py
+"""
+The pricing engine used to quote and book services.
+
+A service's `price_per` text ("per night", "per person", "per hour", ...) decides
+what the base price is multiplied by, and its active `PriceRule`s adjust the price
+for particular seasons and weekdays.
+
+Date spans are never walked day by day. The span is cut into segments at the
+season boundaries of the rules, and each segment is priced with a 7-slot weekday
+count, so a 3-night stay and a 300-night stay cost the same amount of work.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from .models import Service, PriceRule
+
+CENTS = Decimal('0.01')
+
+
+class PriceUnit:
+    NIGHT = 'night'
+    DAY = 'day'
+    PERSON = 'person'
+    HOUR = 'hour'
+    FLAT = 'flat'
+
+
+class QuoteError(Exception):
+    """Raised when a service cannot be quoted for the requested dates/party."""
+    pass
+
+
+def parse_price_per(price_per):
+    """
+    Maps the free-text `Service.price_per` field onto a pricing unit.
+    Anything we don't recognise (e.g. "per trip", "per group") is a flat price.
+    """
+    text = (price_per or '').lower()
+    if 'night' in text:
+        return PriceUnit.NIGHT
+    if 'day' in text:
+        return PriceUnit.DAY
+    if 'hour' in text:
+        return PriceUnit.HOUR
+    if 'person' in text or 'head' in text or 'pax' in text:
+        return PriceUnit.PERSON
+    return PriceUnit.FLAT
+
+
+def _weekday_counts(start, days):
+    """Returns how many of the `days` consecutive dates from `start` fall on each weekday."""
+    full_weeks, remainder = divmod(days, 7)
+    counts = [full_weeks] * 7
+    first = start.weekday()
+    for offset in range(remainder):
+        counts[(first + offset) % 7] += 1
+    return counts
+
+
+def _rule_covers(rule, day):
+    if rule.start_date and day < rule.start_date:
+        return False
+    if rule.end_date and day > rule.end_date:
+        return False
+    return True
+
+
+def _priced_days(start, days, rules):
+    """
+    Returns the sum of the price multipliers over `days` consecutive dates from `start`.
+    With no rules this is simply `days`.
+    """
+    if not rules:
+        return Decimal(days)
+
+    end = start + timedelta(days=days)
+    # Split the span wherever a season starts or ends. Inside a segment the set of
+    # seasonal rules in effect is constant, so only the weekday varies.
+    boundaries = {start, end}
+    for rule in rules:
+        if rule.start_date and start < rule.start_date < end:
+            boundaries.add(rule.start_date)
+        if rule.end_date and start <= rule.end_date < end - timedelta(days=1):
+            boundaries.add(rule.end_date + timedelta(days=1))
+    boundaries = sorted(boundaries)
+
+    rule_weekdays = [(rule, rule.get_weekdays()) for rule in rules]
+    total = Decimal(0)
+    for segment_start, segment_end in zip(boundaries, boundaries[1:]):
+        in_season = [(rule, weekdays) for rule, weekdays in rule_weekdays if _rule_covers(rule, segment_start)]
+        counts = _weekday_counts(segment_start, (segment_end - segment_start).days)
+        for weekday, count in enumerate(counts):
+            if not count:
+                continue
+            multiplier = Decimal(1)
+            for rule, weekdays in in_season:
+                if weekday in weekdays:
+                    multiplier *= rule.multiplier
+            total += multiplier * count
+    return total
+
+
+def quote_service(service, start_date, end_date=None, guests=1, hours=None, rules=None):
+    """
+    Works out the total price of `service` for the given dates and party.
+    `rules` can be passed in to avoid a query when quoting many services at once.
+
+    Returns a dict describing the quote, or raises QuoteError.
+    """
+    if not service.is_available:
+        raise QuoteError("This service is currently unavailable.")
+    if end_date and end_date < start_date:
+        raise QuoteError("service_end_date cannot be before service_start_date.")
+    if guests < 1:
+        raise QuoteError("guests must be at least 1.")
+
+    if rules is None:
+        rules = list(service.price_rules.filter(is_active=True))
+
+    unit = parse_price_per(service.price_per)
+    end_date = end_date or start_date
+
+    if unit == PriceUnit.NIGHT:
+        # A same-day check-out is still charged as one night
+        quantity = max((end_date - start_date).days, 1)
+        priced = _priced_days(start_date, quantity, rules)
+    elif unit == PriceUnit.DAY:
+        quantity = (end_date - start_date).days + 1
+        priced = _priced_days(start_date, quantity, rules)
+    else:
+        # Per-person, per-hour and flat prices are charged at the start date's rate
+        if unit == PriceUnit.PERSON:
+            quantity = guests
+        elif unit == PriceUnit.HOUR:
+            if not hours:
+                raise QuoteError("hours is required for services priced per hour.")
+            quantity = hours
+        else:
+            quantity = 1
+        priced = _priced_days(start_date, 1, rules) * quantity
+
+    total = (service.price * priced).quantize(CENTS, rounding=ROUND_HALF_UP)
+    return {
+        'service_id': service.pk,
+        'unit': unit,
+        'quantity': quantity,
+        'unit_price': service.price,
+        'total_price': total,
+    }
+
+
+def quote_many(items):
+    """
+    Quotes a batch of requests in two queries (services and their rules),
+    however many items there are.
+
+    `items` is a list of dicts with `service_id`, `start_date` and optional
+    `end_date`, `guests` and `hours`. Returns one result per item, in order;
+    failed items carry an `error` instead of a price.
+    """
+    service_ids = {item['service_id'] for item in items}
+    services = Service.objects.in_bulk(service_ids)
+
+    rules_by_service = defaultdict(list)
+    for rule in PriceRule.objects.filter(service_id__in=service_ids, is_active=True):
+        rules_by_service[rule.service_id].append(rule)
+
+    results = []
+    for item in items:
+        service = services.get(item['service_id'])
+        if service is None:
+            results.append({'service_id': item['service_id'], 'error': "Service not found."})
+            continue
+        try:
+            results.append(quote_service(
+                service,
+                item['start_date'],
+                item.get('end_date'),
+                guests=item.get('guests') or 1,
+                hours=item.get('hours'),
+                rules=rules_by_service[service.pk],
+            ))
+        except QuoteError as e:
+            results.append({'service_id': service.pk, 'error': str(e)})
+    return results
@@ -1,9 +1,12 @@
 # In vendors/serializers.py
 
 from rest_framework import serializers
+from utils.serializers import SparseFieldsetMixin
 from .models import Vendor, Service, Booking
+from .pricing import quote_service, QuoteError
+from .context import get_vendor_context
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for vendor registration and viewing."""
     # To show the user's username in read-only mode
     user_username = serializers.CharField(source='user.username', read_only=True)
@@ -14,7 +17,7 @@ class VendorSerializer(serializers.ModelSerializer):
         # The 'user' field will be set automatically from the request, not sent by the user.
         read_only_fields = ['user', 'is_verified']
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for managing services."""
     vendor = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
@@ -27,7 +30,17 @@ class ServiceSerializer(serializers.ModelSerializer):
         """
         On validation, 'value' is the user. We need to get the vendor profile.
         This also checks if the user is a verified vendor.
+        Inside a request the vendor context already knows both, so no query is made.
         """
+        request = self.context.get('request')
+        if request is not None:
+            context = get_vendor_context(request)
+            if not context.is_vendor:
+                raise serializers.ValidationError("You do not have a vendor account. Please apply to become a vendor first.")
+            if not context.is_verified:
+                raise serializers.ValidationError("Your vendor account is not verified yet. Please wait for admin approval.")
+            return context.as_vendor()
+
         try:
             vendor = value.vendor_profile
             if not vendor.is_verified:
@@ -37,13 +50,22 @@ class ServiceSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You do not have a vendor account. Please apply to become a vendor first.")
         
 
-class BookingSerializer(serializers.ModelSerializer):
+class ServiceSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact service representation used when services are nested in lists."""
+
+    class Meta:
+        model = Service
+        fields = ['id', 'name', 'service_type', 'city', 'price', 'price_per']
+
+
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for tourists to create and view their bookings.
     """
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    # To show service details in the response, not just the ID
-    service = ServiceSerializer(read_only=True)
+    # To show service details in the response, not just the ID.
+    # Lists get the compact summary; ?expand=service gives the full service.
+    service = ServiceSummarySerializer(read_only=True)
     # To accept a service ID when creating a booking
     service_id = serializers.IntegerField(write_only=True)
 
@@ -51,24 +73,69 @@ class BookingSerializer(serializers.ModelSerializer):
         model = Booking
         fields = [
             'id', 'user', 'service', 'service_id', 'booking_date', 
-            'service_start_date', 'service_end_date', 'status', 'total_price'
+            'service_start_date', 'service_end_date', 'guests', 'hours', 'status', 'total_price'
         ]
         read_only_fields = ['status', 'total_price', 'booking_date']
+        expandable_fields = {'service': ServiceSerializer}
+
+    def validate(self, attrs):
+        end_date = attrs.get('service_end_date')
+        if end_date and end_date < attrs['service_start_date']:
+            raise serializers.ValidationError({"service_end_date": "End date cannot be before the start date."})
+        return attrs
 
     def create(self, validated_data):
         # We pop the service_id because the model field is 'service'
         service_id = validated_data.pop('service_id')
-        service = Service.objects.get(pk=service_id)
-        
-        # Here you would typically calculate the total_price.
-        # For now, we'll just use the service's base price.
-        # A real implementation would consider dates, quantity etc.
-        total_price = service.price
+        try:
+            service = Service.objects.get(pk=service_id)
+        except Service.DoesNotExist:
+            raise serializers.ValidationError({"service_id": "Service not found."})
+
+        # The total is worked out by the pricing engine from the dates, the party
+        # size and the service's price_per unit and seasonal/weekday rules.
+        try:
+            quote = quote_service(
+                service,
+                validated_data['service_start_date'],
+                validated_data.get('service_end_date'),
+                guests=validated_data.get('guests', 1),
+                hours=validated_data.get('hours'),
+            )
+        except QuoteError as e:
+            raise serializers.ValidationError({"service_id": str(e)})
 
         # Create the booking instance
         booking = Booking.objects.create(
             service=service,
-            total_price=total_price,
+            total_price=quote['total_price'],
             **validated_data
         )
         return booking
+
+
+class QuoteItemSerializer(serializers.Serializer):
+    """A single (service, date range, party) combination to be priced."""
+    service_id = serializers.IntegerField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False, allow_null=True)
+    guests = serializers.IntegerField(required=False, min_value=1)
+    hours = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """
+    Serializer for the batch quote endpoint.
+    A top-level `guests` value is used for every item that doesn't set its own.
+    """
+    MAX_ITEMS = 200
+
+    guests = serializers.IntegerField(required=False, min_value=1, default=1)
+    items = QuoteItemSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item is required.")
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} items can be quoted at once.")
+        return value
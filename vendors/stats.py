@@ -0,0 +1,166 @@
+# In vendors/stats.py
+"""
+Incrementally maintained booking statistics for the vendor dashboard.
+
+Every Booking save/delete applies a small +1/-1 delta to the VendorDailyStats row
+for its (service, service_start_date), so reading a vendor's dashboard costs one
+row per service per day in the range, whatever the booking volume.
+`python manage.py rebuild_vendor_stats` recomputes the table from scratch.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Booking, VendorDailyStats
+
+STATUS_COUNT_FIELDS = {
+    Booking.BookingStatus.PENDING: 'pending_count',
+    Booking.BookingStatus.CONFIRMED: 'confirmed_count',
+    Booking.BookingStatus.CANCELLED: 'cancelled_count',
+    Booking.BookingStatus.COMPLETED: 'completed_count',
+}
+REVENUE_STATUSES = (Booking.BookingStatus.CONFIRMED, Booking.BookingStatus.COMPLETED)
+
+
+def _contribution(service_id, day, booking_status, total_price):
+    """Describes what a single booking adds to the rollup table."""
+    revenue = total_price if booking_status in REVENUE_STATUSES else Decimal(0)
+    return (service_id, day, STATUS_COUNT_FIELDS[booking_status], revenue)
+
+
+def _apply(contribution, vendor_id, sign):
+    service_id, day, count_field, revenue = contribution
+    updates = {count_field: F(count_field) + sign, 'revenue': F('revenue') + sign * revenue}
+
+    rows = VendorDailyStats.objects.filter(service_id=service_id, day=day).update(**updates)
+    if rows or sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            VendorDailyStats.objects.create(
+                vendor_id=vendor_id, service_id=service_id, day=day,
+                **{count_field: 1, 'revenue': revenue}
+            )
+    except IntegrityError:
+        # Another request created the row first; add to it instead
+        VendorDailyStats.objects.filter(service_id=service_id, day=day).update(**updates)
+
+
+def _vendor_id_for(booking):
+    return booking.service.vendor_id
+
+
+CONTRIBUTION_FIELDS = ('service_id', 'service_start_date', 'status', 'total_price')
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_booking_state(sender, instance, **kwargs):
+    """
+    Stores what the booking contributed before this save, so the delta can be
+    applied. Read from the row rather than the instance's remembered values
+    (DirtyFieldsMixin): the instance may be stale if another request has
+    changed the booking since it was loaded.
+    """
+    instance._stats_previous = None
+    if instance.pk:
+        previous = Booking.objects.filter(pk=instance.pk).values_list(*CONTRIBUTION_FIELDS).first()
+        if previous:
+            instance._stats_previous = _contribution(*previous)
+
+
+@receiver(post_save, sender=Booking)
+def update_stats_on_booking_save(sender, instance, created, **kwargs):
+    current = _contribution(instance.service_id, instance.service_start_date, instance.status, instance.total_price)
+    previous = getattr(instance, '_stats_previous', None)
+    if previous == current:
+        return
+
+    vendor_id = _vendor_id_for(instance)
+    if previous:
+        _apply(previous, vendor_id, -1)
+    _apply(current, vendor_id, +1)
+
+
+@receiver(post_delete, sender=Booking)
+def update_stats_on_booking_delete(sender, instance, **kwargs):
+    current = _contribution(instance.service_id, instance.service_start_date, instance.status, instance.total_price)
+    _apply(current, None, -1)
+
+
+def rebuild_vendor_stats(vendor_id=None):
+    """
+    Recomputes the rollup table from the bookings table with one aggregate query.
+    Returns the number of rollup rows written.
+    """
+    bookings = Booking.objects.all()
+    existing = VendorDailyStats.objects.all()
+    if vendor_id is not None:
+        bookings = bookings.filter(service__vendor_id=vendor_id)
+        existing = existing.filter(vendor_id=vendor_id)
+
+    aggregates = (
+        bookings
+        .values('service_id', 'service__vendor_id', 'service_start_date')
+        .annotate(
+            pending_count=Count('id', filter=Q(status=Booking.BookingStatus.PENDING)),
+            confirmed_count=Count('id', filter=Q(status=Booking.BookingStatus.CONFIRMED)),
+            cancelled_count=Count('id', filter=Q(status=Booking.BookingStatus.CANCELLED)),
+            completed_count=Count('id', filter=Q(status=Booking.BookingStatus.COMPLETED)),
+            revenue=Sum('total_price', filter=Q(status__in=REVENUE_STATUSES), default=Decimal(0)),
+        )
+        .order_by()
+    )
+    rows = [
+        VendorDailyStats(
+            vendor_id=row['service__vendor_id'],
+            service_id=row['service_id'],
+            day=row['service_start_date'],
+            pending_count=row['pending_count'],
+            confirmed_count=row['confirmed_count'],
+            cancelled_count=row['cancelled_count'],
+            completed_count=row['completed_count'],
+            revenue=row['revenue'],
+        )
+        for row in aggregates.iterator()
+    ]
+    with transaction.atomic():
+        existing.delete()
+        VendorDailyStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def get_vendor_dashboard(vendor_id, start, end):
+    """
+    Builds the vendor dashboard for the inclusive [start, end] day range from the
+    rollup table: overall totals, a per-day series and a per-service breakdown.
+    """
+    stats = VendorDailyStats.objects.filter(vendor_id=vendor_id, day__range=(start, end)).order_by()
+    sums = {
+        'pending': Sum('pending_count'),
+        'confirmed': Sum('confirmed_count'),
+        'cancelled': Sum('cancelled_count'),
+        'completed': Sum('completed_count'),
+        'revenue': Sum('revenue'),
+    }
+
+    by_day = list(stats.values('day').annotate(**sums).order_by('day'))
+    by_service = list(
+        stats.values('service_id', service_name=F('service__name')).annotate(**sums).order_by('service_id')
+    )
+
+    totals = {key: 0 for key in sums}
+    totals['revenue'] = Decimal(0)
+    for row in by_day:
+        for key in sums:
+            totals[key] += row[key]
+
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'by_day': by_day,
+        'by_service': by_service,
+    }
@@ -1,3 +1,417 @@
-from django.test import TestCase
+# In vendors/tests.py
 
-# Create your tests here.
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.forms import modelform_factory
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.tokens import TouristaRefreshToken
+
+from . import context as context_module
+from .models import Vendor, Service, PriceRule, Booking, VendorDailyStats
+from .pricing import quote_service, parse_price_per, PriceUnit, QuoteError
+
+
+def make_service(price='100.00', price_per='per night', **kwargs):
+    """Creates a verified vendor with a single service."""
+    user = User.objects.create_user(username=kwargs.pop('username', 'vendoruser'), password='StrongPassword123')
+    vendor = Vendor.objects.create(user=user, business_name='Deosai Camps', contact_phone='0300', is_verified=True)
+    return Service.objects.create(
+        vendor=vendor, name='Lakeside Room', description='A room', service_type=Service.ServiceType.HOTEL,
+        price=Decimal(price), price_per=price_per, city='Skardu', **kwargs
+    )
+
+
+class PricingEngineTest(TestCase):
+    """
+    Test suite for the pricing engine in vendors.pricing.
+    """
+
+    def test_price_per_is_mapped_to_a_unit(self):
+        self.assertEqual(parse_price_per('per night'), PriceUnit.NIGHT)
+        self.assertEqual(parse_price_per('Per Person'), PriceUnit.PERSON)
+        self.assertEqual(parse_price_per('per hour'), PriceUnit.HOUR)
+        self.assertEqual(parse_price_per('per trip'), PriceUnit.FLAT)
+
+    def test_nightly_price_is_multiplied_by_nights(self):
+        service = make_service()
+        quote = quote_service(service, date(2025, 7, 1), date(2025, 7, 4))
+        self.assertEqual(quote['quantity'], 3)
+        self.assertEqual(quote['total_price'], Decimal('300.00'))
+
+    def test_per_person_price_uses_party_size(self):
+        service = make_service(price='25.00', price_per='per person')
+        quote = quote_service(service, date(2025, 7, 1), guests=4)
+        self.assertEqual(quote['total_price'], Decimal('100.00'))
+
+    def test_per_hour_requires_hours(self):
+        service = make_service(price='10.00', price_per='per hour')
+        with self.assertRaises(QuoteError):
+            quote_service(service, date(2025, 7, 1))
+        self.assertEqual(quote_service(service, date(2025, 7, 1), hours=3)['total_price'], Decimal('30.00'))
+
+    def test_weekend_and_season_rules_are_combined(self):
+        service = make_service()
+        # Fri + Sat nights are 50% more expensive
+        PriceRule.objects.create(service=service, name='Weekend', weekdays='4,5', multiplier=Decimal('1.50'))
+        # 10% off from 3rd July onwards
+        PriceRule.objects.create(service=service, name='Off season', start_date=date(2025, 7, 3), multiplier=Decimal('0.90'))
+
+        # 2025-07-01 is a Tuesday. Nights: Tue, Wed, Thu(off), Fri(off, weekend), Sat(off, weekend)
+        quote = quote_service(service, date(2025, 7, 1), date(2025, 7, 6))
+        expected = Decimal('100') * (1 + 1 + Decimal('0.9') + Decimal('1.35') + Decimal('1.35'))
+        self.assertEqual(quote['total_price'], expected.quantize(Decimal('0.01')))
+
+    def test_price_rule_weekdays_are_validated(self):
+        service = make_service()
+        for weekdays in ('', '0', '4, 5,6'):
+            PriceRule(service=service, name='Rule', weekdays=weekdays, multiplier=Decimal('1.10')).full_clean()
+        for weekdays in ('mon', '7', '1;2', '-1', '1.5'):
+            with self.assertRaises(ValidationError):
+                PriceRule(service=service, name='Rule', weekdays=weekdays, multiplier=Decimal('1.10')).full_clean()
+
+        # The admin's inline form rejects the rule instead of saving a value pricing would choke on
+        form = modelform_factory(PriceRule, fields=['name', 'weekdays', 'multiplier'])(
+            {'name': 'Weekend', 'weekdays': 'fri,sat', 'multiplier': '1.50'}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('weekdays', form.errors)
+
+    def test_long_span_matches_day_by_day_total(self):
+        service = make_service()
+        PriceRule.objects.create(service=service, name='Weekend', weekdays='5,6', multiplier=Decimal('1.20'))
+        PriceRule.objects.create(
+            service=service, name='Summer', start_date=date(2025, 6, 1), end_date=date(2025, 8, 31),
+            multiplier=Decimal('1.10')
+        )
+        start, end = date(2025, 5, 20), date(2025, 9, 15)
+        quote = quote_service(service, start, end)
+
+        expected = Decimal(0)
+        day = start
+        while day < end:
+            multiplier = Decimal(1)
+            if day.weekday() in (5, 6):
+                multiplier *= Decimal('1.20')
+            if date(2025, 6, 1) <= day <= date(2025, 8, 31):
+                multiplier *= Decimal('1.10')
+            expected += 100 * multiplier
+            day = day.fromordinal(day.toordinal() + 1)
+        self.assertEqual(quote['total_price'], expected.quantize(Decimal('0.01')))
+
+
+class BookingAndQuoteAPITest(APITestCase):
+    """
+    Test suite for booking creation and the batch quote endpoint.
+    """
+
+    def setUp(self):
+        self.service = make_service()
+        self.tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.client.force_authenticate(self.tourist)
+
+    def test_booking_total_price_uses_the_date_range(self):
+        # 'tourist-booking-list' is registered twice, so reverse() points at the shadowed route
+        url = '/api/vendors/bookings/'
+        data = {'service_id': self.service.id, 'service_start_date': '2025-07-01', 'service_end_date': '2025-07-03'}
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.get().total_price, Decimal('200.00'))
+
+    def test_batch_quote_prices_many_services(self):
+        other = make_service(price='30.00', price_per='per person', username='othervendor')
+        data = {
+            'guests': 2,
+            'items': [
+                {'service_id': self.service.id, 'start_date': '2025-07-01', 'end_date': '2025-07-02'},
+                {'service_id': other.id, 'start_date': '2025-07-01'},
+                {'service_id': 9999, 'start_date': '2025-07-01'},
+            ]
+        }
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('service-quotes'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quotes = response.data['quotes']
+        self.assertEqual(quotes[0]['total_price'], Decimal('100.00'))
+        self.assertEqual(quotes[1]['total_price'], Decimal('60.00'))
+        self.assertIn('error', quotes[2])
+
+
+class VendorStatsTest(APITestCase):
+    """
+    Test suite for the incrementally maintained vendor dashboard rollups.
+    """
+
+    def setUp(self):
+        self.service = make_service()
+        self.tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+
+    def book(self, day, price='100.00', booking_status=Booking.BookingStatus.PENDING):
+        return Booking.objects.create(
+            user=self.tourist, service=self.service, service_start_date=day,
+            total_price=Decimal(price), status=booking_status
+        )
+
+    def test_rollups_follow_status_changes_and_deletes(self):
+        booking = self.book(date(2025, 7, 1))
+        self.book(date(2025, 7, 1), booking_status=Booking.BookingStatus.CONFIRMED)
+
+        stats = VendorDailyStats.objects.get(service=self.service, day=date(2025, 7, 1))
+        self.assertEqual((stats.pending_count, stats.confirmed_count, stats.revenue), (1, 1, Decimal('100.00')))
+
+        booking.status = Booking.BookingStatus.COMPLETED
+        booking.save()
+        stats.refresh_from_db()
+        self.assertEqual((stats.pending_count, stats.completed_count, stats.revenue), (0, 1, Decimal('200.00')))
+
+        booking.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.completed_count, stats.revenue), (0, Decimal('100.00')))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.book(date(2025, 7, 1), booking_status=Booking.BookingStatus.CONFIRMED)
+        self.book(date(2025, 7, 2), price='50.00', booking_status=Booking.BookingStatus.CANCELLED)
+        incremental = list(VendorDailyStats.objects.order_by('day').values_list(
+            'day', 'pending_count', 'confirmed_count', 'cancelled_count', 'completed_count', 'revenue'))
+
+        call_command('rebuild_vendor_stats', stdout=StringIO())
+        rebuilt = list(VendorDailyStats.objects.order_by('day').values_list(
+            'day', 'pending_count', 'confirmed_count', 'cancelled_count', 'completed_count', 'revenue'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_dashboard_endpoint_reads_the_rollups(self):
+        self.book(date(2025, 7, 1), booking_status=Booking.BookingStatus.CONFIRMED)
+        self.book(date(2025, 7, 3), booking_status=Booking.BookingStatus.PENDING)
+        self.book(date(2025, 8, 1), booking_status=Booking.BookingStatus.CONFIRMED)
+
+        self.client.force_authenticate(self.service.vendor.user)
+        response = self.client.get(reverse('vendor-stats'), {'start': '2025-07-01', 'end': '2025-07-31'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['confirmed'], 1)
+        self.assertEqual(response.data['totals']['pending'], 1)
+        self.assertEqual(response.data['totals']['revenue'], Decimal('100.00'))
+        self.assertEqual(len(response.data['by_day']), 2)
+
+    def test_malformed_dates_are_rejected(self):
+        self.client.force_authenticate(self.service.vendor.user)
+        for params in ({'start': 'yesterday'}, {'end': '2025-13-01'}, {'start': '2025-07-01', 'end': '07/31/2025'}):
+            response = self.client.get(reverse('vendor-stats'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+        # Empty values still mean the default range
+        self.assertEqual(self.client.get(reverse('vendor-stats'), {'start': ''}).status_code, status.HTTP_200_OK)
+
+
+class DirtyFieldsTest(APITestCase):
+    """
+    Test suite for DirtyFieldsMixin (utils/models.py) on the vendor models.
+    """
+
+    def setUp(self):
+        self.service = make_service()
+        self.tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        self.booking = Booking.objects.create(
+            user=self.tourist, service=self.service, service_start_date=date(2025, 7, 1), total_price=Decimal('100.00')
+        )
+
+    def test_only_changed_columns_are_written(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.status = Booking.BookingStatus.CONFIRMED
+        with CaptureQueriesContext(connection) as queries:
+            booking.save()
+
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE "vendors_booking"'))
+        self.assertEqual(update.split(' WHERE ')[0], 'UPDATE "vendors_booking" SET "status" = \'CONFIRMED\'')
+        stats = VendorDailyStats.objects.get(service=self.service, day=date(2025, 7, 1))
+        self.assertEqual((stats.pending_count, stats.confirmed_count), (0, 1))
+
+    def test_unchanged_instances_are_not_saved(self):
+        vendor = Vendor.objects.get(pk=self.service.vendor_id)
+        with self.assertNumQueries(0):
+            vendor.save()
+        vendor.business_name = 'Deosai Camps'
+        with self.assertNumQueries(0):
+            vendor.save()
+
+    def test_refresh_from_db_resets_the_remembered_values(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        other = Booking.objects.get(pk=self.booking.pk)
+        other.status = Booking.BookingStatus.CONFIRMED
+        other.save()
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.get_dirty_fields(), [])
+        booking.status = Booking.BookingStatus.CANCELLED
+        booking.save()
+        stats = VendorDailyStats.objects.get(service=self.service, day=date(2025, 7, 1))
+        self.assertEqual((stats.pending_count, stats.confirmed_count, stats.cancelled_count), (0, 0, 1))
+
+    def test_saving_a_stale_instance_keeps_the_rollups_right(self):
+        # Two requests editing the same booking
+        stale = Booking.objects.get(pk=self.booking.pk)
+        other = Booking.objects.get(pk=self.booking.pk)
+        other.status = Booking.BookingStatus.CONFIRMED
+        other.save()
+
+        stale.status = Booking.BookingStatus.CANCELLED
+        stale.save()
+        stats = VendorDailyStats.objects.get(service=self.service, day=date(2025, 7, 1))
+        self.assertEqual((stats.pending_count, stats.confirmed_count, stats.cancelled_count), (0, 0, 1))
+
+    def test_dirty_fields_compare_values(self):
+        self.booking.total_price = Decimal('100.00')
+        self.assertEqual(self.booking.get_dirty_fields(), [])
+        self.booking.total_price = Decimal('120.00')
+        self.assertEqual(self.booking.get_dirty_fields(), ['total_price'])
+
+
+class VendorQueryCountTest(APITestCase):
+    """
+    Vendor endpoints resolve the user and the vendor from the token claims, so
+    each request only costs the queries that do the actual work.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.service = make_service()
+        self.vendor = self.service.vendor
+        tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        Booking.objects.create(
+            user=tourist, service=self.service, service_start_date=date(2025, 7, 1), total_price=Decimal('100.00')
+        )
+        self.login()
+
+    def login(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'vendoruser', 'password': 'StrongPassword123'}, format='json'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        cache.clear()
+        return response
+
+    def test_list_services(self):
+        with self.assertNumQueries(1):  # services
+            response = self.client.get(reverse('vendor-service-list'))
+        self.assertEqual(len(response.data), 1)
+
+    def test_create_service(self):
+        data = {'name': 'Jeep to Deosai', 'description': 'Day trip', 'service_type': 'TRANSPORT',
+                'price': '80.00', 'price_per': 'per trip', 'city': 'Skardu'}
+        with self.assertNumQueries(1):  # insert
+            response = self.client.post(reverse('vendor-service-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Service.objects.filter(name='Jeep to Deosai', vendor=self.vendor).exists())
+
+    def test_update_service(self):
+        url = reverse('vendor-service-detail', args=[self.service.id])
+        with self.assertNumQueries(2):  # service, update
+            response = self.client.patch(url, {'price': '120.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_bookings(self):
+        with self.assertNumQueries(1):  # bookings joined with their service
+            response = self.client.get(reverse('vendor-bookings-list'))
+        self.assertEqual(len(response.data), 1)
+
+    def test_retrieve_booking(self):
+        booking = Booking.objects.get()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('vendor-bookings-detail', args=[booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stats(self):
+        with self.assertNumQueries(2):  # per-day rollup, per-service rollup
+            response = self.client.get(reverse('vendor-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unverified_vendor_is_picked_up_after_approval(self):
+        self.vendor.is_verified = False
+        self.vendor.save()
+        access = self.login().data['access']
+        self.assertEqual(self.client.get(reverse('vendor-service-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_superuser(username='admin', password='StrongPassword123')
+        self.client.force_authenticate(admin)
+        self.client.post(reverse('admin-vendor-approve', args=[self.vendor.id]))
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        # The old token still says "not verified", but the approval has been published
+        self.assertEqual(self.client.get(reverse('vendor-service-list')).status_code, status.HTTP_200_OK)
+
+    def test_vendor_context_reads_the_cache_once(self):
+        self.vendor.is_verified = False
+        self.vendor.save()
+        self.login()
+        with mock.patch.object(context_module.cache, 'get', wraps=context_module.cache.get) as cache_get:
+            self.assertEqual(self.client.get(reverse('vendor-service-list')).status_code, status.HTTP_403_FORBIDDEN)
+        keys = [call.args[0] for call in cache_get.call_args_list]
+        self.assertEqual(keys.count(f'vendors:context:{self.vendor.user_id}'), 1)
+
+    def test_old_verified_claims_are_checked_against_the_database(self):
+        # Suspended in another worker, whose cache this one doesn't share
+        Vendor.objects.filter(pk=self.vendor.pk).update(is_verified=False)
+        self.assertEqual(self.client.get(reverse('vendor-service-list')).status_code, status.HTTP_200_OK)
+
+        cache.clear()
+        with override_settings(TOKEN_CLAIMS_MAX_AGE=0):
+            self.assertEqual(self.client.get(reverse('vendor-service-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class VendorExportTest(APITestCase):
+    """
+    Test suite for the streamed vendor exports.
+    """
+
+    def setUp(self):
+        self.service = make_service()
+        tourist = User.objects.create_user(username='tourist', password='StrongPassword123')
+        for day in (1, 2):
+            Booking.objects.create(
+                user=tourist, service=self.service, service_start_date=date(2025, 7, day),
+                total_price=Decimal('100.00')
+            )
+        self.client.force_authenticate(self.service.vendor.user)
+
+    def test_bookings_csv_is_streamed(self):
+        url = reverse('vendor-export', args=['bookings', 'csv'])
+        response = self.client.get(url, HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'booking_date', 'service_id', 'service_name'])
+        self.assertEqual(len(lines), 3)
+        self.assertIn('2025-07-02,,1,,PENDING,100.00', lines[2])
+
+    async def test_export_is_streamed_under_asgi(self):
+        access = await sync_to_async(lambda: str(TouristaRefreshToken.for_user(self.service.vendor.user).access_token))()
+        response = await self.async_client.get(
+            reverse('vendor-export', args=['bookings', 'jsonl']), headers={'Authorization': f'Bearer {access}'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)['service_start_date'] for line in lines], ['2025-07-01', '2025-07-02'])
+
+    def test_other_vendors_rows_are_not_exported(self):
+        make_service(username='othervendor')
+        response = self.client.get(reverse('vendor-export', args=['services', 'jsonl']))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
@@ -1,7 +1,8 @@
 # In vendors/urls.py
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import VendorRegistrationView, ServiceViewSet,TouristBookingViewSet,VendorBookingViewSet
+from .views import QuoteView, VendorStatsView, VendorExportView
 
 router = DefaultRouter()
 router.register(r'services', ServiceViewSet, basename='service')
@@ -18,6 +19,7 @@ booking_router.register(r'bookings', TouristBookingViewSet, basename='tourist-bo
 
 urlpatterns = [
     path('register/', VendorRegistrationView.as_view(), name='vendor-register'),
+    path('quotes/', QuoteView.as_view(), name='service-quotes'),
     path('', include(router.urls)),
     # URLs for vendors to manage their own services
     path('my-services/', include(service_router.urls)),
@@ -29,4 +31,14 @@ urlpatterns = [
     path('my-bookings/', VendorBookingViewSet.as_view({'get': 'list'}), name='vendor-bookings-list'),
     path('my-bookings/<int:pk>/', VendorBookingViewSet.as_view({'get': 'retrieve'}), name='vendor-bookings-detail'),
 
+    # Dashboard statistics for vendors, served from the rollup table
+    path('my-stats/', VendorStatsView.as_view(), name='vendor-stats'),
+
+    # Streamed CSV / JSON Lines exports of the vendor's history
+    re_path(
+        r'^my-export/(?P<dataset>bookings|services)/(?P<export_format>csv|jsonl)/$',
+        VendorExportView.as_view(),
+        name='vendor-export'
+    ),
+
 ]
\ No newline at end of file
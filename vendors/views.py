@@ -1,22 +1,31 @@
 # In vendors/views.py
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Vendor, Service, Booking 
-from .serializers import VendorSerializer, ServiceSerializer, BookingSerializer
+from .serializers import VendorSerializer, ServiceSerializer, BookingSerializer, QuoteRequestSerializer
+from .pricing import quote_many
+from .stats import get_vendor_dashboard
+from .context import get_vendor_context
+from utils.mixins import SparseFieldsetViewMixin
+from utils.export import stream_export, ExportContentNegotiation
+from .exports import BOOKING_EXPORT_COLUMNS, SERVICE_EXPORT_COLUMNS
 
 class IsVerifiedVendor(permissions.BasePermission):
     """
     Custom permission to only allow verified vendors to manage services.
+    The vendor status comes from the request's vendor context (token claims or
+    cache), so this normally costs no query.
     """
     def has_permission(self, request, view):
         # Must be authenticated
         if not request.user.is_authenticated:
             return False
         # The user must have a vendor profile and it must be verified
-        try:
-            return request.user.vendor_profile.is_verified
-        except Vendor.DoesNotExist:
-            return False
+        return get_vendor_context(request).is_verified
 
 class VendorRegistrationView(generics.CreateAPIView):
     """
@@ -40,7 +49,7 @@ class VendorRegistrationView(generics.CreateAPIView):
         # Associate the vendor profile with the current logged-in user
         serializer.save(user=self.request.user)
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for verified vendors to manage their services.
     - list: View your services
@@ -56,13 +65,13 @@ class ServiceViewSet(viewsets.ModelViewSet):
         """
         This view should only return services for the currently authenticated vendor.
         """
-        return Service.objects.filter(vendor__user=self.request.user)
+        return Service.objects.filter(vendor_id=get_vendor_context(self.request).vendor_id)
 
     def perform_create(self, serializer):
         # Associate the service with the vendor profile of the current user
-        serializer.save(vendor=self.request.user.vendor_profile)
+        serializer.save(vendor=get_vendor_context(self.request).as_vendor())
 
-class TouristBookingViewSet(viewsets.ModelViewSet):
+class TouristBookingViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for tourists to create and view their bookings.
     - list: View your past bookings.
@@ -78,7 +87,7 @@ class TouristBookingViewSet(viewsets.ModelViewSet):
         """
         Users can only see their own bookings.
         """
-        return Booking.objects.filter(user=self.request.user).select_related('service__vendor')
+        return Booking.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         """
@@ -86,7 +95,7 @@ class TouristBookingViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
-class VendorBookingViewSet(viewsets.ReadOnlyModelViewSet):
+class VendorBookingViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for VERIFIED VENDORS to view bookings for their services.
     - list: View all bookings for your services.
@@ -101,7 +110,84 @@ class VendorBookingViewSet(viewsets.ReadOnlyModelViewSet):
         Vendors can only see bookings for their own services.
         """
         # Get the vendor profile associated with the logged-in user
-        vendor_profile = self.request.user.vendor_profile
+        vendor_id = get_vendor_context(self.request).vendor_id
         # Filter bookings where the service's vendor is the current vendor
-        return Booking.objects.filter(service__vendor=vendor_profile)
+        return Booking.objects.filter(service__vendor_id=vendor_id)
+
+class QuoteView(APIView):
+    """
+    API endpoint to price many (service, date range) combinations in one request,
+    e.g. to show real totals on a search results page.
+    Accessible at: POST /api/vendors/quotes/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        default_guests = serializer.validated_data['guests']
+        items = serializer.validated_data['items']
+        for item in items:
+            item.setdefault('guests', default_guests)
+
+        return Response({"quotes": quote_many(items)}, status=status.HTTP_200_OK)
+
+class VendorStatsView(APIView):
+    """
+    API endpoint for VERIFIED VENDORS to read their dashboard statistics:
+    booking counts by status and revenue, per day and per service.
+    Accessible at: GET /api/vendors/my-stats/?start=YYYY-MM-DD&end=YYYY-MM-DD
+    Defaults to the last 30 days.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsVerifiedVendor]
+    MAX_RANGE_DAYS = 366
+
+    def _date_param(self, request, name):
+        """The `name` query parameter as a date, or None if it is absent. Raises ValueError if it is malformed."""
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        # parse_date() returns None for text that isn't shaped like a date at all
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(value)
+        return parsed
+
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+        try:
+            end = self._date_param(request, 'end') or today
+            start = self._date_param(request, 'start') or end - timedelta(days=29)
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start > end:
+            return Response({"error": "start must be on or before end."}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= self.MAX_RANGE_DAYS:
+            return Response(
+                {"error": f"The date range cannot be longer than {self.MAX_RANGE_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dashboard = get_vendor_dashboard(get_vendor_context(request).vendor_id, start, end)
+        return Response(dashboard, status=status.HTTP_200_OK)
+
+class VendorExportView(APIView):
+    """
+    API endpoint for VERIFIED VENDORS to download their full booking or service
+    history as a streamed file.
+    Accessible at: GET /api/vendors/my-export/{bookings|services}/{csv|jsonl}/
+    """
+    permission_classes = [permissions.IsAuthenticated, IsVerifiedVendor]
+    content_negotiation_class = ExportContentNegotiation
 
+    def get(self, request, dataset, export_format, *args, **kwargs):
+        vendor_id = get_vendor_context(request).vendor_id
+        if dataset == 'bookings':
+            queryset = Booking.objects.filter(service__vendor_id=vendor_id).order_by('id')
+            columns = BOOKING_EXPORT_COLUMNS
+        else:
+            queryset = Service.objects.filter(vendor_id=vendor_id).order_by('id')
+            columns = SERVICE_EXPORT_COLUMNS
+        return stream_export(queryset, columns, export_format, filename=f'{dataset}', request=request)